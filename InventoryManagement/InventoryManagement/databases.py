@@ -0,0 +1,182 @@
+"""
+Database configuration from the environment, and the read-replica router.
+
+database_config() builds DATABASES from DATABASE_* environment variables.
+Without DATABASE_ENGINE (or with 'sqlite') it is the development SQLite
+file; DATABASE_ENGINE=postgresql gives the production profile:
+
+    DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT
+    DATABASE_CONN_MAX_AGE        seconds a connection is kept open and reused
+                                 (default 60; 0 closes it after each request)
+    DATABASE_CONN_HEALTH_CHECKS  check a reused connection before the request
+                                 uses it (default on)
+    DATABASE_POOL                use a psycopg 3 connection pool per process
+                                 instead of persistent connections, sized by
+                                 DATABASE_POOL_MIN_SIZE / DATABASE_POOL_MAX_SIZE
+    DATABASE_REPLICA_HOST        add a 'replica' alias on this host; the other
+                                 DATABASE_REPLICA_* settings default to the
+                                 primary's
+
+SQLite connections are tuned as they open (configure_sqlite) from the
+SQLITE_PRAGMAS setting: write-ahead logging lets readers carry on while a
+writer commits, synchronous=NORMAL drops an fsync per commit (WAL stays
+consistent; a power cut can lose the last commits), busy_timeout makes a
+connection wait for the lock instead of failing at once, and mmap_size,
+cache_size and temp_store keep more of the work in memory. The SQLite
+profile also opens transactions with BEGIN IMMEDIATE, so a transaction that
+will write takes the lock up front and waits for it under busy_timeout,
+rather than failing with "database is locked" when it first writes.
+
+Waits longer than busy_timeout still fail; retry_on_locked() retries a
+whole write (one that is its own transaction) a few times with backoff.
+
+ReplicaRouter sends reads made inside replica_reads() to the replica, when
+one is configured; everything else, and every write, uses 'default'. The
+reporting views, audit search and exports run under replica_reads() (as
+a decorator or a with block), since they read a lot and can live with the
+replica being a moment behind.
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from functools import partial, wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_config(environ, base_dir):
+    """The DATABASES setting described by the DATABASE_* variables in `environ`."""
+    engine = environ.get('DATABASE_ENGINE', 'sqlite').lower()
+    if engine in ('sqlite', 'sqlite3'):
+        return {
+            DEFAULT_DB_ALIAS: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': environ.get('DATABASE_NAME') or base_dir / 'db.sqlite3',
+                'OPTIONS': {'transaction_mode': environ.get('DATABASE_SQLITE_TRANSACTION_MODE', 'IMMEDIATE')},
+            }
+        }
+    if engine not in ('postgres', 'postgresql'):
+        raise ValueError(f'Unsupported DATABASE_ENGINE: {engine}')
+
+    default = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DATABASE_NAME', 'inventory'),
+        'USER': environ.get('DATABASE_USER', ''),
+        'PASSWORD': environ.get('DATABASE_PASSWORD', ''),
+        'HOST': environ.get('DATABASE_HOST', 'localhost'),
+        'PORT': environ.get('DATABASE_PORT', '5432'),
+        'CONN_MAX_AGE': int(environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': _flag(environ.get('DATABASE_CONN_HEALTH_CHECKS', 'true')),
+        'OPTIONS': {},
+    }
+    if _flag(environ.get('DATABASE_POOL', 'false')):
+        # The pool hands connections out and takes them back per request, so
+        # Django must not hold on to them as well
+        default['CONN_MAX_AGE'] = 0
+        default['OPTIONS']['pool'] = {
+            'min_size': int(environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+            'max_size': int(environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+        }
+    databases = {DEFAULT_DB_ALIAS: default}
+
+    if environ.get('DATABASE_REPLICA_HOST'):
+        replica = {**default, 'OPTIONS': dict(default['OPTIONS']), 'HOST': environ['DATABASE_REPLICA_HOST']}
+        for key in ('NAME', 'USER', 'PASSWORD', 'PORT'):
+            replica[key] = environ.get(f'DATABASE_REPLICA_{key}', default[key])
+        # Tests read the replica through the default connection
+        replica['TEST'] = {'MIRROR': DEFAULT_DB_ALIAS}
+        databases[REPLICA_DB_ALIAS] = replica
+    return databases
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and 'is locked' in str(exc)
+
+
+def retry_on_locked(func=None, *, attempts=None, delay=None):
+    """
+    Retry `func` when SQLite reports the database (or a table) locked, up to
+    SQLITE_LOCK_RETRIES times with exponential backoff from
+    SQLITE_LOCK_RETRY_DELAY seconds. Inside a transaction a failed statement
+    spoils the whole transaction, so there the call is made once and the
+    owner of the outermost transaction has to retry.
+    """
+    if func is None:
+        return partial(retry_on_locked, attempts=attempts, delay=delay)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            return func(*args, **kwargs)
+        tries = attempts or getattr(settings, 'SQLITE_LOCK_RETRIES', 4)
+        pause = getattr(settings, 'SQLITE_LOCK_RETRY_DELAY', 0.05) if delay is None else delay
+        for attempt in range(tries):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not is_locked_error(exc) or attempt == tries - 1:
+                    raise
+                logger.warning('%s: %s, retrying (%s/%s)', func.__name__, exc, attempt + 1, tries - 1)
+                # Jitter keeps writers that collided from retrying in step
+                time.sleep(pause * 2 ** attempt * random.uniform(1, 1.5))
+    return wrapper
+
+
+@contextmanager
+def replica_reads():
+    """Send the reads made inside the block (or decorated function) to the replica, if there is one."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def iterate_on_replica(iterable):
+    """Consume `iterable` under replica_reads(), e.g. a streamed body that queries as it goes."""
+    with replica_reads():
+        yield from iterable
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or REPLICA_DB_ALIAS not in settings.DATABASES:
+            return None
+        # Inside a write transaction, read what it has written
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
@@ -0,0 +1,246 @@
+"""
+Keyset (cursor) pagination for the ledger, alert, audit and serial listings.
+
+Offset pagination costs a COUNT(*) over the whole filtered table plus an
+OFFSET that walks every skipped row, so deep pages get slower the further
+back they go. A keyset page instead continues from the last row seen:
+
+    WHERE (timestamp, id) < (:last_timestamp, :last_id)
+    ORDER BY timestamp DESC, id DESC LIMIT 51
+
+which an index on (timestamp, id) answers in the same time on every page.
+The position travels in an opaque cursor (URL-safe base64 of the ordering
+values and the direction). One extra row is fetched to learn whether there
+is a further page, and no total count is needed; views that want one can
+ask for an estimate (estimate_count) instead of an exact COUNT(*).
+
+KeysetPaginator serves the HTML pages (?cursor=...) and
+KeysetCursorPagination the DRF list APIs, using the same cursors.
+"""
+import base64
+import binascii
+import json
+from functools import cached_property
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Max, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_ORDERING = ('-timestamp', '-id')
+ESTIMATE_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, previous=False):
+    payload = json.dumps({'v': values, 'p': int(previous)}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (values, previous) from a cursor made by encode_cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, previous = payload['v'], bool(payload['p'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, previous
+
+
+def estimate_count(queryset, cap=ESTIMATE_CAP):
+    """
+    A cheap row count for display. PostgreSQL uses the planner's estimate;
+    elsewhere an unfiltered table reports its highest id and a filtered
+    queryset is counted exactly but stops at `cap`.
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if not queryset.query.where:
+        return queryset.model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+    return queryset.order_by().values('pk')[:cap].count()
+
+
+class KeysetPage:
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return self.paginator.cursor_for(self.object_list[0], previous=True)
+
+
+class KeysetPaginator:
+    """
+    Paginate `queryset` by `ordering`, a sequence of local field names with
+    an optional '-' prefix that ends in a unique field (normally the id).
+    With estimate=True, `count` is estimate_count() instead of None.
+    """
+
+    def __init__(self, queryset, per_page=50, ordering=DEFAULT_ORDERING, estimate=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.estimate = estimate
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.queryset) if self.estimate else None
+
+    def cursor_for(self, obj, previous=False):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return encode_cursor(values, previous)
+
+    def _after(self, values, previous):
+        """Q for the rows after `values` in the ordering (before them when `previous`)."""
+        condition = Q()
+        for position in reversed(range(len(self.fields))):
+            name = self.fields[position].attname
+            descending = self.ordering[position].startswith('-')
+            lookup = 'lt' if descending != previous else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            if position < len(self.fields) - 1:
+                step |= Q(**{name: values[position]}) & condition
+            condition = step
+        # The redundant bound on the leading field gives the planner an index range
+        name, descending = self.fields[0].attname, self.ordering[0].startswith('-')
+        return Q(**{f"{name}__{'lte' if descending != previous else 'gte'}": values[0]}) & condition
+
+    def page(self, cursor=None):
+        """Return the page after (or, for a previous-page cursor, before) `cursor`."""
+        queryset, previous = self.queryset, False
+        if cursor:
+            values, previous = decode_cursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            try:
+                values = [field.to_python(value) for field, value in zip(self.fields, values)]
+            except ValidationError:
+                raise InvalidCursor(cursor)
+            queryset = queryset.filter(self._after(values, previous))
+        if previous:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        else:
+            ordering = self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if previous:
+            rows.reverse()
+            return KeysetPage(self, rows, has_next=True, has_previous=more)
+        return KeysetPage(self, rows, has_next=more, has_previous=bool(cursor))
+
+    def get_page(self, cursor=None):
+        """Like page(), but an unreadable cursor gives the first page."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    DRF pagination over KeysetPaginator: ?cursor=<opaque>&page_size=<n>.
+    Responses carry next/previous links, the results and, with ?count=1,
+    an estimated total.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = DEFAULT_ORDERING
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        estimate = request.query_params.get('count') in ('1', 'true')
+        self.paginator = KeysetPaginator(queryset, self.get_page_size(request), ordering, estimate=estimate)
+        try:
+            self.page = self.paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return self.page.object_list
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.paginator.estimate:
+            response['count'] = self.paginator.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'example': 123},
+                'results': schema,
+            },
+        }
+
+
+def query_without_cursor(params):
+    """The urlencoded query `params` minus the pagination keys, for building page links."""
+    params = params.copy()
+    for key in ('cursor', 'page'):
+        params.pop(key, None)
+    return params.urlencode()
@@ -0,0 +1,210 @@
+"""
+Per-request profiling: query count, database time, repeated queries,
+template render time and (optionally) peak Python allocations.
+
+profile() is a context manager that collects these for whatever runs inside
+it; ProfilingMiddleware wraps each request in one, reports the result in a
+Server-Timing header (visible in the browser's network panel) and a JSON log
+line on the 'InventoryManagement.profiling' logger, and checks the view
+against its budget in QUERY_BUDGETS:
+
+    QUERY_BUDGETS = {'inventory-limits-page': 8}   # URL name -> most queries
+
+A view over budget is logged as a warning, or raises QueryBudgetExceeded
+when QUERY_BUDGETS_STRICT is set (as it is under the test runner), so a
+view that grows an N+1 query fails the tests that request it.
+
+Repeated queries are grouped by fingerprint, the SQL with literals and IN
+lists collapsed; the same fingerprint run many times in one request is the
+signature of an N+1 loop. Template time is measured by the
+ProfilingDjangoTemplates backend. Memory tracing uses tracemalloc, which
+slows every allocation and is process wide, so it is off unless
+PROFILING_TRACE_MEMORY is set and the peak is only indicative when requests
+run concurrently.
+"""
+import contextvars
+import json
+import logging
+import re
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """The shape of a query: literals become ? and IN lists of any length IN (...)."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql.replace('%s', '?'))
+    return ' '.join(sql.split())
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = []          # [(sql, seconds)]
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.peak_memory = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, minimum=2):
+        """Return [(fingerprint, count)] of query shapes run at least `minimum` times, most first."""
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in counts.most_common() if count >= minimum]
+
+    def server_timing(self):
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f};desc="templates"',
+        ]
+        if self.elapsed is not None:
+            metrics.append(f'total;dur={self.elapsed * 1000:.1f}')
+        if self.peak_memory is not None:
+            metrics.append(f'mem;desc="peak {self.peak_memory / 1024:.0f} KiB"')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'queries': self.query_count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'total_ms': round(self.elapsed * 1000, 2) if self.elapsed is not None else None,
+            'peak_memory_kib': round(self.peak_memory / 1024) if self.peak_memory is not None else None,
+            'duplicates': [{'sql': shape, 'count': count} for shape, count in self.duplicates()[:5]],
+        }
+
+    def _record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+
+def current_profile():
+    """The profile collecting for the code running now, or None."""
+    return _current.get()
+
+
+@contextmanager
+def profile(trace_memory=False):
+    """Collect a RequestProfile for the queries and templates run inside the block."""
+    result = RequestProfile()
+    token = _current.set(result)
+    started_tracing = False
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracemalloc.reset_peak()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(result._record_query))
+            yield result
+    finally:
+        if trace_memory:
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        result.elapsed = time.perf_counter() - result.started
+        _current.reset(token)
+
+
+class ProfilingTemplate(Template):
+    def render(self, context=None, request=None):
+        result = current_profile()
+        if result is None:
+            return super().render(context, request)
+        # Templates rendered from inside another (template tags) are already timed
+        result.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            result.template_depth -= 1
+            if not result.template_depth:
+                result.template_time += time.perf_counter() - started
+
+
+class ProfilingDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time counted towards the current profile."""
+
+    def from_string(self, template_code):
+        return ProfilingTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return ProfilingTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def query_budget(url_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+def check_query_budget(url_name, result):
+    """Log (or, with QUERY_BUDGETS_STRICT, raise) when `result` ran more queries than the view's budget."""
+    budget = query_budget(url_name)
+    if budget is None or result.query_count <= budget:
+        return
+    message = f'{url_name} ran {result.query_count} queries (budget {budget})'
+    duplicates = result.duplicates()
+    if duplicates:
+        message += '; repeated: ' + '; '.join(f'{count}x {shape}' for shape, count in duplicates[:3])
+    if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class ProfilingMiddleware:
+    """Profile each request when PROFILING_ENABLED (or a budget is being enforced)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (getattr(settings, 'PROFILING_ENABLED', False) or getattr(settings, 'QUERY_BUDGETS_STRICT', False)):
+            return self.get_response(request)
+        with profile(trace_memory=getattr(settings, 'PROFILING_TRACE_MEMORY', False)) as result:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else None
+        response['Server-Timing'] = result.server_timing()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': url_name,
+            'status': response.status_code,
+            **result.as_dict(),
+        }))
+        if url_name and request.method in ('GET', 'HEAD'):
+            check_query_budget(url_name, result)
+        return response
@@ -0,0 +1,63 @@
+"""
+Test helpers that check the queries behind a view are served by indexes.
+
+Each SELECT captured while the view runs is passed through EXPLAIN QUERY PLAN
+(SQLite) or EXPLAIN (PostgreSQL, with sequential scans discouraged so the
+planner's choice on tiny test tables does not hide a missing index). A full
+table scan of any of the watched tables fails the test.
+"""
+import re
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def explain(sql, params=None):
+    """Return the query plan for `sql` as a list of lines."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return [row[0] for row in cursor.fetchall()]
+    raise NotImplementedError(f'Query plans are not supported on {connection.vendor}')
+
+
+def full_table_scans(plan, tables):
+    """Return the plan lines that scan one of `tables` without an index."""
+    patterns = []
+    for table in tables:
+        if connection.vendor == 'sqlite':
+            # "SCAN t" is a table scan; "SCAN t USING [COVERING] INDEX i" walks an index
+            patterns.append(re.compile(rf'^SCAN {re.escape(table)}( AS \w+)?$'))
+        else:
+            patterns.append(re.compile(rf'Seq Scan on {re.escape(table)}\b'))
+    return [line for line in plan if any(pattern.search(line.strip()) for pattern in patterns)]
+
+
+class QueryPlanMixin:
+    """TestCase mixin with assertions over the query plans of views and querysets."""
+
+    def assertQuerysetUsesIndex(self, queryset, index_name=None):
+        sql, params = queryset.query.sql_with_params()
+        plan = explain(sql, params)
+        self.assertFalse(full_table_scans(plan, [queryset.model._meta.db_table]), f'Full scan in plan for {sql}:\n' + '\n'.join(plan))
+        if index_name:
+            self.assertTrue(any(index_name in line for line in plan), f'{index_name} not used for {sql}:\n' + '\n'.join(plan))
+
+    def assertViewUsesIndexes(self, url, models, data=None):
+        """GET `url` and fail if any of its queries scans a table of `models` in full."""
+        tables = [model._meta.db_table for model in models]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT') or not any(table in sql for table in tables):
+                continue
+            plan = explain(sql)
+            scans = full_table_scans(plan, tables)
+            self.assertFalse(scans, f'Full table scan for {url}:\n{sql}\n' + '\n'.join(plan))
+        return response
+
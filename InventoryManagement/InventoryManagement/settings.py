@@ -10,7 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
+from .databases import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +28,9 @@ SECRET_KEY = 'django-insecure-9w8cyi%$s-&h9k00it+3-=$vcttt9pf5e80mdkexbplz+dj3-&
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Running under `manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 ALLOWED_HOSTS = []
 
 
@@ -50,12 +56,15 @@ INSTALLED_APPS = [
     'users',
     'audit',
     'reports',
+    'jobs',
+    'benchmarks',
 ]
 
 AUTH_USER_MODEL = 'users.UserProfile'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'InventoryManagement.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
 
     # CORS middleware
@@ -66,6 +75,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'audit.middleware.AuditBatchMiddleware',
 ]
 
 # CORS settings
@@ -92,10 +102,21 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background jobs (uploads and exports) are processed by `manage.py run_jobs`.
+# Set JOBS_RUN_INLINE to run them inside the request instead, e.g. in development.
+# A running job's heartbeat is refreshed every JOBS_HEARTBEAT_INTERVAL seconds;
+# run_jobs requeues jobs whose heartbeat has stopped (their worker died).
+JOBS_RUN_INLINE = False
+JOBS_HEARTBEAT_INTERVAL = 30
+
+# Largest Excel file accepted by the bulk product import (None for no limit)
+PRODUCT_IMPORT_MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+
 # Templates DIRS updated for frontend build
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times rendering for the request profile
+        'BACKEND': 'InventoryManagement.profiling.ProfilingDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -116,13 +137,116 @@ WSGI_APPLICATION = 'InventoryManagement.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# SQLite in development; set DATABASE_ENGINE=postgresql (and the other
+# DATABASE_* variables, see InventoryManagement/databases.py) for the
+# production profile with persistent or pooled connections. With
+# DATABASE_REPLICA_HOST, reports, audit search and exports read from the replica.
+DATABASES = database_config(os.environ, BASE_DIR)
+DATABASE_ROUTERS = ['InventoryManagement.databases.ReplicaRouter']
+
+# Applied to every new SQLite connection (PRAGMA name = value); see
+# InventoryManagement/databases.py. Set to {} for SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,           # milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,           # negative: KiB, i.e. 64 MB per connection
+    'temp_store': 'MEMORY',
+}
+
+# Writes that find SQLite locked beyond busy_timeout are retried this many
+# times, waiting SQLITE_LOCK_RETRY_DELAY seconds and doubling after each try.
+SQLITE_LOCK_RETRIES = 4
+SQLITE_LOCK_RETRY_DELAY = 0.05
+
+# Per-process memory cache by default; point this at Redis/Memcached or a
+# FileBasedCache to share cached values (e.g. dashboard KPIs) between workers.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory-management',
     }
 }
 
+# Seconds the dashboard KPIs are served without recomputing. Writes to stock,
+# adjustments or products mark them stale earlier; stale values keep being
+# served while a single request recomputes them.
+DASHBOARD_KPI_CACHE_TTL = 60
+
+# The run_jobs worker folds stock entries, adjustments, rentals and alerts into
+# the daily rollup every ROLLUP_INTERVAL seconds (None to leave it to a
+# scheduled `manage.py rollup_daily`). Rows younger than ROLLUP_SAFETY_LAG
+# seconds are left to the readers, and each run recomputes the last
+# ROLLUP_REAGGREGATE_DAYS days, so rows that commit late are still counted.
+ROLLUP_INTERVAL = 300
+ROLLUP_SAFETY_LAG = 300
+ROLLUP_REAGGREGATE_DAYS = 2
+
+# Audit entries are buffered until their transaction commits and written in
+# batches of AUDIT_WRITER_BATCH_SIZE, one bulk insert per request. With
+# AUDIT_WRITER_BACKGROUND a daemon thread does the inserts from a queue of at
+# most AUDIT_WRITER_QUEUE_SIZE entries; when it is full, callers wait up to
+# AUDIT_WRITER_QUEUE_TIMEOUT seconds before the entry is dropped (and counted).
+AUDIT_WRITER_BACKGROUND = False
+AUDIT_WRITER_BATCH_SIZE = 500
+AUDIT_WRITER_QUEUE_SIZE = 10000
+AUDIT_WRITER_QUEUE_TIMEOUT = 1.0
+
+# Each process keeps the product typeahead index in memory and applies its own
+# writes immediately; writes made by other processes are picked up by a rebuild
+# at most this many seconds apart, in a background thread. That takes a shared
+# cache: with the per-process default, writes from other processes (e.g. the
+# run_jobs worker importing products) only show up after a restart.
+PRODUCT_AUTOCOMPLETE_REBUILD_INTERVAL = 30
+
+# `manage.py archive_audit_logs` moves audit rows older than
+# AUDIT_RETENTION_DAYS into gzip JSON Lines files under AUDIT_ARCHIVE_DIR, one
+# per month. The audit page and exports read them back when a date filter
+# reaches into archived time.
+AUDIT_RETENTION_DAYS = 365
+AUDIT_ARCHIVE_DIR = BASE_DIR / 'archive' / 'audit'
+
+# Request profiling (InventoryManagement.profiling): query count, database and
+# template time and repeated queries of each request, sent as a Server-Timing
+# header and logged as JSON. PROFILING_TRACE_MEMORY adds the peak of Python
+# allocations via tracemalloc, which slows the whole process down.
+PROFILING_ENABLED = DEBUG
+PROFILING_TRACE_MEMORY = False
+
+# Most queries each page may run (by URL name), with a handful of rows in the
+# tables involved; a page whose count grows with its rows exceeds it. Over
+# budget is logged, and fails the request under `manage.py test`.
+QUERY_BUDGETS = {
+    'dashboard-page': 9,
+    'stock-in-page': 6,
+    'stock-out-page': 6,
+    'inventory-adjustments-page': 6,
+    'inventory-serials-page': 7,
+    'inventory-limits-page': 7,
+    'inventory-alerts-page': 5,
+    'rental-management': 6,
+    'products-list': 6,
+    'product-detail': 13,
+    'audit-logs': 8,
+}
+QUERY_BUDGETS_STRICT = TESTING
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'InventoryManagement.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO' if PROFILING_ENABLED and not TESTING else 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
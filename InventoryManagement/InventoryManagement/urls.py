@@ -19,6 +19,7 @@ urlpatterns = [
     path('audit/', include('audit.urls')),
     path('reports/', include('reports.urls')),
     path('procurement/', include('procurement.urls')),
+    path('jobs/', include('jobs.urls')),
 
     # API routes for apps (separate from HTML pages)
     path('api/dashboard/', include('dashboard.urls')),
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'InventoryManagement.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory product typeahead index before the first request
+from products.autocomplete import warm_up_product_index  # noqa: E402
+
+warm_up_product_index()
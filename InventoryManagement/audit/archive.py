@@ -0,0 +1,279 @@
+"""
+Archival of old audit rows to compressed monthly files.
+
+Rows older than the retention window are moved out of audit_auditlog into
+AUDIT_ARCHIVE_DIR/audit-YYYY-MM.jsonl.gz, one JSON object per line. Every
+archive run appends a separate gzip member to the month's file (gzip readers
+treat concatenated members as one stream), and audit-YYYY-MM.index.json
+records each member's byte offset and length together with its row count,
+timestamp range and user ids. The index is the source of truth: bytes past
+its last member (an interrupted run) are truncated before the next append.
+
+Readers use the index to skip members outside the requested range or user,
+then stream the matching members out of a memory-mapped file through
+zlib, so only one chunk of compressed and decompressed data is held at a
+time (plus the matching rows of the month being read, which are sorted).
+"""
+import gzip
+import json
+import mmap
+import os
+import re
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .exports import filter_audit_logs, timestamp_range
+from .models import AuditLog
+from .search import row_matches_search
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'username', 'action', 'model_name', 'object_id', 'timestamp', 'changes']
+_FILE_PATTERN = re.compile(r'^audit-(\d{4})-(\d{2})\.jsonl\.gz$')
+_READ_CHUNK = 64 * 1024
+
+
+def archive_dir():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive' / 'audit'))
+
+
+def _paths(year, month):
+    base = archive_dir() / f'audit-{year:04d}-{month:02d}'
+    return base.with_name(base.name + '.jsonl.gz'), base.with_name(base.name + '.index.json')
+
+
+def read_index(year, month):
+    """Return the list of member records for a month ([] if it has no archive)."""
+    _, index_path = _paths(year, month)
+    try:
+        with open(index_path) as f:
+            return json.load(f)['members']
+    except FileNotFoundError:
+        return []
+
+
+def archived_months():
+    """Return the (year, month) pairs that have an archive, newest first."""
+    months = []
+    if archive_dir().is_dir():
+        for path in archive_dir().iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if match:
+                months.append((int(match.group(1)), int(match.group(2))))
+    return sorted(months, reverse=True)
+
+
+def archive_horizon():
+    """Return the newest archived timestamp, or None when nothing is archived."""
+    for year, month in archived_months():
+        members = read_index(year, month)
+        if members:
+            return max(datetime.fromisoformat(member['last']) for member in members)
+    return None
+
+
+def _append_member(year, month, rows):
+    """Append `rows` (dicts with ARCHIVE_FIELDS) to a month's archive as one gzip member."""
+    data_path, index_path = _paths(year, month)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    members = read_index(year, month)
+    end = members[-1]['offset'] + members[-1]['length'] if members else 0
+    payload = gzip.compress(b''.join(
+        json.dumps(row, separators=(',', ':'), default=str).encode() + b'\n' for row in rows
+    ))
+    with open(data_path, 'ab') as f:
+        f.truncate(end)
+        f.seek(end)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    members.append({
+        'offset': end,
+        'length': len(payload),
+        'rows': len(rows),
+        'first': min(row['timestamp'] for row in rows),
+        'last': max(row['timestamp'] for row in rows),
+        'min_id': min(row['id'] for row in rows),
+        'max_id': max(row['id'] for row in rows),
+        'users': sorted({row['user_id'] for row in rows if row['user_id'] is not None}),
+    })
+    temp_path = index_path.with_name(index_path.name + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump({'members': members}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, index_path)
+
+
+def archive_audit_logs(before, batch_size=5000):
+    """
+    Move audit rows with timestamp < `before` into the monthly archives,
+    oldest first, `batch_size` rows per transaction. The archive files are
+    written before each batch's delete commits. Returns the rows archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                AuditLog.objects.filter(timestamp__lt=before)
+                .order_by('timestamp', 'id')
+                .values('id', 'user_id', 'action', 'model_name', 'object_id', 'timestamp', 'changes', username=F('user__username'))
+                [:batch_size]
+            )
+            if not rows:
+                return archived
+            by_month = defaultdict(list)
+            for row in rows:
+                when = timezone.localtime(row['timestamp'])
+                row['timestamp'] = row['timestamp'].isoformat()
+                by_month[(when.year, when.month)].append({field: row[field] for field in ARCHIVE_FIELDS})
+            for (year, month), month_rows in sorted(by_month.items()):
+                _append_member(year, month, month_rows)
+            AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+
+
+def _iter_member(mm, member):
+    """Yield the rows of one gzip member from the memory-mapped archive, chunk by chunk."""
+    decompressor = zlib.decompressobj(wbits=31)
+    pending = b''
+    position, end = member['offset'], member['offset'] + member['length']
+    while position < end:
+        chunk = mm[position:min(position + _READ_CHUNK, end)]
+        position += len(chunk)
+        lines = (pending + decompressor.decompress(chunk)).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            if line:
+                yield json.loads(line)
+    if pending:
+        yield json.loads(pending)
+
+
+def _member_matches(member, start, end, user_id):
+    if start is not None and datetime.fromisoformat(member['last']) < start:
+        return False
+    if end is not None and datetime.fromisoformat(member['first']) >= end:
+        return False
+    if user_id and int(user_id) not in member['users']:
+        return False
+    return True
+
+
+def _row_matches(row, params, start, end):
+    if start is not None and not start <= row['timestamp'] < end:
+        return False
+    user_id = params.get('user')
+    if user_id and row['user_id'] != int(user_id):
+        return False
+    month = params.get('month')
+    if month and not params.get('year') and timezone.localtime(row['timestamp']).month != int(month):
+        return False
+    search = params.get('search')
+    if search and not row_matches_search(row, search):
+        return False
+    return True
+
+
+def iter_archived_logs(params):
+    """
+    Yield archived rows matching the audit page filters in `params`, newest
+    first, as dicts with ARCHIVE_FIELDS (timestamp parsed back to a datetime).
+    """
+    start, end = timestamp_range(params)
+    for year, month in archived_months():
+        month_start = timezone.make_aware(datetime(year, month, 1))
+        next_month = timezone.make_aware((datetime(year, month, 1) + timedelta(days=31)).replace(day=1))
+        if start is not None and (month_start >= end or next_month <= start):
+            continue
+        members = [member for member in read_index(year, month) if _member_matches(member, start, end, params.get('user'))]
+        if not members:
+            continue
+        data_path, _ = _paths(year, month)
+        rows = []
+        with open(data_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for member in members:
+                for row in _iter_member(mm, member):
+                    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                    if _row_matches(row, params, start, end):
+                        rows.append(row)
+        rows.sort(key=lambda row: (row['timestamp'], row['id']), reverse=True)
+        yield from rows
+
+
+class ArchivedAuditLog:
+    """Read-only stand-in for an AuditLog row read back from an archive."""
+
+    def __init__(self, row):
+        self.id = self.pk = row['id']
+        self.user_id = row['user_id']
+        self.user = row['username']
+        self.action = row['action']
+        self.model_name = row['model_name']
+        self.object_id = row['object_id']
+        self.timestamp = row['timestamp']
+        self.changes = row['changes']
+        self.archived = True
+
+
+class AuditLogHistory:
+    """
+    Filtered live logs followed by the matching archived rows, newest first.
+    Archived rows are all older than the live ones, so pages that stay within
+    the live rows never open an archive. Supports count() and slicing, for
+    Paginator, and export_rows().
+    """
+
+    def __init__(self, params):
+        self.params = params
+        self.live = filter_audit_logs(params)
+        self._live_count = None
+        self._archived_count = None
+
+    def archived_rows(self):
+        return iter_archived_logs(self.params)
+
+    def live_count(self):
+        if self._live_count is None:
+            self._live_count = self.live.count()
+        return self._live_count
+
+    def count(self):
+        if self._archived_count is None:
+            self._archived_count = sum(1 for _ in self.archived_rows())
+        return self.live_count() + self._archived_count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        live_count = self.live_count()
+        items = list(self.live[start:min(stop, live_count)]) if start < live_count else []
+        if stop > live_count:
+            skip = max(start - live_count, 0)
+            for position, row in enumerate(self.archived_rows()):
+                if position >= stop - live_count:
+                    break
+                if position >= skip:
+                    items.append(ArchivedAuditLog(row))
+        return items
+
+
+def audit_history(params):
+    """
+    Return the logs matching the audit page filters: a plain queryset, or an
+    AuditLogHistory when an explicit date filter reaches back into archived time.
+    """
+    start, _ = timestamp_range(params)
+    if start is None:
+        return filter_audit_logs(params)
+    horizon = archive_horizon()
+    if horizon is None or start > horizon:
+        return filter_audit_logs(params)
+    return AuditLogHistory(params)
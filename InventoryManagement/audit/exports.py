@@ -0,0 +1,165 @@
+import csv
+from datetime import date as date_type, datetime, time, timedelta
+from django.utils import timezone
+from .models import AuditLog
+from .search import search_audit_logs
+
+EXPORT_FORMATS = {
+    'excel': ('audit_logs.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('audit_logs.pdf', 'application/pdf'),
+}
+
+
+def _day_start(day, offset=0):
+    """Return the aware start of `day` (a date or YYYY-MM-DD string) plus `offset` days."""
+    if isinstance(day, str):
+        day = date_type.fromisoformat(day)
+    return timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+
+
+def timestamp_range(params):
+    """
+    Return the (start, end) timestamp bounds implied by the year, year+month,
+    date and start/end date filters, intersected; either may be None.
+    """
+    bounds = []
+    year = params.get('year')
+    month = params.get('month')
+    date = params.get('date')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if year and month:
+        first_day = date_type(int(year), int(month), 1)
+        next_month = (first_day + timedelta(days=31)).replace(day=1)
+        bounds.append((_day_start(first_day), _day_start(next_month)))
+    elif year:
+        bounds.append((_day_start(date_type(int(year), 1, 1)), _day_start(date_type(int(year) + 1, 1, 1))))
+    if date:
+        bounds.append((_day_start(date), _day_start(date, offset=1)))
+    if start_date and end_date:
+        bounds.append((_day_start(start_date), _day_start(end_date, offset=1)))
+    if not bounds:
+        return None, None
+    return max(start for start, _ in bounds), min(end for _, end in bounds)
+
+
+def filter_audit_logs(params):
+    """Apply the audit page filters (user, year, month, date, range, search) from a GET-style mapping."""
+    logs = AuditLog.objects.select_related('user').order_by('-timestamp')
+    user_id = params.get('user')
+    year = params.get('year')
+    month = params.get('month')
+    search = params.get('search')
+
+    if user_id:
+        logs = logs.filter(user_id=user_id)
+    # Date filters are expressed as timestamp ranges so they can use the
+    # (user, -timestamp) and (-timestamp) indexes
+    start, end = timestamp_range(params)
+    if start is not None:
+        logs = logs.filter(timestamp__gte=start, timestamp__lt=end)
+    if month and not year:
+        logs = logs.filter(timestamp__month=month)
+    if search:
+        logs = search_audit_logs(logs, search)
+    return logs
+
+
+EXPORT_COLUMNS = ['User', 'Action', 'Model', 'Object ID', 'Timestamp', 'Changes']
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_rows(logs, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per log in EXPORT_COLUMNS order, streamed from the database
+    in chunks. An AuditLogHistory also yields its archived rows after the live ones.
+    """
+    archived = getattr(logs, 'archived_rows', None)
+    logs = getattr(logs, 'live', logs)
+    rows = logs.values_list('user__username', 'action', 'model_name', 'object_id', 'timestamp', 'changes')
+    for username, action, model_name, object_id, timestamp, changes in rows.iterator(chunk_size=chunk_size):
+        yield (
+            username or 'System',
+            action,
+            model_name,
+            object_id,
+            timestamp.isoformat(sep=' ', timespec='minutes') if timestamp else '',
+            changes or '',
+        )
+    if archived is not None:
+        for row in archived():
+            yield (
+                row['username'] or 'System',
+                row['action'],
+                row['model_name'],
+                row['object_id'],
+                row['timestamp'].isoformat(sep=' ', timespec='minutes'),
+                row['changes'] or '',
+            )
+
+
+class _Echo:
+    """File-like object whose write() hands the value back, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def stream_audit_csv(logs):
+    """Yield the filtered logs as CSV lines, for a StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in export_rows(logs):
+        yield writer.writerow(row)
+
+
+def write_audit_export(logs, format, output):
+    """
+    Write the filtered logs to the binary file object `output` as `format`
+    ('excel' or 'pdf'). Rows are streamed from the database; the workbook is
+    written in xlsxwriter's constant_memory mode and the PDF is paged with a
+    repeated header, so memory use does not grow with the row count (beyond
+    the PDF document itself).
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'Invalid export format: {format}')
+
+    # The writers are imported on first export, not with the views
+    if format == 'excel':
+        import xlsxwriter
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'in_memory': False})
+        worksheet = workbook.add_worksheet('Audit Logs')
+        header = workbook.add_format({'bold': True})
+        worksheet.write_row(0, 0, EXPORT_COLUMNS, header)
+        for row_number, row in enumerate(export_rows(logs), start=1):
+            worksheet.write_row(row_number, 0, row)
+        workbook.close()
+        return
+
+    from fpdf import FPDF
+    col_widths = [30, 20, 25, 20, 40, 55]
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+
+    def start_page():
+        pdf.add_page()
+        if pdf.page_no() == 1:
+            pdf.set_font('Arial', 'B', 14)
+            pdf.cell(0, 10, 'Audit Logs', ln=True, align='C')
+            pdf.ln(5)
+        pdf.set_font('Arial', 'B', 10)
+        for width, heading in zip(col_widths, EXPORT_COLUMNS):
+            pdf.cell(width, 8, heading, border=1)
+        pdf.ln()
+        pdf.set_font('Arial', '', 9)
+
+    start_page()
+    for row in export_rows(logs):
+        if pdf.get_y() + 8 > pdf.h - pdf.b_margin:
+            start_page()
+        changes = row[5]
+        cells = list(row[:5]) + [(changes[:40] + '...') if len(changes) > 40 else (changes or '-')]
+        for width, cell in zip(col_widths, cells):
+            pdf.cell(width, 8, str(cell), border=1)
+        pdf.ln()
+    pdf.output(output)
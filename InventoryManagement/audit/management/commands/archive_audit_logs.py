@@ -0,0 +1,33 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from audit.archive import archive_audit_logs, archive_dir
+from audit.exports import _day_start
+from audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = 'Move audit log rows older than the retention window into compressed monthly archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=getattr(settings, 'AUDIT_RETENTION_DAYS', 365),
+            help='Keep rows from this many most recent days in the database',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows archived per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be archived')
+
+    def handle(self, *args, **options):
+        before = _day_start(timezone.localdate() - timedelta(days=options['retention_days']))
+        if options['dry_run']:
+            count = AuditLog.objects.filter(timestamp__lt=before).count()
+            self.stdout.write(f"{count} audit row(s) older than {before:%Y-%m-%d} would be archived")
+            return
+        started = time.perf_counter()
+        archived = archive_audit_logs(before, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} audit row(s) older than {before:%Y-%m-%d} to {archive_dir()} in {elapsed:.2f}s"
+        ))
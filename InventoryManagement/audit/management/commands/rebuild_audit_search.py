@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from audit.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over audit log entries'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt audit search index ({backend.__class__.__name__}) in {elapsed:.2f}s"))
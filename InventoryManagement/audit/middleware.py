@@ -0,0 +1,12 @@
+from .writer import audit_batch
+
+
+class AuditBatchMiddleware:
+    """Write the audit entries of a request with one bulk insert once it has been handled."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_batch():
+            return self.get_response(request)
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE audit_auditlog_fts USING fts5("
+    "action, model_name, changes, content='audit_auditlog', content_rowid='id', tokenize='unicode61')",
+    "CREATE TRIGGER audit_auditlog_fts_ai AFTER INSERT ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(rowid, action, model_name, changes) "
+    "VALUES (new.id, new.action, new.model_name, new.changes); END",
+    "CREATE TRIGGER audit_auditlog_fts_ad AFTER DELETE ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts, rowid, action, model_name, changes) "
+    "VALUES ('delete', old.id, old.action, old.model_name, old.changes); END",
+    "CREATE TRIGGER audit_auditlog_fts_au AFTER UPDATE ON audit_auditlog BEGIN "
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts, rowid, action, model_name, changes) "
+    "VALUES ('delete', old.id, old.action, old.model_name, old.changes); "
+    "INSERT INTO audit_auditlog_fts(rowid, action, model_name, changes) "
+    "VALUES (new.id, new.action, new.model_name, new.changes); END",
+    "INSERT INTO audit_auditlog_fts(audit_auditlog_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS audit_auditlog_fts_ai',
+    'DROP TRIGGER IF EXISTS audit_auditlog_fts_ad',
+    'DROP TRIGGER IF EXISTS audit_auditlog_fts_au',
+    'DROP TABLE IF EXISTS audit_auditlog_fts',
+]
+POSTGRESQL_FORWARD = [
+    "ALTER TABLE audit_auditlog ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "to_tsvector('simple', coalesce(action, '') || ' ' || coalesce(model_name, '') || ' ' || coalesce(changes, ''))"
+    ") STORED",
+    'CREATE INDEX auditlog_search_idx ON audit_auditlog USING GIN (search_vector)',
+]
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS auditlog_search_idx',
+    'ALTER TABLE audit_auditlog DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_index = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_search_index = _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_auditlog_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['model_name', 'object_id', '-timestamp'], name='auditlog_object_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,12 +1,14 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=255)
     model_name = models.CharField(max_length=255)
     object_id = models.PositiveIntegerField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the entry is logged, not when the buffered writer inserts it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     changes = models.TextField(blank=True, null=True)
 
     def __str__(self):
@@ -14,10 +16,33 @@ class AuditLog(models.Model):
 
     @staticmethod
     def log(user, action, instance, changes=None):
-        AuditLog.objects.create(
+        """Queue an entry with the audit writer; it is saved once the current transaction commits."""
+        from .writer import get_audit_writer
+        get_audit_writer().add(AuditLog(
             user=user,
             action=action,
             model_name=instance.__class__.__name__,
             object_id=instance.pk,
             changes=changes or ''
-        )
+        ))
+
+    @staticmethod
+    def log_many(user, action, instances, batch_size=1000):
+        """Write one audit row per instance with a single bulk insert."""
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=user,
+                action=action,
+                model_name=instance.__class__.__name__,
+                object_id=instance.pk,
+                changes='',
+            )
+            for instance in instances
+        ], batch_size=batch_size)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='auditlog_user_ts_idx'),
+            models.Index(fields=['-timestamp'], name='auditlog_ts_idx'),
+            models.Index(fields=['model_name', 'object_id', '-timestamp'], name='auditlog_object_idx'),
+        ]
@@ -1,8 +1,23 @@
+import tempfile
+from datetime import datetime
+from io import BytesIO, StringIO
+from openpyxl import load_workbook
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.utils import timezone
+from django.db import transaction
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import AuditLog
+from .exports import write_audit_export
+from .writer import AuditWriter
+from .archive import AuditLogHistory, archive_audit_logs, audit_history, read_index
+from .exports import export_rows, filter_audit_logs
+from .search import parse_search
+from users.models import Role
+from InventoryManagement.query_plans import QueryPlanMixin
 
 User = get_user_model()
 
@@ -24,3 +39,254 @@ class AuditAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
+
+
+class AuditQueryPlanTest(QueryPlanMixin, APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='Admin')
+        self.user = User.objects.create_user(username='admin', password='adminpass', role=role)
+        self.client.login(username='admin', password='adminpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            AuditLog.log(self.user, 'Test action', self.user)
+
+    def test_filtered_log_pages_use_indexes(self):
+        url = reverse('audit-logs')
+        self.assertViewUsesIndexes(url, [AuditLog])
+        self.assertViewUsesIndexes(url, [AuditLog], {'user': self.user.id})
+        self.assertViewUsesIndexes(url, [AuditLog], {'date': '2026-01-15'})
+        response = self.assertViewUsesIndexes(url, [AuditLog], {'start_date': '2020-01-01', 'end_date': '2099-12-31', 'user': self.user.id})
+        self.assertEqual(len(response.context['logs']), 1)
+
+    def test_user_filter_uses_user_timestamp_index(self):
+        self.assertQuerysetUsesIndex(AuditLog.objects.filter(user=self.user).order_by('-timestamp'), 'auditlog_user_ts_idx')
+
+    def test_log_pages_use_cursors(self):
+        AuditLog.log_many(self.user, 'created', [self.user] * 119)
+        url, seen = reverse('audit-logs'), []
+        response = self.client.get(url, {'user': self.user.id})
+        while True:
+            seen.extend(log.id for log in response.context['logs'])
+            cursor = response.context['page_obj'].next_cursor
+            if cursor is None:
+                break
+            response = self.assertViewUsesIndexes(url, [AuditLog], {'user': self.user.id, 'cursor': cursor})
+        self.assertEqual(seen, list(AuditLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)))
+        self.assertContains(response, f'?user={self.user.id}&cursor=')
+        # Ranked search results keep numbered pages
+        response = self.client.get(url, {'search': 'created', 'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 2)
+
+
+class AuditExportTest(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='Admin')
+        self.user = User.objects.create_user(username='admin', password='adminpass', role=role)
+        self.client.login(username='admin', password='adminpass')
+        AuditLog.log_many(self.user, 'created', [self.user] * 450)
+        AuditLog.objects.create(user=None, action='cleanup', model_name='Job', object_id=1, changes='x' * 60)
+
+    def test_csv_export_streams_every_row(self):
+        response = self.client.get(reverse('audit-logs'), {'export': 'csv'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'User,Action,Model,Object ID,Timestamp,Changes')
+        self.assertEqual(len(lines), 452)
+        self.assertTrue(lines[1].startswith('System,cleanup,Job,1,'))
+
+    def test_csv_export_applies_filters(self):
+        response = self.client.get(reverse('audit-logs'), {'export': 'csv', 'search': 'cleanup'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+    def test_excel_export_contains_every_row(self):
+        output = BytesIO()
+        write_audit_export(AuditLog.objects.order_by('-timestamp'), 'excel', output)
+        sheet = load_workbook(BytesIO(output.getvalue()), read_only=True)['Audit Logs']
+        self.assertEqual(sum(1 for _ in sheet.iter_rows()), 452)
+
+    def test_pdf_export_is_paged_not_truncated(self):
+        output = BytesIO()
+        write_audit_export(AuditLog.objects.order_by('-timestamp'), 'pdf', output)
+        # ~32 rows a page: 451 rows need 14 pages, the old 200-row cut-off fitted in 7
+        self.assertEqual(output.getvalue().count(b'/Type /Page\n'), 14)
+
+
+class AuditWriterTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='writerpass')
+        self.writer = AuditWriter(batch_size=100)
+
+    def entry(self, action):
+        return AuditLog(user=self.user, action=action, model_name=self.user.__class__.__name__, object_id=self.user.pk, changes='')
+
+    def test_entries_are_written_together_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True), self.writer.batch():
+            for i in range(5):
+                self.writer.add(self.entry(f'action {i}'))
+            self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(AuditLog.objects.count(), 5)
+        self.assertEqual(self.writer.stats(), {'queued': 5, 'flushed': 5, 'dropped': 0})
+
+    def test_batch_is_one_insert(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(5):
+                self.writer.add(self.entry(f'action {i}'))
+        with self.assertNumQueries(1), self.writer.batch():
+            for callback in callbacks:
+                callback()
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_rolled_back_savepoint_discards_its_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.writer.add(self.entry('kept'))
+            try:
+                with transaction.atomic():
+                    self.writer.add(self.entry('discarded'))
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['kept'])
+        self.assertEqual(self.writer.stats()['flushed'], 1)
+
+    def test_queue_full_drops_entries(self):
+        writer = AuditWriter(background=True, queue_size=2, queue_timeout=0)
+        writer.write([self.entry(f'action {i}') for i in range(3)])
+        self.assertEqual(writer.queue.qsize(), 2)
+        self.assertEqual(writer.stats()['dropped'], 1)
+
+    def test_log_keeps_signature_and_timestamp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            AuditLog.log(self.user, 'updated', self.user, changes='name')
+        log = AuditLog.objects.get()
+        self.assertEqual((log.action, log.model_name, log.object_id, log.changes), ('updated', self.user.__class__.__name__, self.user.pk, 'name'))
+        self.assertIsNotNone(log.timestamp)
+
+
+class AuditBackgroundWriterTest(APITransactionTestCase):
+    def test_background_thread_drains_queue_on_shutdown(self):
+        writer = AuditWriter(batch_size=10, background=True, flush_interval=0.05)
+        for i in range(25):
+            writer.add(AuditLog(user=None, action=f'action {i}', model_name='Job', object_id=i, changes=''))
+        writer.start()
+        writer.shutdown()
+        self.assertEqual(AuditLog.objects.count(), 25)
+        self.assertEqual(writer.stats(), {'queued': 25, 'flushed': 25, 'dropped': 0})
+
+
+class AuditArchiveTest(APITestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        settings_override = override_settings(AUDIT_ARCHIVE_DIR=self.archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        role = Role.objects.create(name='Admin')
+        self.user = User.objects.create_user(username='admin', password='adminpass', role=role)
+        self.client.login(username='admin', password='adminpass')
+        for day in range(1, 4):
+            for hour in range(2):
+                AuditLog.objects.create(
+                    user=self.user, action=f'old {day}-{hour}', model_name='Product', object_id=day,
+                    timestamp=timezone.make_aware(datetime(2024, 3, day, 9 + hour)), changes='price',
+                )
+        AuditLog.objects.create(user=None, action='april', model_name='Job', object_id=9, timestamp=timezone.make_aware(datetime(2024, 4, 2, 12)))
+        self.recent = AuditLog.objects.create(user=self.user, action='recent', model_name='Product', object_id=1)
+
+    def archive(self, before=None):
+        return archive_audit_logs(before or timezone.make_aware(datetime(2025, 1, 1)), batch_size=4)
+
+    def test_old_rows_move_to_monthly_archives(self):
+        self.assertEqual(self.archive(), 7)
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['recent'])
+        march = read_index(2024, 3)
+        self.assertEqual(sum(member['rows'] for member in march), 6)
+        self.assertEqual(march[1]['offset'], march[0]['offset'] + march[0]['length'])
+        self.assertEqual([member['rows'] for member in read_index(2024, 4)], [1])
+
+    def test_archive_command(self):
+        call_command('archive_audit_logs', retention_days=30, stdout=StringIO())
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    def test_date_range_reads_live_and_archived_rows(self):
+        self.archive()
+        logs = audit_history({'start_date': '2024-03-02', 'end_date': '2099-12-31'})
+        self.assertIsInstance(logs, AuditLogHistory)
+        self.assertEqual(logs.count(), 6)
+        self.assertEqual([log.action for log in logs[0:6]], ['recent', 'april', 'old 3-1', 'old 3-0', 'old 2-1', 'old 2-0'])
+        self.assertEqual([log.action for log in logs[2:4]], ['old 3-1', 'old 3-0'])
+
+    def test_archive_filters_by_user_and_search(self):
+        self.archive()
+        self.assertEqual(audit_history({'year': '2024', 'user': str(self.user.id)}).count(), 6)
+        self.assertEqual([log.action for log in audit_history({'year': '2024', 'search': 'APR'})[0:10]], ['april'])
+        self.assertEqual(audit_history({'date': '2024-03-01', 'search': 'nothing'}).count(), 0)
+
+    def test_queries_without_archived_range_stay_live(self):
+        self.archive()
+        self.assertNotIsInstance(audit_history({}), AuditLogHistory)
+        self.assertNotIsInstance(audit_history({'start_date': '2025-06-01', 'end_date': '2099-12-31'}), AuditLogHistory)
+
+    def test_interrupted_append_is_truncated(self):
+        self.archive(timezone.make_aware(datetime(2024, 3, 2)))
+        path = f'{self.archive_dir.name}/audit-2024-03.jsonl.gz'
+        with open(path, 'ab') as f:
+            f.write(b'partial member')
+        self.archive()
+        logs = audit_history({'year': '2024', 'month': '3'})
+        self.assertEqual(logs.count(), 6)
+
+    def test_page_and_export_include_archived_rows(self):
+        self.archive()
+        response = self.client.get(reverse('audit-logs'), {'year': '2024', 'month': '3'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['logs']), 6)
+        self.assertIn(2024, response.context['years'])
+        rows = list(export_rows(audit_history({'start_date': '2024-01-01', 'end_date': '2099-12-31'})))
+        self.assertEqual([row[1] for row in rows][:3], ['recent', 'april', 'old 3-1'])
+        self.assertEqual(rows[1][0], 'System')
+
+
+class AuditSearchTest(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='Admin')
+        self.user = User.objects.create_user(username='admin', password='adminpass', role=role)
+        self.other = User.objects.create_user(username='clerk', password='clerkpass')
+        self.client.login(username='admin', password='adminpass')
+        AuditLog.objects.create(user=self.user, action='updated', model_name='Product', object_id=7, changes='price 10 -> 12')
+        AuditLog.objects.create(user=self.other, action='updated', model_name='Product', object_id=8, changes='price changed, price raised')
+        AuditLog.objects.create(user=self.other, action='stock in', model_name='StockEntry', object_id=7, changes='')
+
+    def search(self, text):
+        return list(filter_audit_logs({'search': text}).values_list('object_id', flat=True))
+
+    def test_parse_typed_filters(self):
+        self.assertEqual(
+            parse_search('user:"john doe" model:Product id:42 price  Change'),
+            ({'user': 'john doe', 'model': 'Product', 'id': '42'}, ['price', 'change']),
+        )
+
+    def test_prefix_terms_are_ranked(self):
+        self.assertEqual(self.search('pric'), [8, 7])
+        self.assertEqual(self.search('price raised'), [8])
+        self.assertEqual(self.search('stock'), [7])
+
+    def test_typed_filters(self):
+        self.assertEqual(self.search('user:clerk'), [7, 8])
+        self.assertEqual(self.search('model:product id:7'), [7])
+        self.assertEqual(self.search('id:x'), [])
+        self.assertEqual(self.search('user:admin price'), [7])
+
+    def test_index_follows_updates_and_deletes(self):
+        log = AuditLog.objects.get(object_id=8)
+        log.changes = 'renamed'
+        log.save()
+        self.assertEqual(self.search('raised'), [])
+        self.assertEqual(self.search('renamed'), [8])
+        log.delete()
+        self.assertEqual(self.search('renamed'), [])
+        call_command('rebuild_audit_search', stdout=StringIO())
+        self.assertEqual(self.search('price'), [7])
+
+    def test_page_search(self):
+        response = self.client.get(reverse('audit-logs'), {'search': 'model:StockEntry'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([log.object_id for log in response.context['logs']], [7])
@@ -0,0 +1,173 @@
+"""
+Buffered writer behind AuditLog.log.
+
+Entries logged inside a transaction are held until it commits (and dropped if
+it rolls back); committed entries are collected for the current batch scope
+(one per request, see AuditBatchMiddleware) and written with one bulk_create
+when it closes. Outside any scope they are written straight away.
+
+With AUDIT_WRITER_BACKGROUND enabled the batches are handed to a daemon
+thread through a bounded queue instead. A full queue blocks the caller for up
+to AUDIT_WRITER_QUEUE_TIMEOUT seconds and then drops the entry, so a stalled
+database slows requests down rather than growing memory without bound. The
+queue is drained on interpreter shutdown.
+"""
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+from django.conf import settings
+from django.db import connections, transaction
+from InventoryManagement.databases import retry_on_locked
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    def __init__(self, batch_size=500, background=False, queue_size=10000, queue_timeout=1.0, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.background = background
+        self.queue_timeout = queue_timeout
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counters = {'queued': 0, 'flushed': 0, 'dropped': 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stats(self):
+        """Return a copy of the queued / flushed / dropped counters."""
+        with self._lock:
+            return dict(self.counters)
+
+    def _count(self, name, amount):
+        with self._lock:
+            self.counters[name] += amount
+
+    def add(self, entry):
+        """Accept an unsaved AuditLog; it is written once its transaction commits."""
+        self._count('queued', 1)
+        if transaction.get_connection().in_atomic_block:
+            # One callback per entry so a rolled back savepoint discards
+            # exactly the entries logged inside it.
+            transaction.on_commit(partial(self._committed, entry))
+        else:
+            self._committed(entry)
+
+    def _committed(self, entry):
+        batch = getattr(self._local, 'batch', None)
+        if batch is None:
+            self.write([entry])
+            return
+        batch.append(entry)
+        if len(batch) >= self.batch_size:
+            self._local.batch = []
+            self.write(batch)
+
+    @contextmanager
+    def batch(self):
+        """Collect entries committed inside the block and write them together on exit."""
+        if getattr(self._local, 'batch', None) is not None:
+            # Nested use: the outermost block writes everything
+            yield
+            return
+        self._local.batch = []
+        try:
+            yield
+        finally:
+            entries, self._local.batch = self._local.batch, None
+            if entries:
+                self.write(entries)
+
+    def write(self, entries):
+        """Write committed entries now, or hand them to the background thread."""
+        if not self.background:
+            self._bulk_write(entries)
+            return
+        for entry in entries:
+            try:
+                self.queue.put(entry, timeout=self.queue_timeout)
+            except queue.Full:
+                self._count('dropped', 1)
+                logger.warning('Audit queue full, dropped %s on %s(%s)', entry.action, entry.model_name, entry.object_id)
+
+    def _bulk_write(self, entries):
+        try:
+            retry_on_locked(AuditLog.objects.bulk_create)(entries, batch_size=self.batch_size)
+        except Exception:
+            self._count('dropped', len(entries))
+            logger.exception('Failed to write %s audit entries', len(entries))
+        else:
+            self._count('flushed', len(entries))
+
+    def start(self):
+        """Start the background thread (idempotent) and drain the queue at exit."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self, timeout=10.0):
+        """Stop the background thread after it has written everything queued."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop.is_set() or not self.queue.empty():
+                entries = self._drain()
+                if entries:
+                    self._bulk_write(entries)
+        finally:
+            connections.close_all()
+
+    def _drain(self):
+        """Wait up to flush_interval for an entry, then take whatever else is queued up to batch_size."""
+        try:
+            entries = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(entries) < self.batch_size:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return entries
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Return the process-wide writer configured from the AUDIT_WRITER_* settings."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = AuditWriter(
+                    batch_size=getattr(settings, 'AUDIT_WRITER_BATCH_SIZE', 500),
+                    background=getattr(settings, 'AUDIT_WRITER_BACKGROUND', False),
+                    queue_size=getattr(settings, 'AUDIT_WRITER_QUEUE_SIZE', 10000),
+                    queue_timeout=getattr(settings, 'AUDIT_WRITER_QUEUE_TIMEOUT', 1.0),
+                )
+                if writer.background:
+                    writer.start()
+                _writer = writer
+    return _writer
+
+
+def audit_batch():
+    """Shortcut for get_audit_writer().batch()."""
+    return get_audit_writer().batch()
@@ -0,0 +1,144 @@
+"""
+Reader/writer throughput under concurrency.
+
+run_concurrency() starts `readers` threads that read a product's recent
+ledger rows and balance and `writers` threads that record stock entries
+(through StockEntry.save(), so with the balance update and alert check of a
+real stock-in), all against the same products, for `seconds`. Each thread
+has its own connection. It reports operations per second, p95 latency and
+the writes that still failed with "database is locked".
+
+On SQLite, compare_sqlite_profiles() runs it twice: with SQLite's own
+defaults (rollback journal, full sync, deferred transactions, no lock
+retries) and with the configured SQLITE_PRAGMAS and transaction mode.
+The writes are committed; run it against a benchmark database.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.test import override_settings
+from InventoryManagement.databases import is_locked_error
+from products.models import Product
+from stock.models import StockEntry
+from stock.services import get_available_quantities
+from .harness import percentile
+from .seed import SKU_PREFIX, benchmark_user
+
+# SQLite as it behaves without the tuning layer
+SQLITE_DEFAULTS = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'mmap_size': 0, 'cache_size': -2000, 'temp_store': 'DEFAULT'},
+    'transaction_mode': None,
+    'lock_retries': 1,
+}
+
+
+class _Worker:
+    def __init__(self):
+        self.timings = []
+        self.locked = 0
+
+
+def _read(rng, product_ids):
+    product_id = rng.choice(product_ids)
+    list(StockEntry.objects.filter(product_id=product_id).order_by('-timestamp', '-id').values('quantity', 'timestamp')[:50])
+    get_available_quantities([product_id])
+
+
+def _write(rng, product_ids, user):
+    StockEntry(
+        product_id=rng.choice(product_ids), quantity=1, entry_type='in', created_by=user, description='Concurrency benchmark',
+    ).save()
+
+
+def run_concurrency(readers=4, writers=2, seconds=5.0, products=100, seed=42):
+    """Run the readers and writers together for `seconds`; return their throughput and latency."""
+    user = benchmark_user()
+    product_ids = list(
+        Product.objects.filter(sku__startswith=SKU_PREFIX).order_by('id').values_list('id', flat=True)[:products]
+    ) or list(Product.objects.order_by('id').values_list('id', flat=True)[:products])
+    if not product_ids:
+        raise ValueError('No products to benchmark; run seed_benchmark_data first.')
+    start = threading.Barrier(readers + writers + 1)
+    stop = threading.Event()
+    workers = {'read': [_Worker() for _ in range(readers)], 'write': [_Worker() for _ in range(writers)]}
+
+    def run(kind, index, worker):
+        rng = random.Random(seed * 1000 + index)
+        try:
+            start.wait()
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        _read(rng, product_ids)
+                    else:
+                        _write(rng, product_ids, user)
+                except OperationalError as exc:
+                    if not is_locked_error(exc):
+                        raise
+                    worker.locked += 1
+                    continue
+                worker.timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=run, args=(kind, index, worker))
+        for kind, group in workers.items() for index, worker in enumerate(group)
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for kind, group in workers.items():
+        timings = [timing for worker in group for timing in worker.timings]
+        results[kind] = {
+            'threads': len(group),
+            'ops': len(timings),
+            'ops_per_sec': round(len(timings) / seconds, 1),
+            'p95_ms': round(percentile(timings, 95), 2) if timings else None,
+            'locked': sum(worker.locked for worker in group),
+        }
+    return results
+
+
+@contextmanager
+def _sqlite_profile(pragmas, transaction_mode, lock_retries):
+    """Open new connections with these settings for the duration of the block."""
+    options = connections.settings[DEFAULT_DB_ALIAS]['OPTIONS']
+    saved = dict(options)
+    options.pop('transaction_mode', None)
+    if transaction_mode:
+        options['transaction_mode'] = transaction_mode
+    connections.close_all()
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas, SQLITE_LOCK_RETRIES=lock_retries):
+            # Switching the journal mode needs the only open connection
+            connections[DEFAULT_DB_ALIAS].ensure_connection()
+            yield
+    finally:
+        connections.close_all()
+        options.clear()
+        options.update(saved)
+
+
+def compare_sqlite_profiles(**kwargs):
+    """{'defaults': ..., 'tuned': ...} run_concurrency() results on SQLite."""
+    tuned = {
+        'pragmas': getattr(settings, 'SQLITE_PRAGMAS', {}),
+        'transaction_mode': connections.settings[DEFAULT_DB_ALIAS]['OPTIONS'].get('transaction_mode'),
+        'lock_retries': getattr(settings, 'SQLITE_LOCK_RETRIES', 4),
+    }
+    results = {}
+    for label, profile in (('defaults', SQLITE_DEFAULTS), ('tuned', tuned)):
+        with _sqlite_profile(**profile):
+            results[label] = run_concurrency(**kwargs)
+    return results
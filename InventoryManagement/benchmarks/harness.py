@@ -0,0 +1,274 @@
+"""
+Benchmark harness for the hot paths.
+
+Each scenario is a function that performs one operation (a page request
+through the full middleware stack, an export, a bulk upload, an alert run)
+against the current database, normally one seeded by seed_benchmark_data.
+run_benchmarks() runs each scenario a few times to warm up and then
+`iterations` times under profile(), and reports per scenario:
+
+    p50_ms, p95_ms, mean_ms   wall time of one operation
+    ops_per_sec               operations per second, one at a time
+    queries                   most queries seen in one operation
+    peak_memory_kib           tracemalloc peak of one extra, untimed run
+
+Scenarios that write (bulk upload, check_alerts) run inside a transaction
+that is rolled back, so repeated runs measure the same data.
+
+compare_results() checks a run against a saved baseline (a previous
+run_benchmarks() result): a scenario regresses when its p95 is more than
+`tolerance` slower (and at least NOISE_FLOOR_MS, so sub-millisecond jitter
+is ignored) or when it runs more queries.
+"""
+import random
+from datetime import timedelta
+from io import BytesIO, StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from InventoryManagement.profiling import profile
+from audit.exports import filter_audit_logs, write_audit_export
+from products.models import Product
+from reports.exports import build_statistics_export
+from stock.importers import ingest_stock_sheet
+from stock.models import StockEntry
+from .seed import SKU_PREFIX, benchmark_user
+
+NOISE_FLOOR_MS = 5.0
+UPLOAD_ROWS = 500
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a scenario function taking a BenchmarkContext."""
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+class BenchmarkContext:
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+        self.user = benchmark_user()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.product_ids = list(
+            Product.objects.filter(sku__startswith=SKU_PREFIX).order_by('id').values_list('id', flat=True)[:1000]
+        ) or list(Product.objects.order_by('id').values_list('id', flat=True)[:1000])
+        self._upload = None
+
+    def get(self, url, params=None):
+        """GET `url` through the full middleware stack, reading any streamed body."""
+        response = self.client.get(url, params)
+        if response.status_code != 200:
+            raise AssertionError(f'GET {url} returned {response.status_code}')
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def upload_workbook(self):
+        """The bytes of a bulk stock-in sheet with UPLOAD_ROWS rows of existing products."""
+        if self._upload is None:
+            names = list(Product.objects.filter(id__in=self.product_ids).values_list('name', flat=True))
+            wb = Workbook()
+            ws = wb.active
+            ws.append(['Product Name', 'Quantity'])
+            for i in range(UPLOAD_ROWS):
+                ws.append([names[i % len(names)], 1 + i % 10])
+            output = BytesIO()
+            wb.save(output)
+            self._upload = output.getvalue()
+        return BytesIO(self._upload)
+
+    def recent_window(self, days=30):
+        today = timezone.localdate()
+        return {'start_date': (today - timedelta(days=days)).isoformat(), 'end_date': today.isoformat()}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def rolled_back(func):
+    """Run `func(context)` in a transaction that is always rolled back."""
+    def run(context):
+        try:
+            with transaction.atomic():
+                func(context)
+                raise _Rollback
+        except _Rollback:
+            pass
+    run.__name__ = func.__name__
+    return run
+
+
+@scenario('dashboard')
+def dashboard(context):
+    # Cold KPIs: the cached values would otherwise hide the queries
+    cache.clear()
+    context.get(reverse('dashboard-page'))
+
+
+@scenario('product_detail')
+def product_detail(context):
+    context.get(reverse('product-detail', args=[context.rng.choice(context.product_ids)]))
+
+
+@scenario('shortage_page')
+def shortage_page(context):
+    context.get(reverse('inventory-shortage-page'))
+
+
+@scenario('shortage_export_csv')
+def shortage_export_csv(context):
+    context.get(reverse('inventory-shortage-export-csv'))
+
+
+@scenario('shortage_export_pdf')
+def shortage_export_pdf(context):
+    context.get(reverse('inventory-shortage-export-pdf'))
+
+
+@scenario('bulk_stock_upload')
+@rolled_back
+def bulk_stock_upload(context):
+    ingest_stock_sheet(context.upload_workbook(), 'in', context.user)
+
+
+@scenario('check_alerts')
+@rolled_back
+def check_alerts(context):
+    call_command('check_alerts', stdout=StringIO())
+
+
+@scenario('statistics_report')
+def statistics_report(context):
+    context.get(reverse('statistics-report'))
+
+
+@scenario('statistics_export_excel')
+def statistics_export_excel(context):
+    build_statistics_export('excel')
+
+
+@scenario('audit_search')
+def audit_search(context):
+    context.get(reverse('audit-logs'), {'search': 'stock'})
+
+
+@scenario('audit_export_csv')
+def audit_export_csv(context):
+    context.get(reverse('audit-logs'), {'export': 'csv', **context.recent_window()})
+
+
+@scenario('audit_export_excel')
+def audit_export_excel(context):
+    write_audit_export(filter_audit_logs(context.recent_window()), 'excel', BytesIO())
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of `values` (pct in 0..100)."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_scenario(func, context, iterations=10, warmup=2):
+    for _ in range(warmup):
+        func(context)
+    timings, queries = [], []
+    for _ in range(iterations):
+        with profile() as result:
+            func(context)
+        timings.append(result.elapsed * 1000)
+        queries.append(result.query_count)
+    with profile(trace_memory=True) as result:
+        func(context)
+    mean = sum(timings) / len(timings)
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'mean_ms': round(mean, 2),
+        'ops_per_sec': round(1000 / mean, 1) if mean else None,
+        'queries': max(queries),
+        'peak_memory_kib': round(result.peak_memory / 1024),
+    }
+
+
+def table_sizes():
+    return {
+        'products': Product.objects.count(),
+        'stock_entries': StockEntry.objects.count(),
+    }
+
+
+def run_benchmarks(names=None, iterations=10, warmup=2, seed=42, progress=None):
+    """Run the named scenarios (all by default) and return the results as a JSON-able dict."""
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise KeyError(f'Unknown benchmark(s): {", ".join(unknown)}')
+    results = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'iterations': iterations,
+            'tables': table_sizes(),
+        },
+        'scenarios': {},
+    }
+    # The harness profiles each operation itself; request logging and
+    # budgets would only add noise, and DEBUG keeps every query in memory
+    with override_settings(DEBUG=False, PROFILING_ENABLED=False, QUERY_BUDGETS_STRICT=False, ALLOWED_HOSTS=['testserver']):
+        context = BenchmarkContext(seed)
+        for name in names:
+            results['scenarios'][name] = run_scenario(SCENARIOS[name], context, iterations, warmup)
+            if progress:
+                progress(name, results['scenarios'][name])
+    return results
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """Return a list of regression messages for `results` against `baseline`."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+        slower = current['p95_ms'] - previous['p95_ms']
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and slower >= NOISE_FLOOR_MS:
+            regressions.append(f"{name}: p95 {current['p95_ms']:.1f}ms vs {previous['p95_ms']:.1f}ms baseline")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: {current['queries']} queries vs {previous['queries']} baseline")
+    return regressions
+
+
+def comparison_table(runs):
+    """
+    A Markdown table of p95 and throughput per scenario for `runs`, a
+    {label: run_benchmarks() result} dict (e.g. one run per database).
+    """
+    labels = list(runs)
+    names = list(dict.fromkeys(name for run in runs.values() for name in run['scenarios']))
+    lines = [
+        '| scenario | ' + ' | '.join(f'{label} p95 ms | {label} ops/s' for label in labels) + ' |',
+        '|---|' + '---:|---:|' * len(labels),
+    ]
+    for name in names:
+        cells = []
+        for label in labels:
+            result = runs[label]['scenarios'].get(name)
+            cells += [f"{result['p95_ms']:.1f}", f"{result.get('ops_per_sec') or ''}"] if result else ['', '']
+        lines.append(f'| {name} | ' + ' | '.join(cells) + ' |')
+    return '\n'.join(lines)
@@ -0,0 +1,36 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from benchmarks.concurrency import compare_sqlite_profiles, run_concurrency
+
+
+class Command(BaseCommand):
+    help = 'Measure reader and writer throughput with concurrent threads (on SQLite, before and after the tuning layer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads (each write is committed)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='How long each run lasts')
+        parser.add_argument('--products', type=int, default=100, help='Products the threads work on; fewer means more contention')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        kwargs = {name: options[name] for name in ('readers', 'writers', 'seconds', 'products')}
+        try:
+            if connection.vendor == 'sqlite':
+                runs = compare_sqlite_profiles(**kwargs)
+            else:
+                runs = {connection.vendor: run_concurrency(**kwargs)}
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(f"{'profile':<12}{'reads/s':>10}{'read p95':>10}{'writes/s':>10}{'write p95':>11}{'locked':>8}")
+        for label, result in runs.items():
+            read, write = result['read'], result['write']
+            self.stdout.write(
+                f"{label:<12}{read['ops_per_sec']:>10.1f}{read['p95_ms'] or 0:>10.1f}"
+                f"{write['ops_per_sec']:>10.1f}{write['p95_ms'] or 0:>11.1f}{read['locked'] + write['locked']:>8}"
+            )
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(runs, indent=2) + '\n')
+            self.stdout.write(f"Results written to {options['output']}")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.startup import BUDGET_FILE, check_startup, load_budget, measure_startup, record_budget
+
+
+class Command(BaseCommand):
+    help = 'Check that a fresh worker does not import the export libraries, and report its import time and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to measure, each for the worker and the reference (the median is used)')
+        parser.add_argument('--budget', default=BUDGET_FILE, help='Budget file (default: %(default)s)')
+        parser.add_argument('--record', action='store_true', help='Save this measurement plus --headroom as the budget')
+        parser.add_argument('--headroom', type=float, default=0.25, help='Margin added when recording (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        result = measure_startup(options['runs'])
+        reference = result['reference']
+        self.stdout.write(
+            f"Imports: {result['import_ms']:.0f}ms ({result['import_ratio']:.2f}x django.setup() at {reference['import_ms']:.0f}ms), "
+            f"peak RSS: {result['rss_mib']:.0f} MiB ({result['rss_ratio']:.2f}x {reference['rss_mib']:.0f} MiB)"
+        )
+        for entry in result['slowest']:
+            self.stdout.write(f"  {entry['ms']:>8.1f}ms  {entry['module']}")
+        if options['record']:
+            if result['lazy_loaded']:
+                raise CommandError('Not recording: imported at start-up: ' + ', '.join(result['lazy_loaded']))
+            budget = record_budget(result, options['headroom'], options['budget'])
+            self.stdout.write(self.style.SUCCESS(f"Budget recorded: {budget['import_ratio']}x imports, {budget['rss_ratio']}x RSS"))
+            return
+        try:
+            budget = load_budget(options['budget'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read budget {options['budget']}: {exc}")
+        problems, warnings = check_startup(result, budget)
+        for warning in warnings:
+            self.stdout.write(self.style.WARNING(f"Advisory: {warning}"))
+        if problems:
+            raise CommandError('Start-up imports libraries that should load lazily:\n  ' + '\n  '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No export libraries imported at start-up'))
@@ -0,0 +1,22 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.harness import comparison_table
+
+
+class Command(BaseCommand):
+    help = 'Print a Markdown table comparing saved run_benchmarks results, e.g. the same run on SQLite and PostgreSQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('results', nargs='+', help='Result files, optionally labelled as label=path')
+
+    def handle(self, *args, **options):
+        runs = {}
+        for argument in options['results']:
+            label, _, path = argument.rpartition('=')
+            label = label or Path(path).stem
+            try:
+                runs[label] = json.loads(Path(path).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+        self.stdout.write(comparison_table(runs))
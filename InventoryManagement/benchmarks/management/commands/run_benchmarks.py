@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.harness import SCENARIOS, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time the hot views, exports and batch jobs (p50/p95, queries, memory) and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)})')
+        parser.add_argument('--iterations', type=int, default=10, help='Timed runs per scenario')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs before timing')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file and fail on regressions')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown against the baseline (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+        self.stdout.write(f"{'scenario':<26}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>10}")
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<26}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['queries']:>9}{result['peak_memory_kib']:>10}"
+            )
+
+        try:
+            results = run_benchmarks(options['scenarios'], options['iterations'], options['warmup'], progress=progress)
+        except KeyError as exc:
+            raise CommandError(exc.args[0])
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f"Results written to {options['output']}")
+        if baseline is not None:
+            regressions = compare_results(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,219 @@
+"""
+Synthetic data for benchmarking the hot views at production-like volumes.
+
+seed_benchmark_data() inserts categories, products (with quantity limits),
+a stock ledger, adjustments, rentals and audit rows with bulk_create, one
+transaction per batch. Values come from random.Random(seed), so the same
+seed on an empty database gives the same data. Rows are spread over the
+last `days` days with timestamps that increase with the id, as they do in
+a real ledger.
+
+bulk_create sends no signals, so the derived tables (stock and location
+balances, snapshots, the daily rollup, the product search index and the
+alerts) are rebuilt once at the end, exactly as their rebuild commands do.
+"""
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import time, timedelta
+from itertools import accumulate
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from audit.models import AuditLog
+from inventory.alerts import evaluate_alerts
+from inventory.models import InventoryAdjustment, QuantityLimit, Rental
+from products.models import Category, Product
+from products.search import rebuild_product_search
+from reports.rollup import rebuild_rollup
+from stock.models import StockEntry
+from stock.services import rebuild_stock_balances
+from stock.snapshots import rollup_snapshots
+from users.models import Role
+
+SKU_PREFIX = 'BM-'
+BENCHMARK_USER = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark'
+
+# Volumes at scale 1
+DEFAULT_VOLUMES = {
+    'products': 100_000,
+    'stock_entries': 10_000_000,
+    'adjustments': 100_000,
+    'rentals': 50_000,
+    'audit_rows': 1_000_000,
+}
+
+CATEGORIES = [
+    'Cables', 'Connectors', 'Audio', 'Video', 'Lighting', 'Power', 'Networking', 'Storage',
+    'Tools', 'Fasteners', 'Sensors', 'Displays', 'Controllers', 'Cases', 'Batteries', 'Adapters',
+]
+BRANDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay', 'Stark', 'Wayne', 'Tyrell', 'Soylent']
+ADJECTIVES = ['Compact', 'Heavy Duty', 'Wireless', 'Shielded', 'Portable', 'Industrial', 'Mini', 'Pro', 'Dual', 'Outdoor']
+NOUNS = ['Speaker', 'Cable', 'Adapter', 'Switch', 'Router', 'Lamp', 'Drive', 'Sensor', 'Monitor', 'Charger', 'Relay', 'Hub']
+LOCATIONS = [f'Rack {row}{column}' for row in 'ABCDE' for column in range(1, 5)]
+AUDIT_ACTIONS = ['stock in', 'stock out', 'created', 'updated', 'deleted', 'adjustment manual', 'price change']
+AUDIT_MODELS = ['StockEntry', 'Product', 'InventoryAdjustment', 'Category', 'Rental']
+
+
+def volumes_for(scale=1.0, **overrides):
+    """DEFAULT_VOLUMES multiplied by `scale`, with explicit counts (not None) taking precedence."""
+    volumes = {name: int(count * scale) for name, count in DEFAULT_VOLUMES.items()}
+    volumes.update({name: count for name, count in overrides.items() if count is not None})
+    return volumes
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the timestamps we generate instead of auto_now_add's now()."""
+    fields = [field for model in models for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _spread(count, start, end):
+    """`count` increasing datetimes spread evenly from `start` to `end`."""
+    step = (end - start) / max(count, 1)
+    for i in range(count):
+        yield start + step * i
+
+
+def _insert(model, rows, batch_size, progress=None):
+    """bulk_create the objects from the `rows` iterator, one transaction per batch."""
+    inserted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=batch_size)
+            inserted += len(batch)
+            batch = []
+            if progress:
+                progress(model, inserted)
+    if batch:
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        inserted += len(batch)
+        if progress:
+            progress(model, inserted)
+    return inserted
+
+
+def benchmark_user():
+    role, _ = Role.objects.get_or_create(name='Admin')
+    user, created = get_user_model().objects.get_or_create(username=BENCHMARK_USER, defaults={'role': role})
+    if created:
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+    return user
+
+
+def seed_benchmark_data(volumes, seed=42, days=730, batch_size=5000, progress=None):
+    """
+    Insert the synthetic data set described by `volumes` (see DEFAULT_VOLUMES)
+    and rebuild the derived tables. Returns {table: rows inserted}.
+    """
+    rng = random.Random(seed)
+    user = benchmark_user()
+    end = timezone.now()
+    start = end - timedelta(days=days)
+    inserted = {}
+
+    categories = []
+    for name in CATEGORIES:
+        category, _ = Category.objects.get_or_create(name=name)
+        categories.append(category)
+
+    def products():
+        for i, created_at in enumerate(_spread(volumes['products'], start, end)):
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}'
+            yield Product(
+                name=name,
+                category=rng.choice(categories),
+                brand=rng.choice(BRANDS),
+                description=f'{name} for benchmark runs',
+                sku=f'{SKU_PREFIX}{i:07d}',
+                serial_number=f'BMSN{i:08d}' if rng.random() < 0.3 else None,
+                price=round(rng.uniform(1, 500), 2),
+                created_at=created_at,
+                rack_number=rng.choice(LOCATIONS),
+            )
+
+    with explicit_timestamps(Product, StockEntry, InventoryAdjustment, Rental):
+        inserted['products'] = _insert(Product, products(), batch_size, progress)
+        product_ids = list(Product.objects.filter(sku__startswith=SKU_PREFIX).order_by('id').values_list('id', flat=True))
+        if not product_ids:
+            return inserted
+
+        # A fifth of the products have a limit
+        limits = (
+            QuantityLimit(product_id=product_id, limit_quantity=rng.randint(5, 50), created_by=user)
+            for product_id in product_ids if rng.random() < 0.2
+        )
+        inserted['quantity_limits'] = _insert(QuantityLimit, limits, batch_size, progress)
+
+        # Popular products get most of the traffic, as in a real catalogue
+        cumulative = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(product_ids))))
+
+        def stock_entries():
+            for timestamp in _spread(volumes['stock_entries'], start, end):
+                product_id = product_ids[min(bisect(cumulative, rng.random() * cumulative[-1]), len(product_ids) - 1)]
+                if rng.random() < 0.65:
+                    yield StockEntry(
+                        product_id=product_id, quantity=rng.randint(1, 50), entry_type='in',
+                        location_to=rng.choice(LOCATIONS), timestamp=timestamp, created_by=user,
+                    )
+                else:
+                    yield StockEntry(
+                        product_id=product_id, quantity=rng.randint(1, 20), entry_type='out',
+                        location_from=rng.choice(LOCATIONS), timestamp=timestamp, created_by=user,
+                    )
+
+        inserted['stock_entries'] = _insert(StockEntry, stock_entries(), batch_size, progress)
+
+        def adjustments():
+            for timestamp in _spread(volumes['adjustments'], start, end):
+                yield InventoryAdjustment(
+                    product_id=rng.choice(product_ids), adjustment_type=rng.choice(['manual', 'automated']),
+                    quantity=rng.randint(1, 10), reason='Benchmark count correction', timestamp=timestamp, created_by=user,
+                )
+
+        inserted['adjustments'] = _insert(InventoryAdjustment, adjustments(), batch_size, progress)
+
+        def rentals():
+            for created_at in _spread(volumes['rentals'], start, end):
+                rental_date = created_at.date()
+                returned = created_at < end - timedelta(days=30) and rng.random() < 0.9
+                yield Rental(
+                    product_id=rng.choice(product_ids), quantity=rng.randint(1, 3), rented_to=f'Customer {rng.randint(1, 5000)}',
+                    rental_date=rental_date, rental_time=time(rng.randint(8, 17), rng.choice([0, 15, 30, 45])),
+                    return_date=rental_date + timedelta(days=rng.randint(1, 21)),
+                    status='returned' if returned else 'active', created_at=created_at, created_by=user,
+                )
+
+        inserted['rentals'] = _insert(Rental, rentals(), batch_size, progress)
+
+    def audit_rows():
+        for timestamp in _spread(volumes['audit_rows'], start, end):
+            action = rng.choice(AUDIT_ACTIONS)
+            yield AuditLog(
+                user=user, action=action, model_name=rng.choice(AUDIT_MODELS), object_id=rng.choice(product_ids),
+                timestamp=timestamp, changes=f'{{"quantity": {rng.randint(1, 50)}, "note": "{action} benchmark"}}',
+            )
+
+    inserted['audit_rows'] = _insert(AuditLog, audit_rows(), batch_size, progress)
+
+    # Derived tables, as the rebuild commands would
+    rebuild_stock_balances(batch_size=batch_size)
+    rollup_snapshots(batch_size=batch_size)
+    rebuild_rollup(batch_size=batch_size)
+    rebuild_product_search()
+    for chunk_start in range(0, len(product_ids), batch_size):
+        evaluate_alerts(product_ids[chunk_start:chunk_start + batch_size], batch_size=batch_size)
+    return inserted
@@ -0,0 +1,142 @@
+"""
+Start-up cost of a fresh worker.
+
+measure_startup() starts new interpreters under `python -X importtime`: one
+loads the WSGI application and the URLconf the way a worker does before its
+first request, the other only runs django.setup() as a reference measured
+on the same machine at the same time. It reports:
+
+    import_ms    total time spent importing modules (the sum of -X importtime's self times)
+    rss_mib      peak resident memory of the process
+    reference    import_ms and rss_mib of the bare django.setup()
+    import_ratio, rss_ratio
+                 the worker's figures over the reference's
+    slowest      the top-level imports with the highest cumulative time
+    lazy_loaded  LAZY_MODULES that were imported anyway
+
+The export and import libraries in LAZY_MODULES are only imported by the
+code that uses them, so a worker that never exports never pays for them.
+check_startup() fails on any of them being imported at start-up. Time and
+memory vary too much between machines and runs to fail on, so the ratios
+are only compared with the recorded budget (startup_budget.json, written by
+`manage.py check_startup --record`) and reported when over it.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from django.conf import settings
+
+BUDGET_FILE = Path(__file__).with_name('startup_budget.json')
+LAZY_MODULES = ('pandas', 'numpy', 'openpyxl', 'xlsxwriter', 'fpdf', 'xhtml2pdf', 'reportlab')
+
+REPORT = f"""
+print(json.dumps({{
+    'rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'lazy_loaded': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+WORKER_SCRIPT = """
+import json, resource, sys
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+""" + REPORT
+
+REFERENCE_SCRIPT = """
+import json, resource, sys
+import django
+django.setup()
+""" + REPORT
+
+
+def parse_importtime(output):
+    """[(module, self_us, cumulative_us, depth)] from `-X importtime` output."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        try:
+            imports.append((name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip()) - 1) // 2))
+        except ValueError:
+            # The header line
+            continue
+    return imports
+
+
+def measure_once(script=WORKER_SCRIPT):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    imports = parse_importtime(process.stderr)
+    child = json.loads(process.stdout.strip().splitlines()[-1])
+    top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: -entry[2])
+    return {
+        'import_ms': round(sum(entry[1] for entry in imports) / 1000, 1),
+        'rss_mib': round(child['rss_kib'] / 1024, 1),
+        'slowest': [{'module': name, 'ms': round(cumulative / 1000, 1)} for name, _, cumulative, _ in top_level[:10]],
+        'lazy_loaded': child['lazy_loaded'],
+    }
+
+
+def _median(measurements, key):
+    return round(statistics.median(measurement[key] for measurement in measurements), 1)
+
+
+def measure_startup(runs=3):
+    """Median import time and memory of a worker and of the reference over `runs` fresh interpreters each."""
+    measurements, references = [], []
+    # Alternate, so both see the same load on the machine
+    for _ in range(runs):
+        measurements.append(measure_once())
+        references.append(measure_once(REFERENCE_SCRIPT))
+    result = min(measurements, key=lambda measurement: measurement['import_ms'])
+    result['import_ms'] = _median(measurements, 'import_ms')
+    result['rss_mib'] = _median(measurements, 'rss_mib')
+    result['lazy_loaded'] = sorted({name for measurement in measurements for name in measurement['lazy_loaded']})
+    result['reference'] = {'import_ms': _median(references, 'import_ms'), 'rss_mib': _median(references, 'rss_mib')}
+    result['import_ratio'] = round(result['import_ms'] / result['reference']['import_ms'], 2)
+    result['rss_ratio'] = round(result['rss_mib'] / result['reference']['rss_mib'], 2)
+    return result
+
+
+def load_budget(path=BUDGET_FILE):
+    return json.loads(Path(path).read_text())
+
+
+def record_budget(result, headroom=0.25, path=BUDGET_FILE):
+    """Save the ratios of `result` plus `headroom` as the budget and return it."""
+    budget = {
+        'import_ratio': round(result['import_ratio'] * (1 + headroom), 2),
+        'rss_ratio': round(result['rss_ratio'] * (1 + headroom), 2),
+    }
+    Path(path).write_text(json.dumps(budget, indent=2) + '\n')
+    return budget
+
+
+def check_startup(result, budget):
+    """
+    Return (problems, warnings) for `result`. Only LAZY_MODULES imported at
+    start-up are problems; time and memory over the budget are warnings.
+    """
+    problems, warnings = [], []
+    if result['lazy_loaded']:
+        problems.append('imported at start-up: ' + ', '.join(result['lazy_loaded']))
+    if result['import_ratio'] > budget['import_ratio']:
+        warnings.append(
+            f"imports took {result['import_ratio']:.2f}x the bare django.setup() "
+            f"({result['import_ms']:.0f}ms vs {result['reference']['import_ms']:.0f}ms, budget {budget['import_ratio']}x)"
+        )
+    if result['rss_ratio'] > budget['rss_ratio']:
+        warnings.append(
+            f"peak RSS {result['rss_ratio']:.2f}x the bare django.setup() "
+            f"({result['rss_mib']:.0f} MiB vs {result['reference']['rss_mib']:.0f} MiB, budget {budget['rss_ratio']}x)"
+        )
+    return problems, warnings
@@ -0,0 +1,117 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APITestCase
+from audit.models import AuditLog
+from products.models import Product
+from stock.models import StockBalance, StockEntry
+from .harness import comparison_table, compare_results, percentile, run_benchmarks
+from .seed import SKU_PREFIX, seed_benchmark_data, volumes_for
+from .startup import check_startup, measure_once, parse_importtime
+
+TINY = dict(products=20, stock_entries=300, adjustments=10, rentals=5, audit_rows=50)
+
+
+class SeedBenchmarkDataTest(APITestCase):
+    def test_seeds_requested_volumes_and_derived_tables(self):
+        inserted = seed_benchmark_data(volumes_for(0, **TINY), batch_size=100)
+
+        self.assertEqual(inserted['products'], 20)
+        self.assertEqual(Product.objects.filter(sku__startswith=SKU_PREFIX).count(), 20)
+        self.assertEqual(StockEntry.objects.count(), 300)
+        self.assertEqual(AuditLog.objects.count(), 50)
+        self.assertTrue(StockBalance.objects.exists())
+        # Timestamps are the generated ones, not all "now"
+        first, last = StockEntry.objects.order_by('id').values_list('timestamp', flat=True)[::299]
+        self.assertGreater((last - first).days, 600)
+
+    def test_same_seed_gives_same_data(self):
+        seed_benchmark_data(volumes_for(0, products=10, stock_entries=50), seed=7)
+        first = list(StockEntry.objects.order_by('id').values_list('product__sku', 'quantity', 'entry_type'))
+        StockEntry.objects.all().delete()
+        Product.objects.all().delete()
+        seed_benchmark_data(volumes_for(0, products=10, stock_entries=50), seed=7)
+        second = list(StockEntry.objects.order_by('id').values_list('product__sku', 'quantity', 'entry_type'))
+        self.assertEqual(first, second)
+
+    def test_command_refuses_to_seed_twice(self):
+        call_command('seed_benchmark_data', scale=0, stdout=StringIO(), **TINY)
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark_data', scale=0, stdout=StringIO(), **TINY)
+
+
+class BenchmarkHarnessTest(APITestCase):
+    def test_runs_scenarios_and_reports_percentiles(self):
+        seed_benchmark_data(volumes_for(0, **TINY))
+        results = run_benchmarks(['dashboard', 'product_detail', 'check_alerts'], iterations=2, warmup=0)
+
+        self.assertEqual(set(results['scenarios']), {'dashboard', 'product_detail', 'check_alerts'})
+        for result in results['scenarios'].values():
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['peak_memory_kib'], 0)
+        self.assertEqual(results['meta']['tables']['stock_entries'], 300)
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(KeyError):
+            run_benchmarks(['nope'])
+
+    def test_percentile(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 100), 5)
+
+    def test_compare_flags_slower_p95_and_extra_queries(self):
+        baseline = {'scenarios': {
+            'dashboard': {'p95_ms': 100.0, 'queries': 7},
+            'audit_search': {'p95_ms': 1.0, 'queries': 5},
+        }}
+        results = {'scenarios': {
+            'dashboard': {'p95_ms': 130.0, 'queries': 8},
+            # 3x slower, but within the noise floor
+            'audit_search': {'p95_ms': 3.0, 'queries': 5},
+            'check_alerts': {'p95_ms': 50.0, 'queries': 9},
+        }}
+
+        regressions = compare_results(results, baseline, tolerance=0.2)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(message.startswith('dashboard') for message in regressions))
+        self.assertEqual(compare_results(results, baseline, tolerance=0.5), ['dashboard: 8 queries vs 7 baseline'])
+
+    def test_comparison_table(self):
+        runs = {
+            'sqlite': {'scenarios': {'dashboard': {'p95_ms': 40.0, 'ops_per_sec': 26.1}}},
+            'postgresql': {'scenarios': {'dashboard': {'p95_ms': 20.5, 'ops_per_sec': 52.0}, 'audit_search': {'p95_ms': 9.0, 'ops_per_sec': 120.0}}},
+        }
+        lines = comparison_table(runs).splitlines()
+        self.assertEqual(lines[0], '| scenario | sqlite p95 ms | sqlite ops/s | postgresql p95 ms | postgresql ops/s |')
+        self.assertEqual(lines[2], '| dashboard | 40.0 | 26.1 | 20.5 | 52.0 |')
+        self.assertEqual(lines[3], '| audit_search |  |  | 9.0 | 120.0 |')
+
+
+class StartupBudgetTest(APITestCase):
+    def test_fresh_worker_does_not_import_export_libraries(self):
+        result = measure_once()
+        self.assertEqual(result['lazy_loaded'], [])
+        self.assertGreater(result['import_ms'], 0)
+        self.assertGreater(result['rss_mib'], 0)
+
+    def test_parse_importtime(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     _io\n'
+            'import time:       300 |        420 |   encodings\n'
+            'import time:      1000 |       1420 | django.urls\n'
+        )
+        self.assertEqual(parse_importtime(output), [('_io', 120, 120, 2), ('encodings', 300, 420, 1), ('django.urls', 1000, 1420, 0)])
+
+    def test_check_startup(self):
+        budget = {'import_ratio': 1.5, 'rss_ratio': 1.3}
+        reference = {'import_ms': 400, 'rss_mib': 50}
+        result = {'import_ms': 480, 'rss_mib': 55, 'import_ratio': 1.2, 'rss_ratio': 1.1, 'reference': reference, 'lazy_loaded': []}
+        self.assertEqual(check_startup(result, budget), ([], []))
+        # Slow imports are advisory; only a lazy library imported at start-up fails
+        slow = dict(result, import_ms=800, import_ratio=2.0)
+        self.assertEqual(check_startup(slow, budget), ([], ['imports took 2.00x the bare django.setup() (800ms vs 400ms, budget 1.5x)']))
+        problems, _ = check_startup(dict(result, lazy_loaded=['pandas']), budget)
+        self.assertEqual(problems, ['imported at start-up: pandas'])
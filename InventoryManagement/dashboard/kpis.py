@@ -0,0 +1,85 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from products.models import Product
+from reports.rollup import rollup_totals
+
+KPI_CACHE_KEY = 'dashboard:kpis'
+KPI_VERSION_KEY = 'dashboard:kpis:version'
+KPI_LOCK_KEY = 'dashboard:kpis:refresh'
+# Stale values stay in the cache this long so they can be served while refreshing
+KPI_STALE_TIMEOUT = 24 * 60 * 60
+KPI_LOCK_TIMEOUT = 30
+
+
+def compute_kpis():
+    """Compute the dashboard KPIs from the product table and the daily rollup."""
+    totals = rollup_totals([
+        'stock_in_quantity', 'stock_out_quantity', 'transfer_quantity', 'adjustment_increase', 'adjustment_decrease',
+    ])
+    total_stock_in = totals['stock_in_quantity']
+    total_stock_out = totals['stock_out_quantity']
+    total_stock_entries = total_stock_in + total_stock_out + totals['transfer_quantity']
+    increase_adj = totals['adjustment_increase']
+    decrease_adj = totals['adjustment_decrease']
+    current_total_stock = total_stock_entries + increase_adj - decrease_adj
+    average_inventory = ((total_stock_in + current_total_stock) / 2) if (total_stock_in + current_total_stock) > 0 else 1
+    stock_turnover = round(total_stock_out / average_inventory, 2) if average_inventory else 0
+    shrinkage_base = total_stock_in + increase_adj
+    shrinkage_rate = round((decrease_adj / shrinkage_base) * 100, 2) if shrinkage_base else 0
+    return {
+        'total_products': Product.objects.count(),
+        'total_stock': current_total_stock,
+        'stock_turnover': stock_turnover,
+        'shrinkage_rate': shrinkage_rate,
+    }
+
+
+def _current_version():
+    cache.add(KPI_VERSION_KEY, 0, timeout=None)
+    return cache.get(KPI_VERSION_KEY, 0)
+
+
+def get_kpis():
+    """
+    Return the dashboard KPIs from the cache. A fresh value is returned as is;
+    a stale one (expired or invalidated by a write) is recomputed by the one
+    request that takes the refresh lock while concurrent requests keep
+    getting the stale value. Only a cold cache makes every caller compute.
+    """
+    version = _current_version()
+    entry = cache.get(KPI_CACHE_KEY)
+    if entry and entry['version'] == version and entry['fresh_until'] > time.time():
+        return entry['value']
+    if entry and not cache.add(KPI_LOCK_KEY, True, timeout=KPI_LOCK_TIMEOUT):
+        # Someone else is refreshing; serve what we have
+        return entry['value']
+    try:
+        value = compute_kpis()
+        cache.set(KPI_CACHE_KEY, {
+            'value': value,
+            'version': version,
+            'fresh_until': time.time() + settings.DASHBOARD_KPI_CACHE_TTL,
+        }, timeout=KPI_STALE_TIMEOUT)
+    finally:
+        if entry:
+            cache.delete(KPI_LOCK_KEY)
+    return value
+
+
+def invalidate_kpis():
+    """Mark the cached KPIs stale; the next request recomputes them."""
+    try:
+        cache.incr(KPI_VERSION_KEY)
+    except ValueError:
+        # Version key evicted or never set: any cached entry is already unusable
+        cache.add(KPI_VERSION_KEY, 1, timeout=None)
+
+
+def schedule_kpi_invalidation():
+    """Invalidate the KPIs once when the current transaction commits, however many rows it writes."""
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and any(entry[1] is invalidate_kpis for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(invalidate_kpis)
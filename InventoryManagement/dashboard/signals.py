@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from inventory.models import InventoryAdjustment
+from products.models import Product
+from stock.models import StockEntry
+from .kpis import schedule_kpi_invalidation
+
+
+@receiver(post_save, sender=StockEntry)
+@receiver(post_delete, sender=StockEntry)
+@receiver(post_save, sender=InventoryAdjustment)
+@receiver(post_delete, sender=InventoryAdjustment)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_dashboard_kpis(sender, **kwargs):
+    """Writes that change the KPIs mark the cached values stale once they commit."""
+    schedule_kpi_invalidation()
@@ -1,7 +1,13 @@
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from .kpis import KPI_LOCK_KEY, get_kpis, invalidate_kpis
+from products.models import Product
+from stock.models import StockEntry
 
 User = get_user_model()
 
@@ -15,6 +21,58 @@ class DashboardAPITest(APITestCase):
         url = reverse('dashboard-overview')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('total_products', response.data)
-        self.assertIn('total_stock', response.data)
-        self.assertIn('kpis', response.data)
+        # A rendered page, so the values are in its template context
+        self.assertIn('total_products', response.context)
+        self.assertIn('total_stock', response.context)
+        self.assertIn('stock_turnover', response.context['kpis'])
+
+
+class DashboardKPICacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_kpis_are_served_from_cache(self):
+        self.assertEqual(get_kpis()['total_products'], 1)
+        with self.assertNumQueries(0):
+            get_kpis()
+
+    def test_stale_value_served_while_another_request_refreshes(self):
+        get_kpis()
+        invalidate_kpis()
+        cache.add(KPI_LOCK_KEY, True)
+        Product.objects.create(name='Other Product', sku='OP001')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_kpis()['total_products'], 1)
+        cache.delete(KPI_LOCK_KEY)
+        self.assertEqual(get_kpis()['total_products'], 2)
+
+    @override_settings(DASHBOARD_KPI_CACHE_TTL=0)
+    def test_expired_value_is_recomputed(self):
+        get_kpis()
+        Product.objects.create(name='Other Product', sku='OP001')
+        self.assertEqual(get_kpis()['total_products'], 2)
+
+
+class DashboardKPIInvalidationTest(APITransactionTestCase):
+    # Invalidation runs on commit, so these writes need real transactions
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_writes_invalidate_cached_kpis(self):
+        self.assertEqual(get_kpis()['total_stock'], 0)
+        StockEntry.objects.create(product=self.product, quantity=7, entry_type='in', created_by=self.user)
+        self.assertEqual(get_kpis()['total_stock'], 7)
+        Product.objects.create(name='Other Product', sku='OP001')
+        self.assertEqual(get_kpis()['total_products'], 2)
+
+    def test_rolled_back_writes_keep_the_cache(self):
+        get_kpis()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Product.objects.create(name='Other Product', sku='OP001')
+            raise RuntimeError
+        with self.assertNumQueries(0):
+            get_kpis()
@@ -0,0 +1,163 @@
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.utils import timezone
+from InventoryManagement.databases import retry_on_locked
+from products.models import Product
+from stock.services import get_available_quantities
+from .models import Alert, QuantityLimit
+
+_state = threading.local()
+
+
+def limit_reached_message(name, current_quantity, limit_quantity):
+    return f"Product {name} quantity ({current_quantity}) has reached or fallen below the limit of {limit_quantity}"
+
+
+def limit_resolved_message(name, current_quantity, limit_quantity):
+    return f"Alert resolved: {name} quantity ({current_quantity}) is now above limit ({limit_quantity})"
+
+
+def out_of_stock_message(name, current_quantity):
+    return f"Product {name} is out of stock (quantity: {current_quantity})"
+
+
+def out_of_stock_resolved_message(name, current_quantity):
+    return f"Out of stock alert resolved: {name} now has {current_quantity} in stock"
+
+
+@retry_on_locked
+def evaluate_alerts(product_ids, batch_size=500, dry_run=False):
+    """
+    Open, refresh and resolve limit_reached / out_of_stock alerts for the given
+    products in one set-based pass. Returns counts of created, updated and
+    resolved alerts; with dry_run the changes are counted but not written.
+    """
+    product_ids = list(set(product_ids))
+    counts = {'created': 0, 'updated': 0, 'resolved': 0}
+    if not product_ids:
+        return counts
+
+    names = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'name'))
+    quantities = get_available_quantities(names)
+    limits = dict(
+        QuantityLimit.objects.filter(product_id__in=names, is_active=True)
+        .values_list('product_id', 'limit_quantity')
+    )
+    active_alerts = {}
+    for alert in Alert.objects.filter(
+        product_id__in=names, status='active', alert_type__in=['limit_reached', 'out_of_stock']
+    ).order_by('product_id', 'alert_type', '-created_at'):
+        # Newest first within each (product, type), matching the composite index
+        active_alerts.setdefault((alert.product_id, alert.alert_type), alert)
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    to_resolve = []
+    for product_id, name in names.items():
+        current_quantity = quantities.get(product_id, 0)
+        stored_quantity = max(current_quantity, 0)
+
+        limit_quantity = limits.get(product_id)
+        if limit_quantity is not None:
+            existing_alert = active_alerts.get((product_id, 'limit_reached'))
+            if current_quantity <= limit_quantity:
+                message = limit_reached_message(name, current_quantity, limit_quantity)
+                if existing_alert is None:
+                    to_create.append(Alert(
+                        product_id=product_id,
+                        alert_type='limit_reached',
+                        status='active',
+                        message=message,
+                        current_quantity=stored_quantity,
+                        limit_quantity=limit_quantity,
+                    ))
+                elif existing_alert.current_quantity != stored_quantity or existing_alert.message != message:
+                    existing_alert.current_quantity = stored_quantity
+                    existing_alert.limit_quantity = limit_quantity
+                    existing_alert.message = message
+                    to_update.append(existing_alert)
+            elif existing_alert is not None:
+                existing_alert.status = 'resolved'
+                existing_alert.resolved_at = now
+                existing_alert.message = limit_resolved_message(name, current_quantity, limit_quantity)
+                to_resolve.append(existing_alert)
+
+        existing_alert = active_alerts.get((product_id, 'out_of_stock'))
+        if current_quantity <= 0:
+            if existing_alert is None:
+                to_create.append(Alert(
+                    product_id=product_id,
+                    alert_type='out_of_stock',
+                    status='active',
+                    message=out_of_stock_message(name, current_quantity),
+                    current_quantity=stored_quantity,
+                ))
+        elif existing_alert is not None:
+            existing_alert.status = 'resolved'
+            existing_alert.resolved_at = now
+            existing_alert.message = out_of_stock_resolved_message(name, current_quantity)
+            to_resolve.append(existing_alert)
+
+    counts['created'] = len(to_create)
+    counts['updated'] = len(to_update)
+    counts['resolved'] = len(to_resolve)
+    if dry_run:
+        return counts
+    with transaction.atomic():
+        Alert.objects.bulk_create(to_create, batch_size=batch_size)
+        Alert.objects.bulk_update(
+            to_update + to_resolve,
+            ['status', 'resolved_at', 'message', 'current_quantity', 'limit_quantity'],
+            batch_size=batch_size,
+        )
+    return counts
+
+
+def _flush_pending():
+    product_ids = getattr(_state, 'pending', set())
+    _state.pending = set()
+    evaluate_alerts(product_ids)
+
+
+def schedule_alert_evaluation(product_ids):
+    """
+    Queue products for alert evaluation. Inside a transaction the products are
+    collected and evaluated together once it commits; in autocommit mode they
+    are evaluated straight away.
+    """
+    deferred = getattr(_state, 'deferred', None)
+    if deferred is not None:
+        deferred.update(product_ids)
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        evaluate_alerts(product_ids)
+        return
+    # A rolled back transaction discards its callback, so only trust the
+    # pending set while our flush is still registered.
+    if not any(entry[1] is _flush_pending for entry in connection.run_on_commit):
+        _state.pending = set()
+        transaction.on_commit(_flush_pending)
+    _state.pending.update(product_ids)
+
+
+@contextmanager
+def batched_alert_evaluation():
+    """
+    Suppress per-row alert checks from the StockEntry signal and evaluate every
+    touched product once when the block exits without error. Bulk importers can
+    also add ids directly to the yielded set (e.g. after bulk_create).
+    """
+    if getattr(_state, 'deferred', None) is not None:
+        # Nested use: the outermost block evaluates everything
+        yield _state.deferred
+        return
+    _state.deferred = set()
+    try:
+        yield _state.deferred
+        product_ids = _state.deferred
+    finally:
+        _state.deferred = None
+    schedule_alert_evaluation(product_ids)
@@ -1,129 +1,60 @@
+import time
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from products.models import Product
-from inventory.models import QuantityLimit, Alert
-from stock.models import StockEntry
-from django.db.models import Sum, Q
+from inventory.alerts import evaluate_alerts
 
 
 class Command(BaseCommand):
     help = 'Check product quantities and create alerts when limits are reached'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Products reconciled per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them')
+        parser.add_argument('--product-ids', nargs='+', type=int, help='Only check these products')
+
     def handle(self, *args, **options):
-        self.stdout.write("Checking product quantities and limits...")
-        
-        # Get all products with quantity limits
-        limits = QuantityLimit.objects.filter(is_active=True)
-        
-        alerts_created = 0
-        alerts_updated = 0
-        
-        for limit in limits:
-            product = limit.product
-            
-            # Calculate current quantity
-            stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
-            
-            stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
-            
-            current_quantity = stock_in - stock_out
-            
-            # Check if quantity is at or below limit
-            if current_quantity <= limit.limit_quantity:
-                # Check if there's already an active alert for this product and limit
-                existing_alert = Alert.objects.filter(
-                    product=product,
-                    alert_type='limit_reached',
-                    status='active'
-                ).first()
-                
-                if existing_alert:
-                    # Update existing alert if quantity changed
-                    if existing_alert.current_quantity != current_quantity:
-                        existing_alert.current_quantity = current_quantity
-                        existing_alert.message = f"Product {product.name} quantity ({current_quantity}) has reached or fallen below the limit of {limit.limit_quantity}"
-                        existing_alert.save()
-                        alerts_updated += 1
-                        self.stdout.write(f"Updated alert for {product.name}: {current_quantity} <= {limit.limit_quantity}")
-                else:
-                    # Create new alert
-                    Alert.objects.create(
-                        product=product,
-                        alert_type='limit_reached',
-                        status='active',
-                        message=f"Product {product.name} quantity ({current_quantity}) has reached or fallen below the limit of {limit.limit_quantity}",
-                        current_quantity=current_quantity,
-                        limit_quantity=limit.limit_quantity
-                    )
-                    alerts_created += 1
-                    self.stdout.write(f"Created alert for {product.name}: {current_quantity} <= {limit.limit_quantity}")
-            else:
-                # Check if there's an active alert that should be resolved
-                existing_alert = Alert.objects.filter(
-                    product=product,
-                    alert_type='limit_reached',
-                    status='active'
-                ).first()
-                
-                if existing_alert:
-                    existing_alert.status = 'resolved'
-                    existing_alert.resolved_at = timezone.now()
-                    existing_alert.message = f"Alert resolved: {product.name} quantity ({current_quantity}) is now above limit ({limit.limit_quantity})"
-                    existing_alert.save()
-                    self.stdout.write(f"Resolved alert for {product.name}: {current_quantity} > {limit.limit_quantity}")
-        
-        # Also check for out of stock products
-        all_products = Product.objects.all()
-        for product in all_products:
-            stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
-            
-            stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(
-                total=Sum('quantity')
-            )['total'] or 0
-            
-            current_quantity = stock_in - stock_out
-            
-            if current_quantity <= 0:
-                # Check if there's already an active out of stock alert
-                existing_alert = Alert.objects.filter(
-                    product=product,
-                    alert_type='out_of_stock',
-                    status='active'
-                ).first()
-                
-                if not existing_alert:
-                    Alert.objects.create(
-                        product=product,
-                        alert_type='out_of_stock',
-                        status='active',
-                        message=f"Product {product.name} is out of stock (quantity: {current_quantity})",
-                        current_quantity=current_quantity
-                    )
-                    alerts_created += 1
-                    self.stdout.write(f"Created out of stock alert for {product.name}")
-            else:
-                # Resolve out of stock alert if quantity is now positive
-                existing_alert = Alert.objects.filter(
-                    product=product,
-                    alert_type='out_of_stock',
-                    status='active'
-                ).first()
-                
-                if existing_alert:
-                    existing_alert.status = 'resolved'
-                    existing_alert.resolved_at = timezone.now()
-                    existing_alert.message = f"Out of stock alert resolved: {product.name} now has {current_quantity} in stock"
-                    existing_alert.save()
-                    self.stdout.write(f"Resolved out of stock alert for {product.name}")
-        
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        self.stdout.write("Checking product quantities and limits..." + (" (dry run)" if dry_run else ""))
+
+        started = time.perf_counter()
+        totals = {'created': 0, 'updated': 0, 'resolved': 0}
+        products_checked = 0
+        chunks = 0
+
+        for product_ids in self._product_chunks(options['product_ids'], chunk_size):
+            counts = evaluate_alerts(product_ids, batch_size=chunk_size, dry_run=dry_run)
+            for key in totals:
+                totals[key] += counts[key]
+            products_checked += len(product_ids)
+            chunks += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"Chunk {chunks}: {len(product_ids)} products, "
+                    f"created {counts['created']}, updated {counts['updated']}, resolved {counts['resolved']}"
+                )
+
+        elapsed = time.perf_counter() - started
         self.stdout.write(
             self.style.SUCCESS(
-                f'Alert check completed. Created: {alerts_created}, Updated: {alerts_updated}'
+                f"Alert check completed{' (dry run, nothing written)' if dry_run else ''}. "
+                f"Created: {totals['created']}, Updated: {totals['updated']}, Resolved: {totals['resolved']}"
             )
-        ) 
\ No newline at end of file
+        )
+        self.stdout.write(
+            f"Checked {products_checked} products in {chunks} chunk(s) in {elapsed:.2f}s"
+            + (f" ({products_checked / elapsed:.0f} products/s)" if elapsed and products_checked else "")
+        )
+
+    def _product_chunks(self, product_ids, chunk_size):
+        """Yield product ids in ascending keyset-paginated chunks."""
+        products = Product.objects.order_by('id')
+        if product_ids:
+            products = products.filter(id__in=product_ids)
+        last_id = 0
+        while True:
+            chunk = list(products.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1]
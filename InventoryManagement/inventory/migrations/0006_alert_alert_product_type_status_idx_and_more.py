@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_standardlimit'),
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['product', 'alert_type', 'status', '-created_at'], name='alert_product_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['status', '-created_at'], name='alert_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status', 'return_date'], name='rental_status_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['-created_at'], name='rental_created_idx'),
+        ),
+    ]
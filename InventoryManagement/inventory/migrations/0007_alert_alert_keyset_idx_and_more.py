@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_alert_alert_product_type_status_idx_and_more'),
+        ('products', '0006_product_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at', '-id'], name='alert_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryadjustment',
+            index=models.Index(fields=['-timestamp', '-id'], name='adjustment_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serialnumber',
+            index=models.Index(fields=['-created_at', '-id'], name='serial_keyset_idx'),
+        ),
+    ]
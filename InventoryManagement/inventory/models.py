@@ -20,6 +20,12 @@ class InventoryAdjustment(models.Model):
     def __str__(self):
         return f"{self.adjustment_type} adjustment for {self.product.name} ({self.quantity})"
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the adjustments page and API
+            models.Index(fields=['-timestamp', '-id'], name='adjustment_keyset_idx'),
+        ]
+
 class SerialNumber(models.Model):
     STATUS_CHOICES = [
         ('available', 'Available'),
@@ -36,6 +42,12 @@ class SerialNumber(models.Model):
     def __str__(self):
         return f"{self.serial_number} - {self.product.name} ({self.status})"
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the serial numbers page and API
+            models.Index(fields=['-created_at', '-id'], name='serial_keyset_idx'),
+        ]
+
 class QuantityLimit(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='quantity_limit')
     limit_quantity = models.PositiveIntegerField(help_text="Alert will be triggered when quantity reaches this limit")
@@ -83,6 +95,14 @@ class Alert(models.Model):
         ordering = ['-created_at']
         verbose_name = "Alert"
         verbose_name_plural = "Alerts"
+        indexes = [
+            # Newest active alert per (product, type) during alert evaluation
+            models.Index(fields=['product', 'alert_type', 'status', '-created_at'], name='alert_product_type_status_idx'),
+            # Alert list and active/resolved counts
+            models.Index(fields=['status', '-created_at'], name='alert_status_created_idx'),
+            # Keyset pages of the alerts page and API
+            models.Index(fields=['-created_at', '-id'], name='alert_keyset_idx'),
+        ]
 
 class Rental(models.Model):
     STATUS_CHOICES = [
@@ -104,6 +124,14 @@ class Rental(models.Model):
     def __str__(self):
         return f"{self.product.name} rented to {self.rented_to} ({self.quantity})"
 
+    class Meta:
+        indexes = [
+            # Overdue rentals
+            models.Index(fields=['status', 'return_date'], name='rental_status_return_idx'),
+            # Rental list, newest first
+            models.Index(fields=['-created_at'], name='rental_created_idx'),
+        ]
+
 class StandardLimit(models.Model):
     value = models.PositiveIntegerField(default=1)
     updated_at = models.DateTimeField(auto_now=True)
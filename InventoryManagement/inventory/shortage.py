@@ -0,0 +1,40 @@
+from django.db.models import Case, F, IntegerField, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from products.models import Product
+from .models import StandardLimit
+
+
+def shortage_queryset():
+    """
+    Products whose on-hand quantity is at or below their limit, as one query.
+
+    The limit is the product's active QuantityLimit, falling back to the global
+    StandardLimit; products with neither are never short.
+    """
+    standard_limit = Subquery(StandardLimit.objects.filter(id=1).values('value')[:1])
+    return (
+        Product.objects
+        .annotate(
+            current_quantity=Coalesce('stock_balance__on_hand', Value(0)),
+            limit=Case(
+                When(quantity_limit__is_active=True, then=F('quantity_limit__limit_quantity')),
+                default=standard_limit,
+                output_field=IntegerField(),
+            ),
+        )
+        .filter(limit__isnull=False, current_quantity__lte=F('limit'))
+        .annotate(qty_to_buy=F('limit') - F('current_quantity'))
+        .order_by('id')
+        .values('id', 'name', 'current_quantity', 'limit', 'qty_to_buy')
+    )
+
+
+def shortage_items(chunk_size=2000):
+    """Lazily yield shortage rows in the shape the shortage templates expect."""
+    for row in shortage_queryset().iterator(chunk_size=chunk_size):
+        yield {
+            'product': {'id': row['id'], 'name': row['name']},
+            'current_quantity': row['current_quantity'],
+            'limit': row['limit'],
+            'qty_to_buy': row['qty_to_buy'],
+        }
@@ -1,9 +1,21 @@
+from io import StringIO
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import InventoryAdjustment, SerialNumber
+from django.utils import timezone
+from .models import InventoryAdjustment, SerialNumber, QuantityLimit, StandardLimit, Alert, Rental
+from .alerts import batched_alert_evaluation, evaluate_alerts
+from .shortage import shortage_items
+from stock.models import StockEntry
 from products.models import Product
+from users.models import Role
+from .views import ALERT_ORDERING
+from django.test import override_settings
+from InventoryManagement.pagination import KeysetPaginator
+from InventoryManagement.profiling import QueryBudgetExceeded, fingerprint, profile
+from InventoryManagement.query_plans import QueryPlanMixin
 
 User = get_user_model()
 
@@ -31,7 +43,7 @@ class InventoryAPITest(APITestCase):
         url = reverse('inventory-adjustments')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_serial_number(self):
         url = reverse('serial-numbers')
@@ -49,4 +61,172 @@ class InventoryAPITest(APITestCase):
         url = reverse('serial-numbers')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ShortageEngineTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.login(username='testuser', password='testpass')
+        self.limited = Product.objects.create(name='Limited', sku='L001')
+        self.standard = Product.objects.create(name='Standard', sku='S001')
+        self.healthy = Product.objects.create(name='Healthy', sku='H001')
+        QuantityLimit.objects.create(product=self.limited, limit_quantity=5)
+        StandardLimit.objects.create(id=1, value=2)
+        StockEntry.objects.create(product=self.limited, quantity=4, entry_type='in')
+        StockEntry.objects.create(product=self.standard, quantity=1, entry_type='in')
+        StockEntry.objects.create(product=self.healthy, quantity=50, entry_type='in')
+
+    def test_specific_limit_takes_priority_over_standard(self):
+        items = {item['product']['name']: item for item in shortage_items()}
+        self.assertEqual(set(items), {'Limited', 'Standard'})
+        self.assertEqual(items['Limited']['limit'], 5)
+        self.assertEqual(items['Limited']['qty_to_buy'], 1)
+        self.assertEqual(items['Standard']['limit'], 2)
+
+    def test_inactive_limit_falls_back_to_standard(self):
+        QuantityLimit.objects.filter(product=self.limited).update(is_active=False)
+        names = [item['product']['name'] for item in shortage_items()]
+        self.assertEqual(names, ['Standard'])
+
+    def test_query_count_is_constant(self):
+        for i in range(20):
+            Product.objects.create(name=f'Extra {i}', sku=f'X{i:03}')
+        with self.assertNumQueries(1):
+            items = list(shortage_items())
+        self.assertEqual(len(items), 22)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('inventory-shortage-export-csv'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Limited,4,1', response.content.decode())
+
+
+class AlertEvaluationTest(APITestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        QuantityLimit.objects.create(product=self.product, limit_quantity=5)
+
+    def test_alerts_evaluated_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            StockEntry.objects.create(product=self.product, quantity=3, entry_type='in')
+            StockEntry.objects.create(product=self.product, quantity=1, entry_type='in')
+        self.assertEqual(len(callbacks), 1)
+        alert = Alert.objects.get(product=self.product, status='active')
+        self.assertEqual((alert.alert_type, alert.current_quantity), ('limit_reached', 4))
+
+    def test_batched_evaluation_suppresses_per_row_checks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with batched_alert_evaluation() as touched:
+                for _ in range(5):
+                    StockEntry.objects.create(product=self.product, quantity=10, entry_type='in')
+                self.assertEqual(touched, {self.product.id})
+                self.assertFalse(Alert.objects.exists())
+        self.assertFalse(Alert.objects.filter(status='active').exists())
+
+    def test_evaluation_resolves_recovered_products(self):
+        counts = evaluate_alerts([self.product.id])
+        self.assertEqual(counts['created'], 2)  # limit_reached and out_of_stock
+        StockEntry.objects.create(product=self.product, quantity=20, entry_type='in')
+        with self.assertNumQueries(7):  # 4 reads, savepoint, one bulk update, release
+            counts = evaluate_alerts([self.product.id])
+        self.assertEqual(counts['resolved'], 2)
+        self.assertFalse(Alert.objects.filter(status='active').exists())
+
+
+class CheckAlertsCommandTest(APITestCase):
+    def setUp(self):
+        self.products = [Product.objects.create(name=f'Product {i}', sku=f'P{i:03}') for i in range(5)]
+        QuantityLimit.objects.create(product=self.products[0], limit_quantity=5)
+
+    def test_dry_run_writes_nothing(self):
+        out = StringIO()
+        call_command('check_alerts', '--dry-run', stdout=out)
+        self.assertFalse(Alert.objects.exists())
+        self.assertIn('Created: 6', out.getvalue())
+
+    def test_reconciles_in_chunks(self):
+        call_command('check_alerts', '--chunk-size', '2', stdout=StringIO())
+        self.assertEqual(Alert.objects.filter(alert_type='out_of_stock').count(), 5)
+        self.assertEqual(Alert.objects.filter(alert_type='limit_reached').count(), 1)
+
+    def test_product_ids_limits_scope(self):
+        call_command('check_alerts', '--product-ids', str(self.products[1].id), stdout=StringIO())
+        self.assertEqual(list(Alert.objects.values_list('product_id', flat=True)), [self.products[1].id])
+
+
+class InventoryQueryPlanTest(QueryPlanMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_alert_and_rental_filters_use_indexes(self):
+        self.assertQuerysetUsesIndex(
+            Alert.objects.filter(
+                product_id__in=[self.product.id], status='active', alert_type__in=['limit_reached', 'out_of_stock']
+            ).order_by('product_id', 'alert_type', '-created_at'),
+            'alert_product_type_status_idx',
+        )
+        self.assertQuerysetUsesIndex(
+            Rental.objects.filter(status='active', return_date__lt=timezone.now().date()), 'rental_status_return_idx'
+        )
+
+    def test_alert_and_serial_listings_page_by_cursor(self):
+        for i in range(5):
+            Alert.objects.create(product=self.product, alert_type='out_of_stock', message=f'Alert {i}', current_quantity=0)
+            SerialNumber.objects.create(serial_number=f'SN{i}', product=self.product)
+        expected = list(Alert.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        page = KeysetPaginator(Alert.objects.all(), 3, ordering=ALERT_ORDERING).page()
+        self.assertEqual([alert.id for alert in page], expected[:3])
+        response = self.assertViewUsesIndexes(reverse('inventory-alerts-page'), [Alert], {'cursor': page.next_cursor})
+        self.assertEqual([alert.id for alert in response.context['alerts']], expected[3:])
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertQuerysetUsesIndex(Alert.objects.order_by('-created_at', '-id')[:51], 'alert_keyset_idx')
+        response = self.assertViewUsesIndexes(reverse('inventory-serials-page'), [SerialNumber])
+        self.assertEqual(response.context['page_obj'].paginator.count, SerialNumber.objects.order_by('-id').first().id)
+
+    def test_alert_and_rental_pages_use_indexes(self):
+        self.assertViewUsesIndexes(reverse('inventory-alerts-page'), [Alert])
+        self.assertViewUsesIndexes(reverse('rental-management'), [Rental])
+
+
+class RequestProfilingTest(APITestCase):
+    def setUp(self):
+        role = Role.objects.create(name='Admin')
+        self.user = User.objects.create_user(username='testuser', password='testpass', role=role)
+        self.client.login(username='testuser', password='testpass')
+        for i in range(20):
+            product = Product.objects.create(name=f'Product {i}', sku=f'P{i:03d}')
+            QuantityLimit.objects.create(product=product, limit_quantity=5, created_by=self.user)
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) AND name = %s LIMIT 1'),
+        )
+
+    def test_profile_reports_repeated_queries(self):
+        with profile(trace_memory=True) as result:
+            names = [limit.product.name for limit in QuantityLimit.objects.all()]
+        self.assertEqual(len(names), 20)
+        self.assertEqual(result.query_count, 21)
+        self.assertEqual(result.duplicates()[0][1], 20)
+        self.assertGreater(result.peak_memory, 0)
+
+    def test_limits_page_stays_within_budget(self):
+        with profile() as result:
+            response = self.client.get(reverse('inventory-limits-page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(result.query_count, 7)
+        self.assertFalse(result.duplicates())
+        # The middleware's own profile reports the same request in Server-Timing
+        timing = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertIn(f'desc="{result.query_count} queries"', timing['db'])
+        self.assertNotEqual(timing['tpl'], 'dur=0.0;desc="templates"')
+
+    @override_settings(QUERY_BUDGETS={'inventory-limits-page': 2}, QUERY_BUDGETS_STRICT=True)
+    def test_view_over_budget_fails(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'inventory-limits-page ran'):
+            self.client.get(reverse('inventory-limits-page'))
@@ -9,24 +9,29 @@ from django.utils import timezone
 from django.db import models
 from .models import InventoryAdjustment, SerialNumber, QuantityLimit, Alert, Rental
 from .serializers import InventoryAdjustmentSerializer, SerialNumberSerializer, QuantityLimitSerializer, AlertSerializer
+from .shortage import shortage_items
 from products.models import Product
+from products.search import search_products
 from audit.models import AuditLog
 from django.contrib import messages
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from rest_framework import filters
-from rest_framework.pagination import PageNumberPagination
+from InventoryManagement.databases import replica_reads
+from InventoryManagement.pagination import KeysetCursorPagination, KeysetPaginator
 from django.db.models import Q
 from users.views import admin_required
 from django.utils.decorators import method_decorator
 from django.conf import settings
 from django.http import HttpResponseRedirect
 from stock.models import StockEntry
-from django.db.models import Sum
+from stock.services import get_available_quantity
 import csv
 from django.http import HttpResponse
 from django.template.loader import render_to_string
-from xhtml2pdf import pisa
+
+# Keyset orderings for the listings whose models have no timestamp field
+ALERT_ORDERING = ('-created_at', '-id')
+SERIAL_ORDERING = ('-created_at', '-id')
 
 # Model for storing global standard limit (if not present, will add to models.py)
 # class StandardLimit(models.Model):
@@ -64,18 +69,10 @@ class InventoryAdjustmentPageView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        adjustments = InventoryAdjustment.objects.all().order_by('-timestamp')
-        products = Product.objects.all()
-        # Pagination: 50 per page
-        paginator = Paginator(adjustments, 50)
-        page_number = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-        return render(request, 'inventory/adjustments.html', {'adjustments': page_obj.object_list, 'page_obj': page_obj, 'products': products})
+        adjustments = InventoryAdjustment.objects.select_related('product')
+        # Keyset pagination: 50 per page, newest first
+        page_obj = KeysetPaginator(adjustments, 50).get_page(request.GET.get('cursor'))
+        return render(request, 'inventory/adjustments.html', {'adjustments': page_obj.object_list, 'page_obj': page_obj})
 
     def post(self, request):
         if not request.user.is_authenticated:
@@ -102,22 +99,18 @@ class SerialNumbersPageView(View):
         search_query = request.GET.get('search', '')
         serials = SerialNumber.objects.all().select_related('product')
         if search_query:
-            serials = serials.filter(
-                models.Q(serial_number__icontains=search_query) |
-                models.Q(product__name__icontains=search_query) |
-                models.Q(product__brand__icontains=search_query) |
-                models.Q(product__sku__icontains=search_query)
-            )
-        serials = serials.order_by('-created_at')
-        paginator = Paginator(serials, 50)
-        page_number = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-        products_with_serials = Product.objects.exclude(serial_number__isnull=True).exclude(serial_number='')
+            # Serials that match themselves, plus every serial of a product
+            # the search index matches on something other than its serials
+            # (the index covers those too, which would list the siblings of
+            # the serial searched for)
+            matching = Q(serial_number__icontains=search_query)
+            found_by_serial = SerialNumber.objects.filter(matching).values('product_id')
+            products = search_products(Product.objects.all(), search_query).values('id')
+            serials = serials.filter(matching | (Q(product__in=products) & ~Q(product__in=found_by_serial)))
+        # Keyset pagination: 50 per page, newest first, with an estimated total for the heading
+        paginator = KeysetPaginator(serials, 50, ordering=SERIAL_ORDERING, estimate=True)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        products_with_serials = Product.objects.exclude(serial_number__isnull=True).exclude(serial_number='').select_related('category')
         return render(request, 'inventory/serials.html', {
             'serials': page_obj.object_list,
             'page_obj': page_obj,
@@ -153,15 +146,13 @@ class QuantityLimitsPageView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        limits = QuantityLimit.objects.all()
-        products = Product.objects.all().values('id', 'name', 'serial_number')
-        products_list = list(products)
+        limits = QuantityLimit.objects.select_related('product')
         from .models import StandardLimit
         try:
             standard_limit = StandardLimit.objects.get(id=1).value
         except StandardLimit.DoesNotExist:
             standard_limit = None
-        return render(request, 'inventory/limits.html', {'limits': limits, 'products': products_list, 'standard_limit': standard_limit})
+        return render(request, 'inventory/limits.html', {'limits': limits, 'standard_limit': standard_limit})
 
     def post(self, request):
         if not request.user.is_authenticated:
@@ -191,16 +182,9 @@ class AlertsPageView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        alerts = Alert.objects.all().order_by('-created_at')
-        # Pagination: 50 per page
-        paginator = Paginator(alerts, 50)
-        page_number = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
+        alerts = Alert.objects.select_related('product')
+        # Keyset pagination: 50 per page, newest first
+        page_obj = KeysetPaginator(alerts, 50, ordering=ALERT_ORDERING).get_page(request.GET.get('cursor'))
         return render(request, 'inventory/alerts.html', {'alerts': page_obj.object_list, 'page_obj': page_obj})
 
     def post(self, request):
@@ -228,22 +212,19 @@ class InventoryAdjustmentAPI(ListCreateAPIView):
     queryset = InventoryAdjustment.objects.all()
     serializer_class = InventoryAdjustmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class SerialNumberPagination(PageNumberPagination):
-    page_size = 50
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
 class SerialNumbersAPI(ListCreateAPIView):
     queryset = SerialNumber.objects.all()
     serializer_class = SerialNumberSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['serial_number', 'product__name', 'product__brand', 'product__sku']
-    pagination_class = SerialNumberPagination
+    pagination_class = KeysetCursorPagination
+    keyset_ordering = SERIAL_ORDERING
 
 class QuantityLimitsAPI(ListCreateAPIView):
     queryset = QuantityLimit.objects.all()
@@ -262,6 +243,8 @@ class AlertsAPI(ListCreateAPIView):
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
+    keyset_ordering = ALERT_ORDERING
 
 class AlertDetailAPI(RetrieveUpdateDestroyAPIView):
     queryset = Alert.objects.all()
@@ -302,24 +285,9 @@ class RentalManagementView(View):
             return redirect('login')
         rentals = Rental.objects.select_related('product').order_by('-created_at')
         overdue_rentals = rentals.filter(status='active', return_date__lt=timezone.now().date())
-        products = Product.objects.all()
-        # Calculate available quantity for each product
-        product_availability = {}
-        for product in products:
-            from stock.models import StockEntry
-            stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=models.Sum('quantity'))['total'] or 0
-            stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=models.Sum('quantity'))['total'] or 0
-            available = stock_in - stock_out
-            product.stock_in = stock_in
-            product.stock_out = stock_out
-            product.available = available
-            product_availability[product.id] = available
-        products = [p for p in products if p.available > 0]
         return render(request, 'inventory/rentals.html', {
             'rentals': rentals,
             'overdue_rentals': overdue_rentals,
-            'products': products,
-            'product_availability': product_availability,
         })
 
     def post(self, request):
@@ -336,10 +304,7 @@ class RentalManagementView(View):
             return_date = request.POST.get('return_date') or None
             product = Product.objects.get(id=product_id)
             # Check available quantity
-            from stock.models import StockEntry
-            stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=models.Sum('quantity'))['total'] or 0
-            stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=models.Sum('quantity'))['total'] or 0
-            available_quantity = stock_in - stock_out
+            available_quantity = get_available_quantity(product.id)
             if quantity > available_quantity:
                 messages.error(request, f'Cannot rent {quantity} units of {product.name}. Only {available_quantity} available in stock.')
                 return redirect('rental-management')
@@ -369,76 +334,23 @@ class RentalManagementView(View):
                 messages.success(request, f'Rental for {rental.product.name} marked as returned.')
         return redirect('rental-management')
 
+@replica_reads()
 def inventory_shortage_view(request):
     if not request.user.is_authenticated:
         return redirect('login')
-    from .models import Product, QuantityLimit, StandardLimit
-    # Get all products
-    products = Product.objects.all()
-    products_list = [{'id': p.id, 'name': p.name} for p in products]
-    # Get standard limit if exists
-    try:
-        standard_limit = StandardLimit.objects.get(id=1).value
-    except StandardLimit.DoesNotExist:
-        standard_limit = None
-    shortage_items = []
-    for product in products:
-        # Calculate current stock
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-        current_quantity = stock_in - stock_out
-        # Determine limit (priority: specific > standard)
-        try:
-            limit_obj = QuantityLimit.objects.get(product=product, is_active=True)
-            limit = limit_obj.limit_quantity
-        except QuantityLimit.DoesNotExist:
-            limit = standard_limit
-        if limit is not None and current_quantity <= limit:
-            qty_to_buy = abs(limit - current_quantity)
-            shortage_items.append({
-                'product': {'id': product.id, 'name': product.name},
-                'current_quantity': current_quantity,
-                'limit': limit,
-                'qty_to_buy': qty_to_buy
-            })
-    return render(request, 'inventory/shortage.html', {'shortage_items': shortage_items, 'products': products_list})
+    products_list = list(Product.objects.values('id', 'name'))
+    shortage = list(shortage_items())
+    return render(request, 'inventory/shortage.html', {'shortage_items': shortage, 'products': products_list})
 
+@replica_reads()
 def inventory_shortage_export_csv(request):
     if not request.user.is_authenticated:
         return redirect('login')
-    from .models import Product, QuantityLimit, StandardLimit
-    from stock.models import StockEntry
-    from django.db.models import Sum
-    # Get all products
-    products = Product.objects.all()
-    # Get standard limit if exists
-    try:
-        standard_limit = StandardLimit.objects.get(id=1).value
-    except StandardLimit.DoesNotExist:
-        standard_limit = None
-    shortage_items = []
-    for product in products:
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-        current_quantity = stock_in - stock_out
-        try:
-            limit_obj = QuantityLimit.objects.get(product=product, is_active=True)
-            limit = limit_obj.limit_quantity
-        except QuantityLimit.DoesNotExist:
-            limit = standard_limit
-        if limit is not None and current_quantity <= limit:
-            qty_to_buy = abs(limit - current_quantity)
-            shortage_items.append({
-                'product': {'id': product.id, 'name': product.name},
-                'current_quantity': current_quantity,
-                'limit': limit,
-                'qty_to_buy': qty_to_buy
-            })
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="inventory_shortage.csv"'
     writer = csv.writer(response)
     writer.writerow(['Product', 'In Quantity', 'Qty to Buy', 'Buyed Qty', 'Check'])
-    for item in shortage_items:
+    for item in shortage_items():
         writer.writerow([
             item['product']['name'],
             item['current_quantity'],
@@ -448,38 +360,12 @@ def inventory_shortage_export_csv(request):
         ])
     return response
 
+@replica_reads()
 def inventory_shortage_export_pdf(request):
     if not request.user.is_authenticated:
         return redirect('login')
-    from .models import Product, QuantityLimit, StandardLimit
-    from stock.models import StockEntry
-    from django.db.models import Sum
-    # Get all products
-    products = Product.objects.all()
-    # Get standard limit if exists
-    try:
-        standard_limit = StandardLimit.objects.get(id=1).value
-    except StandardLimit.DoesNotExist:
-        standard_limit = None
-    shortage_items = []
-    for product in products:
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-        current_quantity = stock_in - stock_out
-        try:
-            limit_obj = QuantityLimit.objects.get(product=product, is_active=True)
-            limit = limit_obj.limit_quantity
-        except QuantityLimit.DoesNotExist:
-            limit = standard_limit
-        if limit is not None and current_quantity <= limit:
-            qty_to_buy = abs(limit - current_quantity)
-            shortage_items.append({
-                'product': {'id': product.id, 'name': product.name},
-                'current_quantity': current_quantity,
-                'limit': limit,
-                'qty_to_buy': qty_to_buy
-            })
-    html = render_to_string('inventory/shortage_pdf.html', {'shortage_items': shortage_items})
+    from xhtml2pdf import pisa
+    html = render_to_string('inventory/shortage_pdf.html', {'shortage_items': shortage_items()})
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="inventory_shortage.pdf"'
     pisa.CreatePDF(html, dest=response)
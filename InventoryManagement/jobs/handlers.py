@@ -0,0 +1,69 @@
+"""
+Job handlers, keyed by Job.kind. Each handler receives the claimed Job and
+returns a JSON-serialisable result; exports attach their output to
+job.result_file instead.
+"""
+import tempfile
+from django.core.files.base import ContentFile, File
+from django.http import QueryDict
+from InventoryManagement.databases import replica_reads
+
+
+def product_import(job):
+    from products.importers import import_products
+    created_count, skipped_count, errors = import_products(
+        job.input_file,
+        job.created_by,
+        skip_duplicates=job.params.get('skip_duplicates', False),
+        datasheet_zip=job.attachment_file or None,
+        progress=job.set_progress,
+    )
+    return {'created_count': created_count, 'skipped_count': skipped_count, 'errors': errors}
+
+
+def stock_import(job):
+    from stock.importers import ingest_stock_sheet
+    results, success_count, fail_count = ingest_stock_sheet(job.input_file, job.params['entry_type'], job.created_by)
+    return {'results': results, 'success_count': success_count, 'fail_count': fail_count}
+
+
+def procurement_check(job):
+    from procurement.checks import check_procurement_sheet
+    results, insufficient_count = check_procurement_sheet(job.input_file)
+    return {'results': results, 'insufficient_count': insufficient_count}
+
+
+def statistics_export(job):
+    from reports.exports import build_statistics_export
+    with replica_reads():
+        content, filename, content_type = build_statistics_export(
+            job.params['format'],
+            granularity=job.params.get('granularity', 'month'),
+            periods=job.params.get('periods', 12),
+        )
+    job.result_file.save(filename, ContentFile(content), save=False)
+    return {'filename': filename, 'content_type': content_type}
+
+
+def audit_export(job):
+    from audit.archive import audit_history
+    from audit.exports import EXPORT_FORMATS, write_audit_export
+    params = QueryDict(mutable=True)
+    params.update(job.params.get('filters', {}))
+    filename, content_type = EXPORT_FORMATS[job.params['format']]
+    # Spool through a temporary file so large exports never sit in memory
+    with tempfile.TemporaryFile() as output:
+        with replica_reads():
+            write_audit_export(audit_history(params), job.params['format'], output)
+        output.seek(0)
+        job.result_file.save(filename, File(output), save=False)
+    return {'filename': filename, 'content_type': content_type}
+
+
+HANDLERS = {
+    'product_import': product_import,
+    'stock_import': stock_import,
+    'procurement_check': procurement_check,
+    'statistics_export': statistics_export,
+    'audit_export': audit_export,
+}
@@ -0,0 +1,46 @@
+import signal
+from datetime import timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from jobs.runner import requeue_stale_jobs, work
+
+
+class Command(BaseCommand):
+    help = 'Run queued import/export jobs with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument(
+            '--stale-after', type=int, default=5,
+            help='Requeue running jobs whose heartbeat stopped this many minutes ago',
+        )
+
+    def handle(self, *args, **options):
+        # Jobs left running by a worker that died are picked up again
+        requeued = requeue_stale_jobs(timedelta(minutes=options['stale_after']))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} interrupted job(s)")
+
+        stop_event = threading.Event()
+        if not options['once']:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop_event.set())
+
+        workers = max(1, options['workers'])
+        self.stdout.write(f"Starting {workers} job worker(s)...")
+
+        def worker():
+            try:
+                work(stop_event, poll_interval=options['poll_interval'], once=options['once'])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(worker) for _ in range(workers)]
+            for future in futures:
+                future.result()
+        self.stdout.write(self.style.SUCCESS('Job workers stopped.'))
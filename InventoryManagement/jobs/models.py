@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A long-running import or export executed by the run_jobs worker."""
+    KIND_CHOICES = [
+        ('product_import', 'Product Import'),
+        ('stock_import', 'Stock Import'),
+        ('procurement_check', 'Procurement Check'),
+        ('statistics_export', 'Statistics Export'),
+        ('audit_export', 'Audit Log Export'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    input_file = models.FileField(upload_to='job_inputs/', blank=True, null=True)
+    attachment_file = models.FileField(upload_to='job_inputs/', blank=True, null=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    result_file = models.FileField(upload_to='job_results/', blank=True, null=True)
+    error_log = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a stale one means the worker is gone
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def set_progress(self, progress):
+        """Record percent complete without touching the rest of the row."""
+        self.progress = max(0, min(100, int(progress)))
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, heartbeat_at=timezone.now())
+
+    def mark_finished(self, status, **fields):
+        self.status = status
+        self.finished_at = timezone.now()
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.save()
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+from InventoryManagement.databases import retry_on_locked
+from .handlers import HANDLERS
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_rollup_lock = threading.Lock()
+_last_rollup = None
+
+
+def enqueue(kind, user, params=None, input_file=None, attachment_file=None):
+    """
+    Record a job for the run_jobs worker and return it. With
+    JOBS_RUN_INLINE enabled the job runs before this returns.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job.objects.create(
+        kind=kind,
+        created_by=user,
+        params=params or {},
+        input_file=input_file,
+        attachment_file=attachment_file,
+    )
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        run_job(job)
+    return job
+
+
+@retry_on_locked
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to running and return it, or None.
+    The conditional update means two workers can never claim the same job.
+    """
+    while True:
+        job = Job.objects.filter(status='pending').order_by('created_at', 'id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job.pk, status='pending').update(status='running', started_at=now, heartbeat_at=now)
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """Refresh the job's heartbeat_at every `interval` seconds from a background thread while the block runs."""
+    interval = interval or getattr(settings, 'JOBS_HEARTBEAT_INTERVAL', 30)
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    Job.objects.filter(pk=job.pk, status='running').update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    # e.g. SQLite locked by the job's own write; the next beat will do
+                    logger.warning('Heartbeat of job %s failed', job.pk, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def requeue_stale_jobs(stale_after):
+    """
+    Put running jobs whose heartbeat stopped more than `stale_after` (a
+    timedelta) ago back in the queue: their worker died. Jobs whose worker
+    is alive keep beating, however long they run. Returns the count.
+    """
+    stale_before = timezone.now() - stale_after
+    return Job.objects.filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before),
+        status='running',
+    ).update(status='pending', started_at=None, heartbeat_at=None)
+
+
+def run_job(job):
+    """Execute a claimed job and store its result or the error traceback."""
+    if job.status == 'pending':
+        now = timezone.now()
+        Job.objects.filter(pk=job.pk).update(status='running', started_at=now, heartbeat_at=now)
+        job.status = 'running'
+    try:
+        with heartbeat(job):
+            result = HANDLERS[job.kind](job)
+    except Exception:
+        logger.exception('Job %s failed', job.pk)
+        job.mark_finished('failed', error_log=traceback.format_exc())
+    else:
+        job.mark_finished('succeeded', progress=100, result=result)
+    return job
+
+
+def run_scheduled_rollup():
+    """
+    Bring the daily rollup up to date when ROLLUP_INTERVAL seconds have passed
+    since this process last did. One worker thread runs it while the others
+    carry on with jobs.
+    """
+    global _last_rollup
+    interval = getattr(settings, 'ROLLUP_INTERVAL', 300)
+    if interval is None or not _rollup_lock.acquire(blocking=False):
+        return
+    try:
+        if _last_rollup is not None and time.monotonic() - _last_rollup < interval:
+            return
+        from reports.rollup import rollup_daily
+        try:
+            rollup_daily()
+        except Exception:
+            logger.exception('Daily rollup failed')
+        _last_rollup = time.monotonic()
+    finally:
+        _rollup_lock.release()
+
+
+def work(stop_event=None, poll_interval=2.0, once=False):
+    """
+    Worker loop: claim and run jobs until stopped (or the queue is empty with
+    once), keeping the daily rollup current in between.
+    """
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        run_scheduled_rollup()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            continue
+        run_job(job)
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+from .models import Job
+
+class JobSerializer(serializers.ModelSerializer):
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'progress', 'result', 'result_url', 'error_log', 'created_at', 'started_at', 'finished_at']
+
+    def get_result_url(self, job):
+        return job.result_file.url if job.result_file else None
@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APITestCase, APIClient, APITransactionTestCase
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from .models import Job
+from .runner import claim_next_job, enqueue, heartbeat, requeue_stale_jobs, run_job, work
+from products.models import Product
+from stock.services import get_available_quantity
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def stock_sheet(rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Product Name', 'Quantity'])
+    for row in rows:
+        ws.append(row)
+    output = BytesIO()
+    wb.save(output)
+    return SimpleUploadedFile('stock.xlsx', output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class JobRunnerTest(APITestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_worker_claims_and_runs_pending_jobs(self):
+        job = enqueue('stock_import', self.user, params={'entry_type': 'in'}, input_file=stock_sheet([['Test Product', 4]]))
+        self.assertEqual(job.status, 'pending')
+        work(once=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress), ('succeeded', 100))
+        self.assertEqual(job.result['success_count'], 1)
+        self.assertEqual(get_available_quantity(self.product.id), 4)
+        self.assertIsNone(claim_next_job())
+
+    def test_failed_job_keeps_traceback(self):
+        wb = Workbook()
+        wb.active.append(['Wrong', 'Columns'])
+        output = BytesIO()
+        wb.save(output)
+        job = enqueue('stock_import', self.user, params={'entry_type': 'in'}, input_file=SimpleUploadedFile('bad.xlsx', output.getvalue()))
+        run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Missing required columns', job.error_log)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_bulk_stock_in_view_enqueues_and_shows_results(self):
+        response = self.client.post(reverse('stock-in-page'), {'form_type': 'bulk', 'excel_file': stock_sheet([['Test Product', 2]])})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job-detail', args=[job.pk]))
+        response = self.client.get(reverse('stock-in-page'), {'job': job.pk})
+        self.assertEqual(response.context['bulk_results'][0]['status'], 'success')
+
+    def test_progress_api_is_scoped_to_owner(self):
+        job = enqueue('statistics_export', self.user, params={'format': 'csv'})
+        response = self.client.get(reverse('job-detail-api', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'pending')
+        User.objects.create_user(username='other', password='otherpass')
+        self.client.login(username='other', password='otherpass')
+        response = self.client.get(reverse('job-detail-api', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_job_produces_download(self):
+        job = enqueue('statistics_export', self.user, params={'format': 'csv'})
+        run_job(claim_next_job())
+        response = self.client.get(reverse('job-download', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Stock In-Out by Month', b''.join(response.streaming_content))
+
+
+class JobHeartbeatTest(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+
+    def test_only_jobs_whose_heartbeat_stopped_are_requeued(self):
+        now = timezone.now()
+        started = now - timedelta(hours=3)
+        alive = Job.objects.create(kind='stock_import', status='running', started_at=started, heartbeat_at=now - timedelta(seconds=20))
+        dead = Job.objects.create(kind='stock_import', status='running', started_at=started, heartbeat_at=now - timedelta(minutes=10))
+        never_beat = Job.objects.create(kind='stock_import', status='running', started_at=started)
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=5)), 2)
+        self.assertEqual(
+            dict(Job.objects.values_list('pk', 'status')),
+            {alive.pk: 'running', dead.pk: 'pending', never_beat.pk: 'pending'},
+        )
+
+    def test_heartbeat_is_refreshed_while_the_job_runs(self):
+        job = Job.objects.create(kind='stock_import', status='running', started_at=timezone.now())
+        with heartbeat(job, interval=0.01):
+            time.sleep(0.2)
+        job.refresh_from_db()
+        self.assertIsNotNone(job.heartbeat_at)
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # HTML pages
+    path('<int:pk>/', views.JobDetailPageView.as_view(), name='job-detail'),
+    path('<int:pk>/download/', views.JobDownloadView.as_view(), name='job-download'),
+
+    # API endpoints (progress polling)
+    path('api/', views.JobsAPI.as_view(), name='jobs-api'),
+    path('api/<int:pk>/', views.JobDetailAPI.as_view(), name='job-detail-api'),
+]
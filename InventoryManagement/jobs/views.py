@@ -0,0 +1,59 @@
+from django.http import FileResponse, Http404
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views import View
+from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.permissions import IsAuthenticated
+from .models import Job
+from .serializers import JobSerializer
+
+
+def jobs_for(user):
+    """Jobs a user may see: their own, or all of them for staff."""
+    jobs = Job.objects.all()
+    if not user.is_staff:
+        jobs = jobs.filter(created_by=user)
+    return jobs
+
+
+def get_finished_job(request, kind):
+    """Return the succeeded job named by ?job= for the current user, or None."""
+    job_id = request.GET.get('job')
+    if not job_id or not job_id.isdigit():
+        return None
+    return jobs_for(request.user).filter(pk=job_id, kind=kind, status='succeeded').first()
+
+
+class JobDetailPageView(View):
+    def get(self, request, pk):
+        if not request.user.is_authenticated:
+            return redirect('login')
+        job = get_object_or_404(jobs_for(request.user), pk=pk)
+        return render(request, 'jobs/detail.html', {'job': job})
+
+
+class JobDownloadView(View):
+    def get(self, request, pk):
+        if not request.user.is_authenticated:
+            return redirect('login')
+        job = get_object_or_404(jobs_for(request.user), pk=pk)
+        if not job.result_file:
+            raise Http404('This job has no result file.')
+        filename = (job.result or {}).get('filename') or job.result_file.name.rsplit('/', 1)[-1]
+        return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=filename)
+
+
+# API Views
+class JobsAPI(ListAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return jobs_for(self.request.user)
+
+
+class JobDetailAPI(RetrieveAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return jobs_for(self.request.user)
@@ -0,0 +1,62 @@
+import openpyxl
+from products.models import Product
+from stock.services import get_available_quantities
+
+
+def check_procurement_sheet(excel_file):
+    """
+    Compare each requested quantity in a BOM workbook with current stock.
+    Returns (results, insufficient_count) for the procurement report.
+    """
+    results = []
+    insufficient_count = 0
+    wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        name_idx = header.index('Product Name')
+        qty_idx = header.index('Requested Quantity')
+        # Build product lookup (case-insensitive)
+        products = {p.name.lower(): p for p in Product.objects.all()}
+        available_quantities = get_available_quantities()
+        for row in rows:
+            product_name = str(row[name_idx]).strip()
+            requested_qty = row[qty_idx]
+            product = products.get(product_name.lower())
+            if not product or not isinstance(requested_qty, (int, float)) or requested_qty <= 0:
+                results.append({
+                    'product_name': product_name,
+                    'requested_qty': requested_qty,
+                    'current_stock': '-',
+                    'status': 'invalid',
+                    'product_id': None,
+                    'rack_number': '',
+                    'shelf_number': '',
+                    'alert': False,
+                })
+                continue
+            current_stock = available_quantities.get(product.id, 0)
+            if current_stock == 0:
+                status = 'out_of_stock'
+                alert = True
+                insufficient_count += 1
+            elif current_stock < requested_qty:
+                status = 'insufficient'
+                alert = True
+                insufficient_count += 1
+            else:
+                status = 'ok'
+                alert = False
+            results.append({
+                'product_name': product.name,
+                'requested_qty': int(requested_qty),
+                'current_stock': current_stock,
+                'status': status,
+                'product_id': product.id,
+                'rack_number': product.rack_number or '',
+                'shelf_number': product.shelf_number or '',
+                'alert': alert,
+            })
+    finally:
+        wb.close()
+    return results, insufficient_count
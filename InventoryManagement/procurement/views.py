@@ -2,72 +2,37 @@ from django.shortcuts import render, redirect
 from django.views import View
 from django.contrib import messages
 from products.models import Product
-from stock.models import StockEntry
-from django.db.models import Sum
-import openpyxl
+from stock.services import get_available_quantity
+from django.urls import reverse
+from jobs.runner import enqueue
+from jobs.views import get_finished_job
 from inventory.models import Alert
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
 class ProcurementUploadView(View):
     def get(self, request):
+        job = get_finished_job(request, 'procurement_check') if request.user.is_authenticated else None
+        if job:
+            insufficient_count = job.result['insufficient_count']
+            if insufficient_count > 0:
+                messages.warning(request, f'There are {insufficient_count} items with insufficient or zero stock. Please review the report below.')
+            return render(request, 'procurement/upload.html', {'results': job.result['results']})
         return render(request, 'procurement/upload.html')
 
     def post(self, request):
-        results = []
-        insufficient_count = 0
-        if 'excel_file' in request.FILES:
-            excel_file = request.FILES['excel_file']
-            wb = openpyxl.load_workbook(excel_file)
-            ws = wb.active
-            header = [cell.value for cell in ws[1]]
-            name_idx = header.index('Product Name')
-            qty_idx = header.index('Requested Quantity')
-            # Build product lookup (case-insensitive)
-            products = {p.name.lower(): p for p in Product.objects.all()}
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                product_name = str(row[name_idx]).strip()
-                requested_qty = row[qty_idx]
-                product = products.get(product_name.lower())
-                if not product or not isinstance(requested_qty, (int, float)) or requested_qty <= 0:
-                    results.append({
-                        'product_name': product_name,
-                        'requested_qty': requested_qty,
-                        'current_stock': '-',
-                        'status': 'invalid',
-                        'product_id': None,
-                        'rack_number': '',
-                        'shelf_number': '',
-                        'alert': False,
-                    })
-                    continue
-                stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-                stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-                current_stock = stock_in - stock_out
-                if current_stock == 0:
-                    status = 'out_of_stock'
-                    alert = True
-                    insufficient_count += 1
-                elif current_stock < requested_qty:
-                    status = 'insufficient'
-                    alert = True
-                    insufficient_count += 1
-                else:
-                    status = 'ok'
-                    alert = False
-                results.append({
-                    'product_name': product.name,
-                    'requested_qty': int(requested_qty),
-                    'current_stock': current_stock,
-                    'status': status,
-                    'product_id': product.id,
-                    'rack_number': product.rack_number or '',
-                    'shelf_number': product.shelf_number or '',
-                    'alert': alert,
-                })
-        if insufficient_count > 0:
-            messages.warning(request, f'There are {insufficient_count} items with insufficient or zero stock. Please review the report below.')
-        return render(request, 'procurement/upload.html', {'results': results})
+        if not request.user.is_authenticated:
+            return redirect('login')
+        if 'excel_file' not in request.FILES:
+            return render(request, 'procurement/upload.html', {'results': []})
+        # The BOM check runs in the job worker; the job page polls for completion
+        job = enqueue(
+            'procurement_check',
+            request.user,
+            params={'return_url': reverse('procurement-upload')},
+            input_file=request.FILES['excel_file'],
+        )
+        return redirect('job-detail', pk=job.pk)
 
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -85,9 +50,7 @@ class ProcurementRestockView(View):
         try:
             product = Product.objects.get(id=product_id)
             requested_qty = int(requested_qty)
-            stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-            stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-            current_stock = stock_in - stock_out
+            current_stock = get_available_quantity(product.id)
             if requested_qty > current_stock:
                 # Create alert
                 Alert.objects.create(
@@ -0,0 +1,280 @@
+"""
+In-memory prefix index for the product typeahead on the stock, adjustment,
+rental and limit forms.
+
+Each product contributes sorted (key, product_id) pairs: its normalised full
+name, every word of the name after the first, its SKU and its serial number.
+A lookup bisects to the first key >= the prefix and walks forward while keys
+still start with it, so it costs O(log n + matches) whatever the catalogue
+size. Updates insert and remove single pairs in place.
+
+The index lives in each process. It is built on first use (or by
+warm_up_product_index() when the WSGI application starts) and kept current
+by the product signals once their transaction commits. Writes also bump a
+version in the cache. With a cache shared between processes, a process that
+sees a newer version than its own (a write handled by another worker, or by
+the run_jobs worker importing products) rebuilds, at most once every
+PRODUCT_AUTOCOMPLETE_REBUILD_INTERVAL seconds. The rebuild runs in a
+background thread while requests keep using the current index. With a
+per-process cache (LocMemCache, the default) there is nothing to compare
+against, so only this process's own writes are picked up; configure a shared
+cache when several processes write products.
+"""
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'products:autocomplete:version'
+# Cache backends that keep their values inside the process
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def normalise(text):
+    """Lower-case, strip accents and collapse whitespace so 'Café  Lamp' matches 'cafe l'."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def index_keys(name, sku, serial_number):
+    """The keys under which a product can be found."""
+    name = normalise(name)
+    keys = {name}
+    words = name.split(' ')
+    keys.update(' '.join(words[i:]) for i in range(1, len(words)))
+    keys.update(key for key in (normalise(sku), normalise(serial_number)) if key)
+    keys.discard('')
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.entries = []   # sorted [(key, product_id)]
+        self.products = {}  # product_id -> (name, sku, serial_number)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products)
+
+    def load(self, rows):
+        """Replace the contents with (id, name, sku, serial_number) rows."""
+        entries = []
+        products = {}
+        for product_id, name, sku, serial_number in rows:
+            products[product_id] = (name, sku, serial_number)
+            entries.extend((key, product_id) for key in index_keys(name, sku, serial_number))
+        entries.sort()
+        with self.lock:
+            self.entries, self.products = entries, products
+
+    def add(self, product_id, name, sku, serial_number):
+        with self.lock:
+            self._remove(product_id)
+            self.products[product_id] = (name, sku, serial_number)
+            for key in index_keys(name, sku, serial_number):
+                insort(self.entries, (key, product_id))
+
+    def remove(self, product_id):
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        for key in index_keys(*product):
+            position = bisect_left(self.entries, (key, product_id))
+            if position < len(self.entries) and self.entries[position] == (key, product_id):
+                del self.entries[position]
+
+    def search(self, prefix, limit=10):
+        """
+        Return up to `limit` [(product_id, name, sku, serial_number)] whose
+        name, a word of the name, SKU or serial starts with `prefix`.
+        Products whose full name starts with the prefix come first.
+        """
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            entries, products = self.entries, self.products
+            position = bisect_left(entries, (prefix,))
+            name_matches, other_matches, seen = [], [], set()
+            # Stop once enough full-name matches are found, or after a bounded scan
+            while position < len(entries) and len(name_matches) < limit and len(seen) < limit * 20:
+                key, product_id = entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                name, sku, serial_number = products[product_id]
+                row = (product_id, name, sku, serial_number)
+                (name_matches if normalise(name).startswith(prefix) else other_matches).append(row)
+        return (name_matches + other_matches)[:limit]
+
+    def iter_matches(self, prefix, batch_size=100):
+        """
+        Yield lists of up to `batch_size` [(product_id, name, sku, serial_number)]
+        matching `prefix`, in key order, until the matches run out. The lock is
+        only held while a batch is collected, so the caller can query between
+        batches.
+        """
+        prefix = normalise(prefix)
+        if not prefix:
+            return
+        after, seen = (prefix,), set()
+        while True:
+            batch = []
+            with self.lock:
+                # Resume after the last entry seen, wherever updates have moved it
+                position = bisect_right(self.entries, after)
+                while position < len(self.entries) and len(batch) < batch_size:
+                    key, product_id = self.entries[position]
+                    if not key.startswith(prefix):
+                        break
+                    position += 1
+                    after = (key, product_id)
+                    if product_id in seen:
+                        continue
+                    seen.add(product_id)
+                    batch.append((product_id, *self.products[product_id]))
+            if not batch:
+                return
+            yield batch
+
+
+class ProductIndex(PrefixIndex):
+    """PrefixIndex over the Product table, with lazy build and cross-process staleness checks."""
+
+    def __init__(self):
+        super().__init__()
+        self.built = False
+        self.version = None
+        self.built_at = 0.0
+        self.build_lock = threading.Lock()
+        self.rebuilding = False
+
+    def build(self, built_before=None):
+        """
+        Load the index from the Product table. With `built_before` (a
+        built_at value) it is skipped if another thread rebuilt since, so
+        callers that queued up on the lock do not each rebuild in turn.
+        """
+        with self.build_lock:
+            if built_before is not None and self.built_at > built_before:
+                return
+            version = cache.get(VERSION_KEY, 0)
+            self.load(Product.objects.values_list('id', 'name', 'sku', 'serial_number').iterator(chunk_size=5000))
+            self.version, self.built_at, self.built = version, time.monotonic(), True
+
+    def ensure_current(self):
+        if not self.built:
+            self.build(built_before=self.built_at)
+            return
+        # A per-process cache only ever holds this process's writes, which
+        # products_changed() has applied already
+        if not cache_is_shared():
+            return
+        interval = getattr(settings, 'PRODUCT_AUTOCOMPLETE_REBUILD_INTERVAL', 30)
+        if time.monotonic() - self.built_at >= interval and cache.get(VERSION_KEY, 0) != self.version:
+            self.start_rebuild()
+
+    def start_rebuild(self):
+        """Rebuild in a background thread, unless one is running; searches use the current index meanwhile."""
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._rebuild, args=(self.built_at,), name='product-index-rebuild', daemon=True).start()
+
+    def _rebuild(self, built_before):
+        try:
+            self.build(built_before)
+        except DatabaseError:
+            logger.warning('Product autocomplete rebuild failed', exc_info=True)
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def products_changed(self, product_ids):
+        """Apply the products' changes to this process and tell the others."""
+        if self.built:
+            current = {
+                row[0]: row[1:]
+                for row in Product.objects.filter(pk__in=product_ids).values_list('id', 'name', 'sku', 'serial_number')
+            }
+            for product_id in product_ids:
+                if product_id in current:
+                    self.add(product_id, *current[product_id])
+                else:
+                    self.remove(product_id)
+        previous = self.version
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, 1, None)
+            version = cache.get(VERSION_KEY, 1)
+        # Only claim the new version if no other process wrote in between
+        if previous is not None and version == previous + 1:
+            self.version = version
+
+
+def cache_is_shared():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+_index = ProductIndex()
+
+
+def get_product_index():
+    _index.ensure_current()
+    return _index
+
+
+def warm_up_product_index():
+    """Build the index ahead of the first typeahead request; errors leave it to be built lazily."""
+    try:
+        _index.build()
+    except DatabaseError:
+        logger.warning('Product autocomplete warm-up skipped', exc_info=True)
+
+
+def schedule_product_index_update(product_ids):
+    """Update the index for these products once the current transaction commits."""
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: _index.products_changed(product_ids))
+
+
+def autocomplete(prefix, limit=10):
+    return get_product_index().search(prefix, limit)
+
+
+def autocomplete_where(prefix, limit, select, batch_size=None):
+    """
+    Up to `limit` [(row, value)] for autocomplete matches that `select` keeps.
+    select(product_ids) returns {product_id: value} for the ones to keep; the
+    index is walked in batches until `limit` are kept or the matches run out.
+    Products whose full name starts with the prefix come first.
+    """
+    kept = []
+    for batch in get_product_index().iter_matches(prefix, batch_size or limit * 5):
+        values = select([row[0] for row in batch])
+        kept.extend((row, values[row[0]]) for row in batch if row[0] in values)
+        if len(kept) >= limit:
+            break
+    prefix = normalise(prefix)
+    kept.sort(key=lambda match: not normalise(match[0][1]).startswith(prefix))
+    return kept[:limit]
@@ -0,0 +1,179 @@
+import zipfile
+import pandas as pd
+from django.core.files.base import ContentFile
+from django.db import DataError, IntegrityError, transaction
+from audit.models import AuditLog
+from dashboard.kpis import schedule_kpi_invalidation
+from .models import Category, Product
+from .autocomplete import schedule_product_index_update
+from .search import refresh_product_search
+
+REQUIRED_COLUMNS = ['Name', 'SKU', 'Price']
+# Text columns whose length the database limits
+LIMITED_COLUMNS = ['Name', 'SKU', 'Brand', 'Serial Number']
+# Spreadsheet header -> Product field
+COLUMN_MAP = {
+    'Name': 'name',
+    'SKU': 'sku',
+    'Category': 'category',
+    'Brand': 'brand',
+    'Description': 'description',
+    'Serial Number': 'serial_number',
+    'Datasheet Filename': 'datasheet',
+}
+
+
+def _read_datasheets(datasheet_zip):
+    if not datasheet_zip:
+        return {}
+    with zipfile.ZipFile(datasheet_zip) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def _normalise(df):
+    """Map spreadsheet headers to field names and strip every text column."""
+    frame = pd.DataFrame(index=df.index)
+    for column, field in COLUMN_MAP.items():
+        values = df[column] if column in df.columns else pd.Series('', index=df.index)
+        frame[field] = values.where(values.notna(), '').astype(str).str.strip()
+    frame['price'] = pd.to_numeric(df['Price'], errors='coerce')
+    frame['row_number'] = df.index + 2  # header row plus 1-based numbering
+    return frame
+
+
+def _reject(errors, rows, message):
+    for row_number, sku in zip(rows['row_number'], rows['sku']):
+        errors.append({'row': int(row_number), 'sku': sku, 'error': message.format(sku=sku)})
+
+
+def _validate_columns(df, errors):
+    """Reject rows whose price or text columns would not fit their database columns; return the rest."""
+    price_field = Product._meta.get_field('price')
+    df = df.assign(price=df['price'].round(price_field.decimal_places))
+    too_large = df['price'].abs() >= 10 ** (price_field.max_digits - price_field.decimal_places)
+    _reject(errors, df[too_large], f'Price has more than {price_field.max_digits - price_field.decimal_places} digits before the decimal point')
+    df = df[~too_large]
+    for column in LIMITED_COLUMNS:
+        max_length = Product._meta.get_field(COLUMN_MAP[column]).max_length
+        too_long = df[COLUMN_MAP[column]].str.len() > max_length
+        _reject(errors, df[too_long], f'{column} is longer than {max_length} characters')
+        df = df[~too_long]
+    return df
+
+
+def _insert(products, row_numbers, errors, batch_size):
+    """
+    bulk_create `products`. When the database rejects the batch (a row the
+    column checks could not catch, or a SKU inserted meanwhile), insert them
+    one by one in savepoints so only the offending rows fail. Returns the
+    products created.
+    """
+    try:
+        with transaction.atomic():
+            Product.objects.bulk_create(products, batch_size=batch_size)
+        return products
+    except (DataError, IntegrityError):
+        pass
+    created = []
+    for row_number, product in zip(row_numbers, products):
+        # Undo what the rolled back batch assigned
+        product.pk, product._state.adding = None, True
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create([product])
+        except (DataError, IntegrityError) as e:
+            errors.append({'row': int(row_number), 'sku': product.sku, 'error': str(e)})
+        else:
+            created.append(product)
+    return created
+
+
+def import_products(excel_file, user, skip_duplicates=False, datasheet_zip=None, chunk_size=1000, progress=None):
+    """
+    Import products from an Excel workbook with column-wise validation, one
+    duplicate lookup per chunk and chunked bulk inserts. A chunk the database
+    rejects is retried row by row, so one bad row only fails itself.
+
+    Returns (created_count, skipped_count, errors) where errors is a list of
+    {'row', 'sku', 'error'} dicts. Raises ValueError for missing required
+    columns or an unreadable datasheet ZIP. progress, if given, is called with
+    the percentage of rows processed after each chunk.
+    """
+    engine = 'openpyxl' if excel_file.name.endswith('.xlsx') else 'xlrd'
+    df = pd.read_excel(excel_file, engine=engine, dtype=object)
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f'Missing required columns: {", ".join(missing_columns)}')
+    try:
+        zip_files = _read_datasheets(datasheet_zip)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f'Error reading datasheet ZIP: {e}')
+
+    df = _normalise(df)
+    errors = []
+    skipped_count = 0
+
+    invalid = (df['name'] == '') | (df['sku'] == '') | df['price'].isna()
+    _reject(errors, df[invalid], 'Missing required fields')
+    df = _validate_columns(df[~invalid], errors)
+
+    duplicated = df['sku'].duplicated(keep='first')
+    if skip_duplicates:
+        skipped_count += int(duplicated.sum())
+    else:
+        _reject(errors, df[duplicated], 'SKU "{sku}" appears more than once in the file')
+    df = df[~duplicated]
+
+    serial_duplicated = (df['serial_number'] != '') & df['serial_number'].duplicated(keep='first')
+    _reject(errors, df[serial_duplicated], 'Serial number for SKU "{sku}" appears more than once in the file')
+    df = df[~serial_duplicated]
+
+    categories = {name.casefold(): category_id for category_id, name in Category.objects.values_list('id', 'name')}
+    df['category_id'] = df['category'].str.casefold().map(categories)
+
+    created_count = 0
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        existing_skus = set(Product.objects.filter(sku__in=list(chunk['sku'])).values_list('sku', flat=True))
+        serials = [serial for serial in chunk['serial_number'] if serial]
+        existing_serials = set(
+            Product.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True)
+        ) if serials else set()
+
+        sku_taken = chunk['sku'].isin(existing_skus)
+        if skip_duplicates:
+            skipped_count += int(sku_taken.sum())
+        else:
+            _reject(errors, chunk[sku_taken], 'SKU "{sku}" already exists')
+        serial_taken = ~sku_taken & chunk['serial_number'].isin(existing_serials)
+        _reject(errors, chunk[serial_taken], 'Serial number for SKU "{sku}" already exists')
+        chunk = chunk[~sku_taken & ~serial_taken]
+
+        products = []
+        for row in chunk.itertuples(index=False):
+            datasheet = None
+            if row.datasheet and row.datasheet in zip_files:
+                datasheet = ContentFile(zip_files[row.datasheet], name=row.datasheet)
+            products.append(Product(
+                name=row.name,
+                sku=row.sku,
+                price=row.price,
+                category_id=None if pd.isna(row.category_id) else int(row.category_id),
+                brand=row.brand,
+                description=row.description,
+                serial_number=row.serial_number or None,
+                datasheet=datasheet,
+            ))
+        with transaction.atomic():
+            products = _insert(products, chunk['row_number'], errors, chunk_size)
+            AuditLog.log_many(user, 'created', products, batch_size=chunk_size)
+            # bulk_create skips post_save, so index the new products explicitly
+            refresh_product_search([product.pk for product in products])
+            schedule_product_index_update([product.pk for product in products])
+            schedule_kpi_invalidation()
+        created_count += len(products)
+        if progress:
+            progress(100 * min(start + chunk_size, len(df)) // len(df))
+
+    errors.sort(key=lambda error: error['row'])
+    return created_count, skipped_count, errors
@@ -0,0 +1,14 @@
+import time
+from django.core.management.base import BaseCommand
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index from the products, categories and serial numbers'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        backend.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt product search index ({backend.__class__.__name__}) in {elapsed:.2f}s"))
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE products_product_search USING fts5("
+    "name, brand, sku, serials, category, description, tokenize='trigram')",
+    "INSERT INTO products_product_search(rowid, name, brand, sku, serials, category, description) "
+    "SELECT p.id, p.name, coalesce(p.brand, ''), p.sku, "
+    "trim(coalesce(p.serial_number, '') || ' ' || coalesce((SELECT group_concat(s.serial_number, ' ') "
+    "FROM inventory_serialnumber s WHERE s.product_id = p.id), '')), "
+    "coalesce(c.name, ''), coalesce(p.description, '') "
+    "FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id",
+]
+SQLITE_REVERSE = [
+    'DROP TABLE IF EXISTS products_product_search',
+]
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE TABLE products_product_search ('
+    'product_id bigint PRIMARY KEY, name text, brand text, sku text, serials text, '
+    'category text, description text, document text NOT NULL)',
+    'CREATE INDEX products_product_search_trgm ON products_product_search USING GIN (document gin_trgm_ops)',
+    "INSERT INTO products_product_search(product_id, name, brand, sku, serials, category, description, document) "
+    "SELECT d.*, concat_ws(' ', d.name, d.brand, d.sku, d.serials, d.category, d.description) FROM ("
+    "SELECT p.id, p.name, coalesce(p.brand, ''), p.sku, "
+    "trim(coalesce(p.serial_number, '') || ' ' || coalesce((SELECT string_agg(s.serial_number, ' ') "
+    "FROM inventory_serialnumber s WHERE s.product_id = p.id), '')), "
+    "coalesce(c.name, ''), coalesce(p.description, '') "
+    "FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id"
+    ") AS d(id, name, brand, sku, serials, category, description)",
+]
+POSTGRESQL_REVERSE = [
+    'DROP TABLE IF EXISTS products_product_search',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_table = _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_search_table = _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        ('inventory', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
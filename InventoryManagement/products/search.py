@@ -0,0 +1,284 @@
+"""
+Indexed product search.
+
+Products are indexed by name, brand, SKU, serial numbers (the product's own
+and its SerialNumber rows), category and description in a search table that
+is kept current by the signals in products.signals and refreshed explicitly
+after bulk inserts (refresh_product_search) or as a whole (manage.py
+rebuild_product_search). Each database vendor has a backend with the same
+interface:
+
+* SQLite: an FTS5 table with the trigram tokenizer, so every whitespace
+  separated term of three or more characters is a case-insensitive
+  substring match served by the index (shorter terms fall back to LIKE on
+  the search table). Ranked with bm25(), weighting name, SKU and serials
+  above brand, category and description.
+* PostgreSQL: a table with a concatenated document and a pg_trgm GIN index,
+  matched with ILIKE and ranked with word_similarity().
+* Anything else falls back to unindexed icontains lookups on the product
+  and its related rows, ordered by name, with nothing to keep current and
+  no typo tolerance.
+
+When no product contains every term, the search falls back to typo-tolerant
+matching: candidates sharing trigrams with the query are kept if one of
+their words is similar enough to each term (trigram similarity, as pg_trgm).
+"""
+import re
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .models import Product
+
+TABLE = 'products_product_search'
+COLUMNS = ['name', 'brand', 'sku', 'serials', 'category', 'description']
+FUZZY_CANDIDATES = 200
+RANK_CANDIDATES = 1000
+FUZZY_THRESHOLD = 0.3
+
+# The document of each product, as one row per product id
+DOCUMENT_SQL = {
+    'sqlite': (
+        "SELECT p.id, p.name, coalesce(p.brand, ''), p.sku, "
+        "trim(coalesce(p.serial_number, '') || ' ' || coalesce((SELECT group_concat(s.serial_number, ' ') "
+        "FROM inventory_serialnumber s WHERE s.product_id = p.id), '')), "
+        "coalesce(c.name, ''), coalesce(p.description, '') "
+        "FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id"
+    ),
+    'postgresql': (
+        "SELECT p.id, p.name, coalesce(p.brand, ''), p.sku, "
+        "trim(coalesce(p.serial_number, '') || ' ' || coalesce((SELECT string_agg(s.serial_number, ' ') "
+        "FROM inventory_serialnumber s WHERE s.product_id = p.id), '')), "
+        "coalesce(c.name, ''), coalesce(p.description, '') "
+        "FROM products_product p LEFT JOIN products_category c ON c.id = p.category_id"
+    ),
+}
+
+
+def parse_terms(text):
+    """Split a search string on whitespace into lower-cased terms (punctuation is kept, e.g. SKU dashes)."""
+    return [term.lower() for term in (text or '').split()]
+
+
+def trigrams(word):
+    """pg_trgm style trigrams of one word, padded so short words still have some."""
+    padded = f'  {word.lower()} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    return len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+
+
+def _fuzzy_rank(terms, documents):
+    """Return [(product_id, score)] for documents with a word similar to every term, best first."""
+    ranked = []
+    for product_id, text in documents:
+        words = set(re.findall(r'\w[\w-]*', text.lower()))
+        scores = [max((similarity(term, word) for word in words), default=0.0) for term in terms]
+        if scores and min(scores) >= FUZZY_THRESHOLD:
+            ranked.append((product_id, sum(scores) / len(scores)))
+    ranked.sort(key=lambda item: -item[1])
+    return ranked
+
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class IContainsProductSearchBackend:
+    """Unindexed fallback for databases without a search backend."""
+
+    def _matching(self, terms):
+        products = Product.objects.all()
+        for term in terms:
+            products = products.filter(
+                Q(name__icontains=term) | Q(brand__icontains=term) | Q(sku__icontains=term)
+                | Q(serial_number__icontains=term) | Q(serial_numbers__serial_number__icontains=term)
+                | Q(category__name__icontains=term) | Q(description__icontains=term)
+            )
+        return products.values('id')
+
+    def search_ids(self, terms, limit):
+        return list(Product.objects.filter(id__in=self._matching(terms)).order_by('name').values_list('id', flat=True)[:limit])
+
+    def filter(self, queryset, terms):
+        return queryset.filter(id__in=self._matching(terms)).order_by('name')
+
+    def fuzzy_ids(self, terms, limit):
+        return []
+
+    def refresh(self, product_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteProductSearchBackend:
+    # bm25 weights in COLUMNS order
+    weights = '10.0, 4.0, 8.0, 8.0, 2.0, 1.0'
+
+    def _where(self, terms):
+        clauses, params = [], []
+        long_terms = [term for term in terms if len(term) >= 3]
+        if long_terms:
+            clauses.append(f'{TABLE} MATCH %s')
+            params.append(' AND '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms))
+        for term in terms:
+            if len(term) < 3:
+                clauses.append('(' + ' OR '.join(f"{column} LIKE %s ESCAPE '\\'" for column in COLUMNS) + ')')
+                params.extend([_like_pattern(term)] * len(COLUMNS))
+        return ' AND '.join(clauses), params, bool(long_terms)
+
+    def search_ids(self, terms, limit):
+        where, params, ranked = self._where(terms)
+        order = f'bm25({TABLE}, {self.weights})' if ranked else 'name'
+        # Rank only the first RANK_CANDIDATES matches so very broad terms stay fast
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM (SELECT rowid, {order} AS search_rank FROM {TABLE} WHERE {where} LIMIT %s) '
+                f'ORDER BY search_rank LIMIT %s',
+                params + [RANK_CANDIDATES, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, terms):
+        where, params, ranked = self._where(terms)
+        queryset = queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {TABLE} WHERE {where}', params))
+        if not ranked:
+            return queryset.order_by('name')
+        return queryset.annotate(search_rank=RawSQL(
+            f'(SELECT bm25({TABLE}, {self.weights}) FROM {TABLE} WHERE {where} AND rowid = products_product.id)',
+            params, output_field=FloatField(),
+        )).order_by('search_rank', 'name')
+
+    def fuzzy_ids(self, terms, limit):
+        grams = set()
+        for term in terms:
+            grams.update(gram for gram in trigrams(term) if gram.strip() == gram)
+        if not grams:
+            return []
+        match = ' OR '.join('"{}"'.format(gram.replace('"', '""')) for gram in sorted(grams))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, name || ' ' || brand || ' ' || sku || ' ' || serials || ' ' || category FROM {TABLE} "
+                f'WHERE {TABLE} MATCH %s ORDER BY bm25({TABLE}, {self.weights}) LIMIT %s',
+                [match, FUZZY_CANDIDATES],
+            )
+            return [product_id for product_id, _ in _fuzzy_rank(terms, cursor.fetchall())[:limit]]
+
+    def refresh(self, product_ids):
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', product_ids)
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, {", ".join(COLUMNS)}) {DOCUMENT_SQL["sqlite"]} WHERE p.id IN ({placeholders})',
+                product_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            cursor.execute(f'INSERT INTO {TABLE}(rowid, {", ".join(COLUMNS)}) {DOCUMENT_SQL["sqlite"]}')
+            cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+class PostgreSQLProductSearchBackend:
+    def _where(self, terms):
+        return ' AND '.join(['document ILIKE %s'] * len(terms)), [_like_pattern(term) for term in terms]
+
+    def search_ids(self, terms, limit):
+        where, params = self._where(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT product_id FROM {TABLE} WHERE {where} '
+                f'ORDER BY word_similarity(%s, document) DESC, name LIMIT %s',
+                params + [' '.join(terms), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, terms):
+        where, params = self._where(terms)
+        return queryset.filter(id__in=RawSQL(f'SELECT product_id FROM {TABLE} WHERE {where}', params)).annotate(search_rank=RawSQL(
+            f'(SELECT word_similarity(%s, document) FROM {TABLE} WHERE product_id = products_product.id)',
+            [' '.join(terms)], output_field=FloatField(),
+        )).order_by('-search_rank', 'name')
+
+    def fuzzy_ids(self, terms, limit):
+        query = ' '.join(terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT product_id, document FROM {TABLE} WHERE %s <%% document '
+                f'ORDER BY word_similarity(%s, document) DESC LIMIT %s',
+                [query, query, FUZZY_CANDIDATES],
+            )
+            return [product_id for product_id, _ in _fuzzy_rank(terms, cursor.fetchall())[:limit]]
+
+    def _insert_sql(self, where=''):
+        return (
+            f'INSERT INTO {TABLE}(product_id, {", ".join(COLUMNS)}, document) '
+            f"SELECT d.*, concat_ws(' ', d.{', d.'.join(COLUMNS)}) "
+            f'FROM ({DOCUMENT_SQL["postgresql"]} {where}) AS d(id, {", ".join(COLUMNS)})'
+        )
+
+    def refresh(self, product_ids):
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE product_id IN ({placeholders})', product_ids)
+            cursor.execute(self._insert_sql(f'WHERE p.id IN ({placeholders})'), product_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+            cursor.execute(self._insert_sql())
+
+
+BACKENDS = {
+    'sqlite': SQLiteProductSearchBackend,
+    'postgresql': PostgreSQLProductSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, IContainsProductSearchBackend)()
+
+
+def search_product_ids(text, limit=20):
+    """Return up to `limit` product ids matching `text`, best first, falling back to fuzzy matching."""
+    terms = parse_terms(text)
+    if not terms:
+        return []
+    backend = get_search_backend()
+    return backend.search_ids(terms, limit) or backend.fuzzy_ids(terms, limit)
+
+
+def search_products(queryset, text):
+    """
+    Narrow a Product queryset to the products matching `text`, best matches
+    first. Without an exact match the fuzzy candidates are returned instead.
+    """
+    terms = parse_terms(text)
+    if not terms:
+        return queryset
+    backend = get_search_backend()
+    matches = backend.filter(queryset, terms)
+    if matches.exists():
+        return matches
+    product_ids = backend.fuzzy_ids(terms, FUZZY_CANDIDATES)
+    return queryset.filter(id__in=product_ids).annotate(search_rank=Case(
+        *[When(id=product_id, then=Value(position)) for position, product_id in enumerate(product_ids)],
+        output_field=IntegerField(),
+    )).order_by('search_rank')
+
+
+def refresh_product_search(product_ids, batch_size=500):
+    """Rewrite the search documents of the given products (removing those that no longer exist)."""
+    product_ids = sorted(set(product_ids))
+    backend = get_search_backend()
+    for start in range(0, len(product_ids), batch_size):
+        backend.refresh(product_ids[start:start + batch_size])
+
+
+def rebuild_product_search():
+    get_search_backend().rebuild()
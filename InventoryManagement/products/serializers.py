@@ -10,3 +10,11 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+
+
+class ProductSearchResultSerializer(serializers.ModelSerializer):
+    category = serializers.CharField(source='category.name', default=None)
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'sku', 'brand', 'serial_number', 'category']
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from inventory.models import SerialNumber
+from .models import Category, Product
+from .autocomplete import schedule_product_index_update
+from .search import refresh_product_search
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_document(sender, instance, **kwargs):
+    """Rewrite (or drop) the product's search document in the same transaction."""
+    refresh_product_search([instance.pk])
+    schedule_product_index_update([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_products(sender, instance, created, **kwargs):
+    if not created:
+        refresh_product_search(instance.products.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_products(sender, instance, **kwargs):
+    # The products are detached (SET_NULL) with a plain UPDATE, so note them first
+    instance._search_product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def refresh_detached_products(sender, instance, **kwargs):
+    refresh_product_search(getattr(instance, '_search_product_ids', []))
+
+
+@receiver(pre_save, sender=SerialNumber)
+def remember_serial_product(sender, instance, **kwargs):
+    instance._search_previous_product_id = (
+        SerialNumber.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=SerialNumber)
+@receiver(post_delete, sender=SerialNumber)
+def refresh_serial_products(sender, instance, **kwargs):
+    previous = getattr(instance, '_search_previous_product_id', None)
+    refresh_product_search([instance.product_id] + ([previous] if previous else []))
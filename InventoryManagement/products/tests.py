@@ -1,7 +1,20 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from io import BytesIO
+from openpyxl import Workbook
 from .models import Category, Product
+from .importers import import_products
+from .autocomplete import VERSION_KEY, PrefixIndex, ProductIndex, get_product_index
+from .search import BACKENDS, IContainsProductSearchBackend, get_search_backend, search_product_ids, search_products
+from inventory.models import InventoryAdjustment, SerialNumber
+from stock.models import StockEntry
+from users.models import Role
+from audit.models import AuditLog
+from InventoryManagement.profiling import profile
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -47,3 +60,284 @@ class ProductsAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreaterEqual(len(response.data), 1)
+
+
+class ProductImportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Audio Equipment')
+        Product.objects.create(name='Existing Product', sku='EP001', serial_number='SN-EXISTING')
+
+    def make_sheet(self, rows):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Name', 'Category', 'Brand', 'SKU', 'Serial Number', 'Price', 'Description'])
+        for row in rows:
+            ws.append(row)
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        output.name = 'products.xlsx'
+        return output
+
+    def test_import_with_per_row_errors(self):
+        sheet = self.make_sheet([
+            ['Speaker', 'audio equipment', 'Acme', 'SP001', 'SN1', 10, 'Loud'],
+            ['Speaker copy', '', '', 'SP001', '', 11, ''],
+            ['Clash', '', '', 'EP001', '', 5, ''],
+            ['No price', '', '', 'NP001', '', None, ''],
+            ['Cable', 'Unknown', '', 'CB001', '', 2.5, ''],
+            ['Cable 2', '', '', 'CB002', '', 3, ''],
+        ])
+        created, skipped, errors = import_products(sheet, self.user)
+        self.assertEqual((created, skipped), (3, 0))
+        self.assertEqual([error['row'] for error in errors], [3, 4, 5])
+        speaker = Product.objects.get(sku='SP001')
+        self.assertEqual(speaker.category, self.category)
+        self.assertIsNone(Product.objects.get(sku='CB002').serial_number)
+        self.assertEqual(AuditLog.objects.filter(action='created').count(), 3)
+
+    def test_values_too_large_for_their_columns_fail_only_their_rows(self):
+        sheet = self.make_sheet([
+            ['Long name ' + 'x' * 200, '', '', 'LN001', '', 1, ''],
+            ['Pricey', '', '', 'PR001', '', 123456789, ''],
+            ['Rounded', '', '', 'RD001', '', 99999999.994, ''],
+            ['Fine', '', '', 'FN001', '', 1, ''],
+        ])
+        created, skipped, errors = import_products(sheet, self.user)
+        self.assertEqual(created, 2)
+        self.assertEqual([(error['row'], error['sku']) for error in errors], [(2, 'LN001'), (3, 'PR001')])
+        self.assertEqual(errors[0]['error'], 'Name is longer than 200 characters')
+
+    def test_rows_the_database_rejects_are_retried_one_by_one(self):
+        sheet = self.make_sheet([
+            ['First', '', '', 'RC001', '', 1, ''],
+            ['Raced', '', '', 'RACE', '', 1, ''],
+            ['Last', '', '', 'RC002', '', 1, ''],
+        ])
+        # Another upload creates RACE after the duplicate lookup
+        Product.objects.create(name='Winner', sku='RACE')
+        with mock.patch('products.importers.Product.objects.filter', return_value=Product.objects.none()):
+            created, skipped, errors = import_products(sheet, self.user)
+        self.assertEqual(created, 2)
+        self.assertEqual([error['row'] for error in errors], [3])
+        self.assertEqual(Product.objects.filter(sku__in=['RC001', 'RC002']).count(), 2)
+        self.assertEqual(AuditLog.objects.filter(action='created').count(), 2)
+
+    def test_skip_duplicates(self):
+        sheet = self.make_sheet([
+            ['Clash', '', '', 'EP001', '', 5, ''],
+            ['New', '', '', 'NW001', '', 5, ''],
+            ['New again', '', '', 'NW001', '', 5, ''],
+        ])
+        created, skipped, errors = import_products(sheet, self.user, skip_duplicates=True)
+        self.assertEqual((created, skipped, errors), (1, 2, []))
+
+    def test_missing_required_columns(self):
+        wb = Workbook()
+        wb.active.append(['Name'])
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        output.name = 'products.xlsx'
+        with self.assertRaises(ValueError):
+            import_products(output, self.user)
+
+
+class ProductSearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='searchpass')
+        self.client.login(username='searcher', password='searchpass')
+        self.audio = Category.objects.create(name='Audio Equipment')
+        self.speaker = Product.objects.create(name='Bluetooth Speaker', brand='Acme', sku='SPK-100', category=self.audio, description='Portable')
+        self.cable = Product.objects.create(name='Speaker Cable', brand='Wireco', sku='CBL-200', description='Copper speaker wire')
+        self.camera = Product.objects.create(name='Action Camera', brand='Acme', sku='CAM-300', serial_number='SN-CAM-0001')
+        SerialNumber.objects.create(serial_number='SN-XYZ-9876', product=self.speaker)
+
+    def names(self, text):
+        return [product.name for product in search_products(Product.objects.all(), text)]
+
+    def test_substring_and_ranking(self):
+        self.assertEqual(self.names('speaker'), ['Speaker Cable', 'Bluetooth Speaker'])
+        self.assertEqual(self.names('acme cam'), ['Action Camera'])
+        self.assertEqual(self.names('cbl-2'), ['Speaker Cable'])
+        self.assertEqual(self.names('copper'), ['Speaker Cable'])
+
+    def test_serials_and_category_are_indexed(self):
+        self.assertEqual(self.names('xyz-98'), ['Bluetooth Speaker'])
+        self.assertEqual(self.names('sn-cam'), ['Action Camera'])
+        self.assertEqual(self.names('audio'), ['Bluetooth Speaker'])
+
+    def test_short_terms_and_typos(self):
+        self.assertEqual(self.names('ac'), ['Action Camera', 'Bluetooth Speaker'])
+        self.assertEqual(self.names('speakr'), ['Speaker Cable', 'Bluetooth Speaker'])
+        self.assertEqual(self.names('zzzzqq'), [])
+
+    def test_index_follows_changes(self):
+        self.audio.name = 'Sound Gear'
+        self.audio.save()
+        self.assertEqual(self.names('sound gear'), ['Bluetooth Speaker'])
+        self.camera.name = 'Dash Cam'
+        self.camera.save()
+        self.assertEqual(self.names('dash'), ['Dash Cam'])
+        SerialNumber.objects.filter(serial_number='SN-XYZ-9876').get().delete()
+        self.assertEqual(self.names('xyz-98'), [])
+        self.audio.delete()
+        self.assertEqual(self.names('sound'), [])
+        self.camera.delete()
+        self.assertEqual(search_product_ids('dash'), [])
+
+    def test_other_databases_fall_back_to_icontains(self):
+        with mock.patch.dict(BACKENDS, clear=True):
+            self.assertIsInstance(get_search_backend(), IContainsProductSearchBackend)
+            self.assertEqual(self.names('speaker'), ['Bluetooth Speaker', 'Speaker Cable'])
+            self.assertEqual(self.names('acme cam'), ['Action Camera'])
+            self.assertEqual(self.names('xyz-98'), ['Bluetooth Speaker'])
+            self.assertEqual(search_product_ids('audio'), [self.speaker.id])
+            # The signals' refresh is a no-op
+            Product.objects.create(name='Studio Monitor', sku='MON-400')
+            self.assertEqual(self.names('studio'), ['Studio Monitor'])
+
+    def test_search_api(self):
+        response = self.client.get(reverse('product-search-api'), {'q': 'speaker', 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{
+            'id': self.cable.id, 'name': 'Speaker Cable', 'sku': 'CBL-200',
+            'brand': 'Wireco', 'serial_number': None, 'category': None,
+        }])
+        self.assertEqual(self.client.get(reverse('product-search-api')).data, [])
+
+    def test_list_and_serial_pages_use_search(self):
+        response = self.client.get(reverse('products-list'), {'search': 'speaker'})
+        self.assertEqual([product.name for product in response.context['products']], ['Speaker Cable', 'Bluetooth Speaker'])
+        response = self.client.get(reverse('inventory-serials-page'), {'search': 'bluetooth'})
+        self.assertEqual([serial.serial_number for serial in response.context['serials']], ['SN-XYZ-9876'])
+
+    def test_serial_search_lists_the_matching_serial_only(self):
+        SerialNumber.objects.create(serial_number='SN-ABC-1111', product=self.speaker)
+        response = self.client.get(reverse('inventory-serials-page'), {'search': 'xyz-98'})
+        self.assertEqual([serial.serial_number for serial in response.context['serials']], ['SN-XYZ-9876'])
+        response = self.client.get(reverse('inventory-serials-page'), {'search': 'bluetooth'})
+        self.assertEqual(sorted(serial.serial_number for serial in response.context['serials']), ['SN-ABC-1111', 'SN-XYZ-9876'])
+
+
+class ProductAutocompleteTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='picker', password='pickerpass')
+        self.client.login(username='picker', password='pickerpass')
+        self.speaker = Product.objects.create(name='Bluetooth Speaker', sku='SPK-100', serial_number='SN-0042')
+        self.cable = Product.objects.create(name='Speaker Cable', sku='CBL-200')
+        self.lamp = Product.objects.create(name='Café Lamp', sku='LMP-300')
+        get_product_index().build()
+
+    def names(self, prefix, limit=10):
+        return [name for _, name, _, _ in get_product_index().search(prefix, limit)]
+
+    def test_prefix_matches_name_words_sku_and_serial(self):
+        self.assertEqual(self.names('speaker'), ['Speaker Cable', 'Bluetooth Speaker'])
+        self.assertEqual(self.names('blue'), ['Bluetooth Speaker'])
+        self.assertEqual(self.names('cbl'), ['Speaker Cable'])
+        self.assertEqual(self.names('sn-00'), ['Bluetooth Speaker'])
+        self.assertEqual(self.names('cafe  l'), ['Café Lamp'])
+        self.assertEqual(self.names('s', limit=1), ['Speaker Cable'])
+        self.assertEqual(self.names('peaker'), [])
+
+    def test_incremental_updates(self):
+        index = PrefixIndex()
+        index.load([(1, 'Router', 'RT-1', None)])
+        index.add(2, 'Router Mount', 'RM-1', None)
+        index.add(1, 'Switch', 'RT-1', None)
+        self.assertEqual([row[0] for row in index.search('router')], [2])
+        self.assertEqual([row[0] for row in index.search('rt-')], [1])
+        index.remove(2)
+        self.assertEqual(index.search('router'), [])
+        self.assertEqual(index.entries, sorted(index.entries))
+        self.assertEqual(len(index), 1)
+
+    def test_signals_update_the_index_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cable.name = 'HDMI Cable'
+            self.cable.save()
+        self.assertEqual(self.names('hdmi'), ['HDMI Cable'])
+        self.assertEqual(self.names('speaker'), ['Bluetooth Speaker'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.delete()
+        self.assertEqual(self.names('cafe'), [])
+
+    def test_autocomplete_api(self):
+        url = reverse('product-autocomplete-api')
+        response = self.client.get(url, {'q': 'spe', 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': self.cable.id, 'name': 'Speaker Cable', 'sku': 'CBL-200', 'serial_number': None}])
+        StockEntry.objects.create(product=self.speaker, quantity=3, entry_type='in')
+        response = self.client.get(url, {'q': 'spe', 'in_stock': '1'})
+        self.assertEqual([(row['id'], row['available']) for row in response.data], [(self.speaker.id, 3)])
+
+    def test_in_stock_filter_walks_the_index_until_the_page_fills(self):
+        Product.objects.bulk_create(Product(name=f'Widget {number:02}', sku=f'WDG-{number:02}') for number in range(30))
+        stocked = Product.objects.create(name='Widget Zeta', sku='WDG-ZZ')
+        with self.captureOnCommitCallbacks(execute=True):
+            StockEntry.objects.create(product=stocked, quantity=2, entry_type='in')
+            StockEntry.objects.create(product=self.speaker, quantity=1, entry_type='in')
+        get_product_index().build()
+        response = self.client.get(reverse('product-autocomplete-api'), {'q': 'w', 'limit': 1, 'in_stock': '1'})
+        self.assertEqual([(row['name'], row['available']) for row in response.data], [('Widget Zeta', 2)])
+
+    @override_settings(PRODUCT_AUTOCOMPLETE_REBUILD_INTERVAL=0)
+    def test_other_processes_writes_trigger_a_background_rebuild(self):
+        index = get_product_index()
+        # Written by another process: no signal reaches this index
+        Product.objects.bulk_create([Product(name='Imported Drill', sku='DRL-1')])
+        cache.set(VERSION_KEY, (index.version or 0) + 1)
+        with mock.patch.object(ProductIndex, 'start_rebuild') as start_rebuild:
+            # A per-process cache cannot report other processes' writes
+            self.assertEqual(self.names('drill'), [])
+            start_rebuild.assert_not_called()
+            with mock.patch('products.autocomplete.cache_is_shared', return_value=True):
+                # The current index answers while the rebuild runs
+                self.assertEqual(self.names('drill'), [])
+            start_rebuild.assert_called_once_with()
+        index.build(built_before=index.built_at)
+        self.assertEqual(self.names('drill'), ['Imported Drill'])
+
+    def test_waiting_rebuilds_skip_once_another_thread_rebuilt(self):
+        index = get_product_index()
+        stale = index.built_at - 1
+        with self.assertNumQueries(0):
+            index.build(built_before=stale)
+
+    def test_forms_no_longer_embed_the_catalogue(self):
+        role = Role.objects.create(name='Admin')
+        User.objects.create_user(username='boss', password='bosspass', role=role)
+        self.client.login(username='boss', password='bosspass')
+        for name in ['stock-in-page', 'stock-out-page', 'inventory-adjustments-page', 'rental-management', 'inventory-limits-page']:
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200, name)
+            self.assertNotIn('products', response.context, name)
+            self.assertNotContains(response, 'Bluetooth Speaker')
+
+
+class ProductDetailQueryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_query_count_does_not_grow_with_history(self):
+        def query_count():
+            with profile() as result:
+                self.assertEqual(self.client.get(reverse('product-detail', args=[self.product.id])).status_code, 200)
+            return result.query_count
+
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', created_by=self.user)
+        few = query_count()
+        for _ in range(9):
+            StockEntry.objects.create(product=self.product, quantity=1, entry_type='out', created_by=self.user)
+        self.assertEqual(query_count(), few)
+
+    def test_shrinkage_rate_classifies_adjustments_by_quantity_sign(self):
+        StockEntry.objects.create(product=self.product, quantity=8, entry_type='in', created_by=self.user)
+        InventoryAdjustment.objects.create(product=self.product, adjustment_type='manual', quantity=2, created_by=self.user)
+        InventoryAdjustment.objects.create(product=self.product, adjustment_type='manual', quantity=-3, created_by=self.user)
+        response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.context['stock_stats']['shrinkage_rate'], 30.0)
@@ -0,0 +1,36 @@
+"""
+The Excel template offered for the bulk product upload. openpyxl is only
+imported here, and this module only when a template is downloaded, so the
+views load without it.
+"""
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Font, PatternFill
+
+HEADERS = ['Name', 'Category', 'Brand', 'SKU', 'Serial Number', 'Price', 'Description', 'Datasheet Filename']
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FILENAME = 'product_upload_template.xlsx'
+
+
+def upload_template_workbook(sample_rows, sample_font=None):
+    """A workbook with the styled header row and `sample_rows` below it."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Product Template"
+
+    for col, header in enumerate(HEADERS, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center")
+
+    for row, data in enumerate(sample_rows, 2):
+        for col, value in enumerate(data, 1):
+            cell = ws.cell(row=row, column=col, value=value)
+            if sample_font:
+                cell.font = Font(**sample_font)
+
+    # Fit the columns to their contents
+    for column in ws.columns:
+        max_length = max(len(str(cell.value)) for cell in column if cell.value is not None)
+        ws.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    return wb
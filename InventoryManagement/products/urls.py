@@ -18,6 +18,8 @@ urlpatterns = [
     # API endpoints (for programmatic access)
     path('api/categories/', views.CategoryListCreate.as_view(), name='categories-api'),
     path('api/products/', views.ProductListCreate.as_view(), name='products-api'),
+    path('api/search/', views.ProductSearchAPI.as_view(), name='product-search-api'),
+    path('api/autocomplete/', views.ProductAutocompleteAPI.as_view(), name='product-autocomplete-api'),
     
     # Excel template download
     path('download-excel-template/', views.download_excel_template, name='download-excel-template'),
@@ -8,71 +8,37 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Category, Product
-from .serializers import CategorySerializer, ProductSerializer
+from .autocomplete import autocomplete, autocomplete_where
+from .search import search_product_ids, search_products
+from .serializers import CategorySerializer, ProductSearchResultSerializer, ProductSerializer
+from jobs.runner import enqueue
+from jobs.views import get_finished_job
 from audit.models import AuditLog
 from inventory.models import QuantityLimit, Alert, InventoryAdjustment
-from stock.models import StockEntry
+from stock.models import StockBalance, StockEntry
+from stock.services import get_stock_balance
 from django.contrib import messages
 from django.db import models
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, F, Q, Value
 from django.http import HttpResponse
-import pandas as pd
+from django.conf import settings
+from django.urls import reverse
 import io
 import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-import zipfile
-from django.core.files.base import ContentFile
 from users.views import admin_required
 
 def download_excel_template(request):
     """Download Excel template for bulk product upload"""
     if not request.user.is_authenticated:
         return redirect('login')
-    
-    # Create a new workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Product Template"
-    
-    # Define headers
-    headers = ['Name', 'Category', 'Brand', 'SKU', 'Serial Number', 'Price', 'Description', 'Datasheet Filename']
-    
-    # Add headers with styling
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Add sample data row
-    sample_data = ['Sample Product', 'Electronics', 'Sample Brand', 'SKU001', 'SN123456', '99.99', 'Sample product description', 'widget2000.pdf']
-    for col, value in enumerate(sample_data, 1):
-        cell = ws.cell(row=2, column=col, value=value)
-        cell.font = Font(italic=True, color="666666")
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    from .upload_template import CONTENT_TYPE, FILENAME, upload_template_workbook
+    wb = upload_template_workbook(
+        [['Sample Product', 'Electronics', 'Sample Brand', 'SKU001', 'SN123456', '99.99', 'Sample product description', 'widget2000.pdf']],
+        sample_font={'italic': True, 'color': "666666"},
     )
-    response['Content-Disposition'] = 'attachment; filename="product_upload_template.xlsx"'
-    
-    # Save to response
+    response = HttpResponse(content_type=CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{FILENAME}"'
     wb.save(response)
     return response
 
@@ -81,8 +47,14 @@ class ProductCreateView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
+        job = get_finished_job(request, 'product_import')
+        if job:
+            return self.render_import_results(request, job)
         categories = Category.objects.all()
-        return render(request, 'products/add_product.html', {'categories': categories})
+        return render(request, 'products/add_product.html', {
+            'categories': categories,
+            'max_upload_size': settings.PRODUCT_IMPORT_MAX_UPLOAD_SIZE,
+        })
 
     def post(self, request):
         if not request.user.is_authenticated:
@@ -137,172 +109,56 @@ class ProductCreateView(View):
             messages.error(request, 'Please select an Excel file to upload.')
             return redirect('add-product')
         
-        # Check file size (5MB limit)
-        if excel_file.size > 5 * 1024 * 1024:
-            messages.error(request, 'File size must be less than 5MB.')
+        # Check file size (configurable, None disables the limit)
+        max_size = settings.PRODUCT_IMPORT_MAX_UPLOAD_SIZE
+        if max_size and excel_file.size > max_size:
+            messages.error(request, f'File size must be less than {max_size // (1024 * 1024)}MB.')
             return redirect('add-product')
         
-        try:
-            # Read Excel file
-            if excel_file.name.endswith('.xlsx'):
-                df = pd.read_excel(excel_file, engine='openpyxl')
-            else:
-                df = pd.read_excel(excel_file, engine='xlrd')
-            
-            # Validate required columns
-            required_columns = ['Name', 'SKU', 'Price']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                messages.error(request, f'Missing required columns: {", ".join(missing_columns)}')
-                return redirect('add-product')
-            
-            # Process each row
-            success_count = 0
-            error_count = 0
-            skipped_count = 0
-            errors = []
-            
-            zip_files = {}
-            if datasheet_zip:
-                try:
-                    with zipfile.ZipFile(datasheet_zip) as zf:
-                        for name in zf.namelist():
-                            zip_files[name] = zf.read(name)
-                except Exception as e:
-                    messages.error(request, f'Error reading datasheet ZIP: {e}')
-                    return redirect('add-product')
-            
-            for index, row in df.iterrows():
-                try:
-                    # Extract data from row
-                    name = str(row['Name']).strip()
-                    sku = str(row['SKU']).strip()
-                    price = float(row['Price'])
-                    
-                    # Skip if required fields are empty
-                    if not name or not sku or pd.isna(price):
-                        error_count += 1
-                        errors.append(f'Row {index + 2}: Missing required fields')
-                        continue
-                    
-                    # Check for duplicate SKU
-                    if Product.objects.filter(sku=sku).exists():
-                        if skip_duplicates:
-                            skipped_count += 1
-                            continue
-                        else:
-                            error_count += 1
-                            errors.append(f'Row {index + 2}: SKU "{sku}" already exists')
-                            continue
-                    
-                    # Get category if provided
-                    category = None
-                    if 'Category' in df.columns and not pd.isna(row['Category']):
-                        category_name = str(row['Category']).strip()
-                        try:
-                            category = Category.objects.get(name__iexact=category_name)
-                        except Category.DoesNotExist:
-                            # Category doesn't exist, continue without category
-                            pass
-                    
-                    datasheet_file = None
-                    if 'Datasheet Filename' in df.columns and not pd.isna(row.get('Datasheet Filename')):
-                        datasheet_name = str(row['Datasheet Filename']).strip()
-                        if datasheet_name and datasheet_name in zip_files:
-                            datasheet_file = ContentFile(zip_files[datasheet_name], name=datasheet_name)
-                    
-                    # Create product
-                    product = Product.objects.create(
-                        name=name,
-                        category=category,
-                        brand=str(row.get('Brand', '')).strip() if 'Brand' in df.columns and not pd.isna(row.get('Brand')) else '',
-                        description=str(row.get('Description', '')).strip() if 'Description' in df.columns and not pd.isna(row.get('Description')) else '',
-                        sku=sku,
-                        serial_number=str(row.get('Serial Number', '')).strip() if 'Serial Number' in df.columns and not pd.isna(row.get('Serial Number')) else '',
-                        price=price,
-                        datasheet=datasheet_file
-                    )
-                    
-                    AuditLog.log(request.user, 'created', product)
-                    success_count += 1
-                    
-                except Exception as e:
-                    error_count += 1
-                    errors.append(f'Row {index + 2}: {str(e)}')
-            
-            # Show results
-            if success_count > 0:
-                messages.success(request, f'Successfully imported {success_count} products!')
-            
-            if skipped_count > 0:
-                messages.warning(request, f'Skipped {skipped_count} duplicate products.')
-            
-            if error_count > 0:
-                error_message = f'Failed to import {error_count} products. '
-                if len(errors) <= 5:
-                    error_message += 'Errors: ' + '; '.join(errors)
-                else:
-                    error_message += f'First 5 errors: {"; ".join(errors[:5])}'
-                messages.error(request, error_message)
-            
-            return redirect('products')
-            
-        except Exception as e:
-            messages.error(request, f'Error processing Excel file: {str(e)}')
-            return redirect('add-product')
+        # Large catalogues are imported by the job worker; the job page polls for completion
+        job = enqueue(
+            'product_import',
+            request.user,
+            params={'skip_duplicates': skip_duplicates, 'return_url': reverse('add-product')},
+            input_file=excel_file,
+            attachment_file=datasheet_zip,
+        )
+        return redirect('job-detail', pk=job.pk)
+
+    def render_import_results(self, request, job):
+        success_count = job.result['created_count']
+        skipped_count = job.result['skipped_count']
+        errors = job.result['errors']
+        
+        # Show results
+        if success_count > 0:
+            messages.success(request, f'Successfully imported {success_count} products!')
+        
+        if skipped_count > 0:
+            messages.warning(request, f'Skipped {skipped_count} duplicate products.')
+        
+        if errors:
+            messages.error(request, f'Failed to import {len(errors)} products. See the error report below.')
+            return render(request, 'products/add_product.html', {
+                'categories': Category.objects.all(),
+                'import_errors': errors,
+                'max_upload_size': settings.PRODUCT_IMPORT_MAX_UPLOAD_SIZE,
+            })
+        
+        return redirect('products')
 
 class DownloadExcelTemplateView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        
-        # Create a new workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Product Template"
-        
-        # Define headers
-        headers = ['Name', 'Category', 'Brand', 'SKU', 'Serial Number', 'Price', 'Description', 'Datasheet Filename']
-        
-        # Add headers with styling
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # Add sample data
-        sample_data = [
+        from .upload_template import CONTENT_TYPE, FILENAME, upload_template_workbook
+        wb = upload_template_workbook([
             ['iPhone 13 Pro', 'Electronics', 'Apple', 'IPH13PRO-128', 'SN123456789', 999.99, 'Latest iPhone model with advanced features', 'iphone_datasheet.pdf'],
             ['Samsung Galaxy S21', 'Electronics', 'Samsung', 'SAMS21-256', 'SN987654321', 899.99, 'Premium Android smartphone', 'samsung_datasheet.pdf'],
             ['MacBook Pro 14"', 'Electronics', 'Apple', 'MBP14-512', 'SN456789123', 1999.99, 'Professional laptop for developers', 'macbook_datasheet.pdf'],
-        ]
-        
-        for row, data in enumerate(sample_data, 2):
-            for col, value in enumerate(data, 1):
-                ws.cell(row=row, column=col, value=value)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="product_upload_template.xlsx"'
-        
-        # Save to response
+        ])
+        response = HttpResponse(content_type=CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{FILENAME}"'
         wb.save(response)
         return response
 
@@ -314,16 +170,10 @@ class ProductListPageView(View):
         # Get search query
         search_query = request.GET.get('search', '')
         
-        # Filter products based on search query
+        # Indexed, ranked search over name, brand, SKU, serials, category and description
+        products = Product.objects.select_related('category')
         if search_query:
-            products = Product.objects.select_related('category').filter(
-                models.Q(name__icontains=search_query) |
-                models.Q(brand__icontains=search_query) |
-                models.Q(sku__icontains=search_query) |
-                models.Q(serial_number__icontains=search_query)
-            )
-        else:
-            products = Product.objects.select_related('category').all()
+            products = search_products(products, search_query)
         
         # Pagination: 50 per page
         paginator = Paginator(products, 50)
@@ -346,27 +196,22 @@ class ProductDetailView(View):
         if not request.user.is_authenticated:
             return redirect('login')
         
-        product = get_object_or_404(Product, pk=pk)
+        product = get_object_or_404(Product.objects.select_related('category'), pk=pk)
         
-        # Calculate current quantity
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        current_quantity = stock_in - stock_out
+        # Current quantity and ledger totals from the materialised balance
+        balance = get_stock_balance(product.id)
+        stock_in = balance.total_in
+        stock_out = balance.total_out
+        current_quantity = balance.on_hand
         
         # Get quantity limit
         try:
-            quantity_limit = QuantityLimit.objects.get(product=product)
+            quantity_limit = QuantityLimit.objects.select_related('created_by').get(product=product)
         except QuantityLimit.DoesNotExist:
             quantity_limit = None
         
         # Get recent stock entries
-        recent_stock_entries = StockEntry.objects.filter(product=product).order_by('-timestamp')[:10]
+        recent_stock_entries = StockEntry.objects.filter(product=product).select_related('created_by').order_by('-timestamp')[:10]
         
         # Get recent alerts
         recent_alerts = Alert.objects.filter(product=product).order_by('-created_at')[:5]
@@ -376,16 +221,24 @@ class ProductDetailView(View):
         average_inventory = ((stock_in + current_quantity) / 2) if (stock_in + current_quantity) > 0 else 1
         stock_turnover = round(stock_out / average_inventory, 2) if average_inventory else 0
         # Shrinkage Rate: total negative adjustments / (stock in + positive adjustments)
-        positive_adj = InventoryAdjustment.objects.filter(product=product, adjustment_type='increase').aggregate(total=Sum('quantity'))['total'] or 0
-        negative_adj = InventoryAdjustment.objects.filter(product=product, adjustment_type='decrease').aggregate(total=Sum('quantity'))['total'] or 0
+        adjustments = InventoryAdjustment.objects.filter(product=product).aggregate(
+            positive=Sum('quantity', filter=Q(quantity__gt=0)),
+            negative=Sum(Value(0) - F('quantity'), filter=Q(quantity__lt=0)),
+        )
+        positive_adj = adjustments['positive'] or 0
+        negative_adj = adjustments['negative'] or 0
+        entry_counts = StockEntry.objects.filter(product=product).aggregate(
+            stock_in=Count('id', filter=Q(entry_type='in')),
+            stock_out=Count('id', filter=Q(entry_type='out')),
+        )
         shrinkage_base = stock_in + positive_adj
         shrinkage_rate = round((negative_adj / shrinkage_base) * 100, 2) if shrinkage_base else 0
         stock_stats = {
             'total_stock_in': stock_in,
             'total_stock_out': stock_out,
             'current_quantity': current_quantity,
-            'stock_in_count': StockEntry.objects.filter(product=product, entry_type='in').count(),
-            'stock_out_count': StockEntry.objects.filter(product=product, entry_type='out').count(),
+            'stock_in_count': entry_counts['stock_in'],
+            'stock_out_count': entry_counts['stock_out'],
             'stock_turnover': stock_turnover,
             'shrinkage_rate': shrinkage_rate,
         }
@@ -489,6 +342,51 @@ class ProductListCreate(ListCreateAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
 
+class ProductSearchAPI(APIView):
+    """Ranked product search: ?q=<text>&limit=<n> (default 20, at most 100)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        product_ids = search_product_ids(request.query_params.get('q', ''), limit)
+        products = Product.objects.select_related('category').in_bulk(product_ids)
+        results = [products[product_id] for product_id in product_ids if product_id in products]
+        return Response(ProductSearchResultSerializer(results, many=True).data)
+
+class ProductAutocompleteAPI(APIView):
+    """
+    Typeahead for product pickers: ?q=<prefix>&limit=<n> (default 10, at most
+    50) matches the start of the name, a word of it, the SKU or the serial
+    number. With ?in_stock=1 only products with stock on hand are returned,
+    together with the quantity.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        prefix = request.query_params.get('q', '')
+        if request.query_params.get('in_stock') != '1':
+            return Response([
+                {'id': product_id, 'name': name, 'sku': sku, 'serial_number': serial_number}
+                for product_id, name, sku, serial_number in autocomplete(prefix, limit)
+            ])
+
+        def on_hand(product_ids):
+            return dict(
+                StockBalance.objects.filter(product_id__in=product_ids, on_hand__gt=0).values_list('product_id', 'on_hand')
+            )
+
+        return Response([
+            {'id': product_id, 'name': name, 'sku': sku, 'serial_number': serial_number, 'available': available}
+            for (product_id, name, sku, serial_number), available in autocomplete_where(prefix, limit, on_hand)
+        ])
+
 class ProductEditView(View):
     def get(self, request, pk):
         if not request.user.is_authenticated:
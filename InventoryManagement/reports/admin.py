@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import DailyInventoryRollup, RollupHighWaterMark
 
 # Register your models here.
+
+@admin.register(DailyInventoryRollup)
+class DailyInventoryRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'category', 'stock_in_quantity', 'stock_out_quantity', 'adjustment_count', 'rental_count')
+    list_filter = ('date', 'category')
+    search_fields = ('product__name', 'product__sku')
+
+
+@admin.register(RollupHighWaterMark)
+class RollupHighWaterMarkAdmin(admin.ModelAdmin):
+    list_display = ('source', 'rolled_up_to', 'updated_at')
@@ -0,0 +1,72 @@
+from io import BytesIO
+from django.db.models import Count
+from django.template.loader import render_to_string
+from products.models import Category
+from inventory.models import Rental
+from .rollup import activity_summary
+from .stock_flow import stock_flow_context
+
+EXPORT_FORMATS = {
+    'excel': ('statistics_report.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('statistics_report.csv', 'text/csv'),
+    'pdf': ('statistics_report.pdf', 'application/pdf'),
+}
+
+
+def statistics_export_data(granularity='month', periods=12):
+    """Gather the same data as StatisticsReportView for the export formats."""
+    activity = activity_summary()
+    return {
+        'category_breakdown': list(Category.objects.annotate(product_count=Count('products')).values('name', 'product_count').order_by('-product_count')),
+        **stock_flow_context(granularity, periods),
+        'rental_status_breakdown': list(Rental.objects.values('status').annotate(count=Count('id'))),
+        'rental_product_breakdown': activity['rental_product_breakdown'],
+        'alert_type_breakdown': activity['alert_type_breakdown'],
+        'alert_product_breakdown': activity['alert_product_breakdown'],
+    }
+
+
+def sanitize_sheetname(name):
+    return name.replace('/', '-').replace('\\', '-').replace('?', '').replace('*', '').replace('[', '').replace(']', '').replace(':', '')
+
+
+def build_statistics_export(format, granularity='month', periods=12):
+    """Render the statistics report as (content, filename, content_type)."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f'Invalid export format: {format}')
+    filename, content_type = EXPORT_FORMATS[format]
+    data = statistics_export_data(granularity, periods)
+
+    if format == 'pdf':
+        # Render a simple HTML and use xhtml2pdf for PDF
+        from xhtml2pdf import pisa
+        html = render_to_string('reports/statistics_export_pdf.html', data)
+        result = BytesIO()
+        pisa.CreatePDF(html, dest=result)
+        return result.getvalue(), filename, content_type
+
+    # pandas is imported on first export, not with the views
+    import pandas as pd
+    dfs = {
+        'Products by Category': pd.DataFrame(data['category_breakdown']),
+        f"Stock In-Out by {data['period_name']}": pd.DataFrame({
+            data['period_name']: data['month_labels'],
+            'Stock In': data['stock_in_by_month'],
+            'Stock Out': data['stock_out_by_month'],
+        }),
+        'Rentals by Status': pd.DataFrame(data['rental_status_breakdown']),
+        'Rentals by Product': pd.DataFrame(data['rental_product_breakdown']),
+        'Alerts by Type': pd.DataFrame(data['alert_type_breakdown']),
+        'Alerts by Product': pd.DataFrame(data['alert_product_breakdown']),
+    }
+    output = BytesIO()
+    if format == 'excel':
+        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+            for sheet, df in dfs.items():
+                df.to_excel(writer, sheet_name=sanitize_sheetname(sheet), index=False)
+    else:
+        # Combine all tables into one CSV with section headers
+        for sheet, df in dfs.items():
+            output.write(f'\n--- {sheet} ---\n'.encode())
+            df.to_csv(output, index=False)
+    return output.getvalue(), filename, content_type
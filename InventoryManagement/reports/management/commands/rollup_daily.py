@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from reports.rollup import rebuild_rollup, rollup_daily
+
+
+class Command(BaseCommand):
+    help = 'Fold new stock entries, adjustments, rentals and alerts into the daily inventory rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Discard the rollup and recompute it from all history')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert/update')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['rebuild']:
+            processed = rebuild_rollup(batch_size=options['batch_size'])
+        else:
+            processed = rollup_daily(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        for source, rows in processed.items():
+            self.stdout.write(f"{source}: {rows} new row(s)")
+        self.stdout.write(self.style.SUCCESS(f"Daily rollup completed in {elapsed:.2f}s"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupHighWaterMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyInventoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('stock_in_count', models.PositiveIntegerField(default=0)),
+                ('stock_in_quantity', models.PositiveBigIntegerField(default=0)),
+                ('stock_out_count', models.PositiveIntegerField(default=0)),
+                ('stock_out_quantity', models.PositiveBigIntegerField(default=0)),
+                ('transfer_count', models.PositiveIntegerField(default=0)),
+                ('transfer_quantity', models.PositiveBigIntegerField(default=0)),
+                ('adjustment_count', models.PositiveIntegerField(default=0)),
+                ('adjustment_increase', models.PositiveBigIntegerField(default=0)),
+                ('adjustment_decrease', models.PositiveBigIntegerField(default=0)),
+                ('rental_count', models.PositiveIntegerField(default=0)),
+                ('rental_quantity', models.PositiveBigIntegerField(default=0)),
+                ('low_stock_alerts', models.PositiveIntegerField(default=0)),
+                ('out_of_stock_alerts', models.PositiveIntegerField(default=0)),
+                ('limit_reached_alerts', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to='products.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Daily Inventory Rollup',
+                'verbose_name_plural': 'Daily Inventory Rollups',
+                'indexes': [models.Index(fields=['date', 'category'], name='rollup_date_category_idx'), models.Index(fields=['product', 'date'], name='rollup_product_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_rollup')],
+            },
+        ),
+    ]
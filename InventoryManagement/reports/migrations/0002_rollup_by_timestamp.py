@@ -0,0 +1,90 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:40
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+METRICS = [
+    'stock_in_count', 'stock_in_quantity', 'stock_out_count', 'stock_out_quantity', 'transfer_count', 'transfer_quantity',
+    'adjustment_count', 'adjustment_increase', 'adjustment_decrease', 'rental_count', 'rental_quantity',
+    'low_stock_alerts', 'out_of_stock_alerts', 'limit_reached_alerts',
+]
+
+
+def populate_rollup(apps, schema_editor):
+    """Roll up all history before the safety lag and mark every source as covered up to it."""
+    DailyInventoryRollup = apps.get_model('reports', 'DailyInventoryRollup')
+    RollupHighWaterMark = apps.get_model('reports', 'RollupHighWaterMark')
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'ROLLUP_SAFETY_LAG', 300))
+    sources = {
+        'stock_entry': (apps.get_model('stock', 'StockEntry'), 'timestamp', {
+            'stock_in_count': Count('id', filter=Q(entry_type='in')),
+            'stock_in_quantity': Sum('quantity', filter=Q(entry_type='in')),
+            'stock_out_count': Count('id', filter=Q(entry_type='out')),
+            'stock_out_quantity': Sum('quantity', filter=Q(entry_type='out')),
+            'transfer_count': Count('id', filter=Q(entry_type='transfer')),
+            'transfer_quantity': Sum('quantity', filter=Q(entry_type='transfer')),
+        }),
+        'inventory_adjustment': (apps.get_model('inventory', 'InventoryAdjustment'), 'timestamp', {
+            'adjustment_count': Count('id'),
+            'adjustment_increase': Sum('quantity', filter=Q(quantity__gt=0)),
+            'adjustment_decrease': Sum(Value(0) - F('quantity'), filter=Q(quantity__lt=0)),
+        }),
+        'rental': (apps.get_model('inventory', 'Rental'), 'created_at', {
+            'rental_count': Count('id'),
+            'rental_quantity': Sum('quantity'),
+        }),
+        'alert': (apps.get_model('inventory', 'Alert'), 'created_at', {
+            'low_stock_alerts': Count('id', filter=Q(alert_type='low_stock')),
+            'out_of_stock_alerts': Count('id', filter=Q(alert_type='out_of_stock')),
+            'limit_reached_alerts': Count('id', filter=Q(alert_type='limit_reached')),
+        }),
+    }
+    buckets = {}
+    for model, timestamp_field, aggregates in sources.values():
+        rows = (
+            model.objects.filter(**{f'{timestamp_field}__lt': cutoff}).order_by()
+            .annotate(date=TruncDate(timestamp_field))
+            .values('date', 'product_id', category_id=F('product__category_id'))
+            .annotate(**aggregates)
+        )
+        for row in rows:
+            bucket = buckets.setdefault((row['date'], row['product_id']), {'category_id': row['category_id']})
+            for column in aggregates:
+                bucket[column] = bucket.get(column, 0) + (row[column] or 0)
+
+    DailyInventoryRollup.objects.all().delete()
+    DailyInventoryRollup.objects.bulk_create([
+        DailyInventoryRollup(
+            date=date, product_id=product_id, category_id=bucket['category_id'],
+            **{column: bucket.get(column, 0) for column in METRICS},
+        )
+        for (date, product_id), bucket in buckets.items()
+    ], batch_size=1000)
+    RollupHighWaterMark.objects.all().delete()
+    RollupHighWaterMark.objects.bulk_create([RollupHighWaterMark(source=source, rolled_up_to=cutoff) for source in sources])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_alert_alert_keyset_idx_and_more'),
+        ('reports', '0001_initial'),
+        ('stock', '0008_stockentry_stock_entry_type_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='rolluphighwatermark',
+            name='last_id',
+        ),
+        migrations.AddField(
+            model_name='rolluphighwatermark',
+            name='rolled_up_to',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,51 @@
 from django.db import models
+from products.models import Product, Category
 
-# Create your models here.
+
+class DailyInventoryRollup(models.Model):
+    """
+    Per-day, per-product totals of stock entries, adjustments, rentals and
+    alerts, filled incrementally by the rollup_daily command and the run_jobs
+    worker. The category is the product's category when the day was rolled up.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups')
+    stock_in_count = models.PositiveIntegerField(default=0)
+    stock_in_quantity = models.PositiveBigIntegerField(default=0)
+    stock_out_count = models.PositiveIntegerField(default=0)
+    stock_out_quantity = models.PositiveBigIntegerField(default=0)
+    transfer_count = models.PositiveIntegerField(default=0)
+    transfer_quantity = models.PositiveBigIntegerField(default=0)
+    adjustment_count = models.PositiveIntegerField(default=0)
+    adjustment_increase = models.PositiveBigIntegerField(default=0)
+    adjustment_decrease = models.PositiveBigIntegerField(default=0)
+    rental_count = models.PositiveIntegerField(default=0)
+    rental_quantity = models.PositiveBigIntegerField(default=0)
+    low_stock_alerts = models.PositiveIntegerField(default=0)
+    out_of_stock_alerts = models.PositiveIntegerField(default=0)
+    limit_reached_alerts = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} - {self.product.name}"
+
+    class Meta:
+        verbose_name = "Daily Inventory Rollup"
+        verbose_name_plural = "Daily Inventory Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category'], name='rollup_date_category_idx'),
+            models.Index(fields=['product', 'date'], name='rollup_product_date_idx'),
+        ]
+
+
+class RollupHighWaterMark(models.Model):
+    """How far DailyInventoryRollup covers a source table: rows timestamped before rolled_up_to."""
+    source = models.CharField(max_length=50, unique=True)
+    rolled_up_to = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.rolled_up_to}"
@@ -0,0 +1,295 @@
+import threading
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from inventory.models import Alert, InventoryAdjustment, Rental
+from products.models import Product
+from stock.models import StockEntry
+from .models import DailyInventoryRollup, RollupHighWaterMark
+
+# Source table -> (model, timestamp field, {rollup column: aggregate})
+SOURCES = {
+    'stock_entry': (StockEntry, 'timestamp', {
+        'stock_in_count': Count('id', filter=Q(entry_type='in')),
+        'stock_in_quantity': Sum('quantity', filter=Q(entry_type='in')),
+        'stock_out_count': Count('id', filter=Q(entry_type='out')),
+        'stock_out_quantity': Sum('quantity', filter=Q(entry_type='out')),
+        'transfer_count': Count('id', filter=Q(entry_type='transfer')),
+        'transfer_quantity': Sum('quantity', filter=Q(entry_type='transfer')),
+    }),
+    'inventory_adjustment': (InventoryAdjustment, 'timestamp', {
+        'adjustment_count': Count('id'),
+        'adjustment_increase': Sum('quantity', filter=Q(quantity__gt=0)),
+        'adjustment_decrease': Sum(Value(0) - F('quantity'), filter=Q(quantity__lt=0)),
+    }),
+    'rental': (Rental, 'created_at', {
+        'rental_count': Count('id'),
+        'rental_quantity': Sum('quantity'),
+    }),
+    'alert': (Alert, 'created_at', {
+        'low_stock_alerts': Count('id', filter=Q(alert_type='low_stock')),
+        'out_of_stock_alerts': Count('id', filter=Q(alert_type='out_of_stock')),
+        'limit_reached_alerts': Count('id', filter=Q(alert_type='limit_reached')),
+    }),
+}
+METRICS = [column for _, _, aggregates in SOURCES.values() for column in aggregates]
+
+_state = threading.local()
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _lag():
+    return timedelta(seconds=getattr(settings, 'ROLLUP_SAFETY_LAG', 300))
+
+
+def high_water_marks():
+    """Return {source: time the rollup covers up to}, None for sources never rolled up."""
+    marks = dict(RollupHighWaterMark.objects.values_list('source', 'rolled_up_to'))
+    return {source: marks.get(source) for source in SOURCES}
+
+
+def _rows_between(source, start=None, end=None, product_ids=None):
+    model, timestamp_field, _ = SOURCES[source]
+    rows = model.objects.all()
+    if start is not None:
+        rows = rows.filter(**{f'{timestamp_field}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{timestamp_field}__lt': end})
+    if product_ids is not None:
+        rows = rows.filter(product_id__in=product_ids)
+    return rows
+
+
+def _daily_totals(source, start=None, end=None, product_ids=None):
+    """Aggregate a source's rows with start <= timestamp < end by (date, product, category)."""
+    _, timestamp_field, aggregates = SOURCES[source]
+    return (
+        _rows_between(source, start, end, product_ids).order_by()
+        .annotate(date=TruncDate(timestamp_field))
+        .values('date', 'product_id', category_id=F('product__category_id'))
+        .annotate(**aggregates)
+    )
+
+
+def pending_totals(columns=METRICS):
+    """
+    Return [(date, product_id, category_id, {column: value})] for source rows
+    newer than the high-water marks, so readers can add the tail that has not
+    been rolled up yet. Only sources feeding `columns` are queried.
+    """
+    marks = high_water_marks()
+    pending = []
+    for source, (_, _, aggregates) in SOURCES.items():
+        if not set(aggregates) & set(columns):
+            continue
+        for row in _daily_totals(source, marks[source]):
+            pending.append((row['date'], row['product_id'], row['category_id'], {column: row[column] or 0 for column in aggregates}))
+    return pending
+
+
+def _bucket_totals(start, end, product_ids=None):
+    """{(date, product_id): {'category_id', column: total}} for every source between start and end."""
+    buckets = {}
+    for source, (_, _, aggregates) in SOURCES.items():
+        for row in _daily_totals(source, start, end, product_ids):
+            bucket = buckets.setdefault((row['date'], row['product_id']), {'category_id': row['category_id']})
+            for column in aggregates:
+                bucket[column] = bucket.get(column, 0) + (row[column] or 0)
+    return buckets
+
+
+def _rollup_rows(buckets):
+    return [
+        DailyInventoryRollup(
+            date=date, product_id=product_id, category_id=bucket['category_id'],
+            **{column: bucket.get(column, 0) for column in METRICS},
+        )
+        for (date, product_id), bucket in buckets.items()
+    ]
+
+
+def rollup_daily(batch_size=1000, now=None):
+    """
+    Bring DailyInventoryRollup up to ROLLUP_SAFETY_LAG seconds before `now`.
+
+    The high-water mark is a time, not a row id: ids are handed out when a
+    row is inserted, so a row can commit after a run with an id below the
+    one it saw. Rows younger than the lag are left to the readers' pending
+    tail, and each run recomputes the last ROLLUP_REAGGREGATE_DAYS days
+    before the previous mark from scratch, so rows that committed late land
+    in their day. Returns {source: rows newly covered}.
+    """
+    cutoff = (now or timezone.now()) - _lag()
+    processed = {}
+    with transaction.atomic():
+        marks = {mark.source: mark for mark in RollupHighWaterMark.objects.select_for_update()}
+        previous = [marks[source].rolled_up_to for source in SOURCES if source in marks]
+        if len(previous) == len(SOURCES) and all(previous):
+            cutoff = max(cutoff, max(previous))
+            window_date = timezone.localtime(min(previous)).date() - timedelta(days=getattr(settings, 'ROLLUP_REAGGREGATE_DAYS', 2))
+            window = _day_start(window_date)
+        else:
+            previous, window = [], None
+        for source in SOURCES:
+            since = marks[source].rolled_up_to if previous else None
+            processed[source] = _rows_between(source, since, cutoff).count()
+
+        stale = DailyInventoryRollup.objects.all()
+        if window is not None:
+            stale = stale.filter(date__gte=window_date)
+        stale.delete()
+        DailyInventoryRollup.objects.bulk_create(_rollup_rows(_bucket_totals(window, cutoff)), batch_size=batch_size)
+
+        for source in SOURCES:
+            mark = marks.get(source) or RollupHighWaterMark(source=source)
+            mark.rolled_up_to = cutoff
+            mark.save()
+    return processed
+
+
+def refresh_buckets(buckets):
+    """
+    Recompute the rolled-up (date, product_id) `buckets` from their source
+    rows, after rows in them were edited or deleted. Days past the
+    high-water mark are left alone: the readers' pending tail covers them.
+    """
+    marks = [mark for mark in high_water_marks().values() if mark]
+    if len(marks) != len(SOURCES):
+        return
+    mark = min(marks)
+    with transaction.atomic():
+        for date, product_id in buckets:
+            start = _day_start(date)
+            if start >= mark:
+                continue
+            end = min(start + timedelta(days=1), mark)
+            DailyInventoryRollup.objects.filter(date=date, product_id=product_id).delete()
+            DailyInventoryRollup.objects.bulk_create(_rollup_rows(_bucket_totals(start, end, [product_id])))
+
+
+def _flush_pending():
+    buckets = getattr(_state, 'pending', set())
+    _state.pending = set()
+    refresh_buckets(buckets)
+
+
+def schedule_bucket_refresh(buckets):
+    """
+    Queue (date, product_id) buckets whose source rows were edited or
+    deleted. Inside a transaction they are refreshed together once it
+    commits; in autocommit mode straight away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        refresh_buckets(buckets)
+        return
+    # A rolled back transaction discards its callback, so only trust the
+    # pending set while our flush is still registered.
+    if not any(entry[1] is _flush_pending for entry in connection.run_on_commit):
+        _state.pending = set()
+        transaction.on_commit(_flush_pending)
+    _state.pending.update(buckets)
+
+
+def rebuild_rollup(batch_size=1000, now=None):
+    """Discard the rollup and its high-water marks, then roll up all history again."""
+    with transaction.atomic():
+        DailyInventoryRollup.objects.all().delete()
+        RollupHighWaterMark.objects.all().delete()
+        return rollup_daily(batch_size=batch_size, now=now)
+
+
+def rollup_totals(columns=METRICS, start=None):
+    """Return {column: total} over the rollup (from `start` if given) plus the pending tail."""
+    facts = DailyInventoryRollup.objects.all()
+    if start is not None:
+        facts = facts.filter(date__gte=start)
+    totals = {column: value or 0 for column, value in facts.aggregate(**{column: Sum(column) for column in columns}).items()}
+    for date, _, _, values in pending_totals(columns):
+        if start is None or date >= start:
+            for column in columns:
+                totals[column] += values.get(column, 0)
+    return totals
+
+
+def rollup_by_period(trunc, start, columns):
+    """Return {period start: {column: total}} for days from `start`, truncated with `trunc`."""
+    periods = {}
+    rows = (
+        DailyInventoryRollup.objects.filter(date__gte=start)
+        .annotate(period=trunc('date'))
+        .values('period')
+        .annotate(**{column: Sum(column) for column in columns})
+    )
+    for row in rows:
+        periods[row['period']] = {column: row[column] or 0 for column in columns}
+    for date, _, _, values in pending_totals(columns):
+        if date < start:
+            continue
+        totals = periods.setdefault(_truncate(trunc, date), {column: 0 for column in columns})
+        for column in columns:
+            totals[column] += values.get(column, 0)
+    return periods
+
+
+def _truncate(trunc, date):
+    """Python equivalent of the Trunc* database functions for a date."""
+    kind = trunc.kind
+    if kind == 'month':
+        return date.replace(day=1)
+    if kind == 'week':
+        return date - timedelta(days=date.weekday())
+    return date
+
+
+def top_products(columns, limit=10):
+    """Return [{'product__name', 'count'}] for the products with the largest sum of `columns`."""
+    total = Sum(columns[0])
+    for column in columns[1:]:
+        total = total + Sum(column)
+    counts = {}
+    names = {}
+    for row in DailyInventoryRollup.objects.values('product_id', 'product__name').annotate(count=total):
+        counts[row['product_id']] = row['count'] or 0
+        names[row['product_id']] = row['product__name']
+    missing = set()
+    for _, product_id, _, values in pending_totals(columns):
+        added = sum(values.get(column, 0) for column in columns)
+        if added:
+            counts[product_id] = counts.get(product_id, 0) + added
+            if product_id not in names:
+                missing.add(product_id)
+    if missing:
+        names.update(Product.objects.filter(id__in=missing).values_list('id', 'name'))
+    ranked = sorted((item for item in counts.items() if item[1]), key=lambda item: -item[1])[:limit]
+    return [{'product__name': names[product_id], 'count': count} for product_id, count in ranked]
+
+
+ALERT_TYPE_COLUMNS = {
+    'low_stock': 'low_stock_alerts',
+    'out_of_stock': 'out_of_stock_alerts',
+    'limit_reached': 'limit_reached_alerts',
+}
+
+
+def activity_summary():
+    """Totals and top-10 breakdowns shared by the statistics page and its exports."""
+    totals = rollup_totals()
+    alert_columns = list(ALERT_TYPE_COLUMNS.values())
+    return {
+        'totals': totals,
+        'total_alerts': sum(totals[column] for column in alert_columns),
+        'rental_product_breakdown': top_products(['rental_count']),
+        'alert_type_breakdown': [
+            {'alert_type': alert_type, 'count': totals[column]}
+            for alert_type, column in ALERT_TYPE_COLUMNS.items()
+            if totals[column]
+        ],
+        'alert_product_breakdown': top_products(alert_columns),
+    }
@@ -0,0 +1,60 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from inventory.models import Alert, InventoryAdjustment, Rental
+from products.models import Product
+from stock.models import StockEntry
+from .rollup import schedule_bucket_refresh
+
+# Source model -> (timestamp field, fields the rollup aggregates)
+TRACKED_FIELDS = {
+    StockEntry: ('timestamp', ('quantity', 'entry_type')),
+    InventoryAdjustment: ('timestamp', ('quantity',)),
+    Rental: ('created_at', ('quantity',)),
+    Alert: ('created_at', ('alert_type',)),
+}
+
+
+def _bucket(timestamp, product_id):
+    return (timezone.localtime(timestamp).date(), product_id)
+
+
+@receiver(pre_save, sender=StockEntry)
+@receiver(pre_save, sender=InventoryAdjustment)
+@receiver(pre_save, sender=Rental)
+@receiver(pre_save, sender=Alert)
+def remember_rolled_up_values(sender, instance, **kwargs):
+    """Keep the stored values an edit replaces, to tell which rollup buckets it touches."""
+    instance._rollup_previous = None
+    if instance._state.adding or instance.pk is None:
+        return
+    timestamp_field, fields = TRACKED_FIELDS[sender]
+    instance._rollup_previous = (
+        sender.objects.filter(pk=instance.pk).values_list(timestamp_field, 'product_id', *fields).first()
+    )
+
+
+@receiver(post_save, sender=StockEntry)
+@receiver(post_save, sender=InventoryAdjustment)
+@receiver(post_save, sender=Rental)
+@receiver(post_save, sender=Alert)
+def refresh_edited_rollup(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    if created or previous is None:
+        return
+    timestamp_field, fields = TRACKED_FIELDS[sender]
+    current = (getattr(instance, timestamp_field), instance.product_id, *(getattr(instance, field) for field in fields))
+    if current != previous:
+        schedule_bucket_refresh({_bucket(*previous[:2]), _bucket(*current[:2])})
+
+
+@receiver(post_delete, sender=StockEntry)
+@receiver(post_delete, sender=InventoryAdjustment)
+@receiver(post_delete, sender=Rental)
+@receiver(post_delete, sender=Alert)
+def refresh_deleted_rollup(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        # The product's rollup rows are deleted with it
+        return
+    timestamp_field, _ = TRACKED_FIELDS[sender]
+    schedule_bucket_refresh({_bucket(getattr(instance, timestamp_field), instance.product_id)})
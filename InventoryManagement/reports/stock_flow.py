@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from .rollup import rollup_by_period
+
+GRANULARITIES = {
+    'day': (TruncDay, 'Day', '%d %b %Y'),
+    'week': (TruncWeek, 'Week', 'Week of %d %b %Y'),
+    'month': (TruncMonth, 'Month', '%b %Y'),
+}
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+MAX_PERIODS = 366
+
+
+def parse_window(params):
+    """
+    Read ?granularity= and ?periods= from a GET-style mapping, falling back to
+    the defaults for anything missing or invalid. Returns (granularity, periods).
+    """
+    granularity = params.get('granularity')
+    if granularity not in GRANULARITIES:
+        granularity = 'month'
+    try:
+        periods = int(params.get('periods'))
+    except (TypeError, ValueError):
+        periods = DEFAULT_PERIODS[granularity]
+    return granularity, min(max(periods, 1), MAX_PERIODS)
+
+
+def period_starts(granularity='month', periods=12, today=None):
+    """Return the first day of each of the last `periods` calendar periods, oldest first."""
+    today = today or timezone.localdate()
+    if granularity == 'day':
+        return [today - timedelta(days=i) for i in range(periods - 1, -1, -1)]
+    if granularity == 'week':
+        monday = today - timedelta(days=today.weekday())
+        return [monday - timedelta(weeks=i) for i in range(periods - 1, -1, -1)]
+    # Step back whole calendar months so none are skipped or repeated
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(periods):
+        starts.append(today.replace(year=year, month=month, day=1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return starts[::-1]
+
+
+def stock_flow(granularity='month', periods=12, today=None):
+    """
+    Return stock in/out per calendar period for the last `periods` periods as
+    [{'period': date, 'label': str, 'stock_in': int, 'stock_out': int}],
+    oldest first, with empty periods filled with zeros. Reads the daily
+    rollup plus the entries not rolled up yet.
+    """
+    trunc, _, label_format = GRANULARITIES[granularity]
+    starts = period_starts(granularity, periods, today)
+    totals = rollup_by_period(trunc, starts[0], ['stock_in_quantity', 'stock_out_quantity'])
+    return [
+        {
+            'period': start,
+            'label': start.strftime(label_format),
+            'stock_in': totals.get(start, {}).get('stock_in_quantity', 0),
+            'stock_out': totals.get(start, {}).get('stock_out_quantity', 0),
+        }
+        for start in starts
+    ]
+
+
+def stock_flow_context(granularity='month', periods=12):
+    """Template/export context for the stock in/out chart and table."""
+    flow = stock_flow(granularity, periods)
+    return {
+        'granularity': granularity,
+        'periods': periods,
+        'period_name': GRANULARITIES[granularity][1],
+        'month_labels': [row['label'] for row in flow],
+        'stock_in_by_month': [row['stock_in'] for row in flow],
+        'stock_out_by_month': [row['stock_out'] for row in flow],
+    }
+
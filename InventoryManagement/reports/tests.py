@@ -1,3 +1,200 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from pathlib import Path
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from .models import DailyInventoryRollup, RollupHighWaterMark
+from .rollup import activity_summary, high_water_marks, rollup_daily, rollup_totals
+from .stock_flow import parse_window, period_starts, stock_flow
+from stock.models import StockEntry
+from inventory.models import Alert, InventoryAdjustment, Rental
+from products.models import Product, Category
+from InventoryManagement.databases import ReplicaRouter, database_config, replica_reads
+from jobs.runner import work
 
-# Create your tests here.
+User = get_user_model()
+
+
+class StockFlowTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        # Never rolled up, so the back-dated entries below are all in the tail
+        RollupHighWaterMark.objects.all().delete()
+
+    def entry(self, quantity, entry_type, when):
+        entry = StockEntry.objects.create(product=self.product, quantity=quantity, entry_type=entry_type, created_by=self.user)
+        StockEntry.objects.filter(pk=entry.pk).update(timestamp=when)
+
+    def test_month_steps_cover_each_calendar_month_once(self):
+        starts = period_starts('month', 12, today=date(2026, 3, 31))
+        self.assertEqual(starts[0], date(2025, 4, 1))
+        self.assertEqual(starts[-1], date(2026, 3, 1))
+        self.assertEqual(len({(d.year, d.month) for d in starts}), 12)
+        self.assertEqual(period_starts('week', 2, today=date(2026, 3, 5)), [date(2026, 2, 23), date(2026, 3, 2)])
+
+    def test_flow_is_grouped_over_rollup_and_tail(self):
+        self.entry(10, 'in', datetime(2026, 1, 31, 23, tzinfo=dt_timezone.utc))
+        self.entry(4, 'out', datetime(2026, 2, 1, 1, tzinfo=dt_timezone.utc))
+        self.entry(6, 'in', datetime(2026, 3, 15, tzinfo=dt_timezone.utc))
+        self.entry(99, 'in', datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        expected = [('Jan 2026', 10, 0), ('Feb 2026', 0, 4), ('Mar 2026', 6, 0)]
+        # High-water marks, grouped rollup rows and the grouped ledger tail
+        with self.assertNumQueries(3):
+            flow = stock_flow('month', 3, today=date(2026, 3, 20))
+        self.assertEqual([(row['label'], row['stock_in'], row['stock_out']) for row in flow], expected)
+        call_command('rollup_daily', stdout=StringIO())
+        flow = stock_flow('month', 3, today=date(2026, 3, 20))
+        self.assertEqual([(row['label'], row['stock_in'], row['stock_out']) for row in flow], expected)
+        daily = stock_flow('day', 2, today=date(2026, 2, 1))
+        self.assertEqual([(row['stock_in'], row['stock_out']) for row in daily], [(10, 0), (0, 4)])
+
+    def test_window_parameters(self):
+        self.assertEqual(parse_window({}), ('month', 12))
+        self.assertEqual(parse_window({'granularity': 'day'}), ('day', 30))
+        self.assertEqual(parse_window({'granularity': 'week', 'periods': '5000'}), ('week', 366))
+        self.assertEqual(parse_window({'granularity': 'year', 'periods': 'x'}), ('month', 12))
+        response = self.client.get(reverse('statistics-report'), {'granularity': 'week', 'periods': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['month_labels']), 4)
+        self.assertEqual(response.context['period_name'], 'Week')
+
+
+@override_settings(ROLLUP_SAFETY_LAG=0)
+class DailyRollupTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.category = Category.objects.create(name='Tools')
+        self.product = Product.objects.create(name='Test Product', sku='TP001', category=self.category)
+
+    def test_rollup_is_incremental(self):
+        StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', created_by=self.user)
+        InventoryAdjustment.objects.create(product=self.product, adjustment_type='manual', quantity=-2, created_by=self.user)
+        self.assertEqual(rollup_daily(), {'stock_entry': 1, 'inventory_adjustment': 1, 'rental': 0, 'alert': 0})
+        row = DailyInventoryRollup.objects.get()
+        self.assertEqual((row.category, row.stock_in_quantity, row.adjustment_decrease), (self.category, 10, 2))
+
+        StockEntry.objects.create(product=self.product, quantity=3, entry_type='out', created_by=self.user)
+        Rental.objects.create(product=self.product, quantity=1, rented_to='Site A', rental_date=date.today(), rental_time='09:00')
+        self.assertEqual(rollup_daily(), {'stock_entry': 1, 'inventory_adjustment': 0, 'rental': 1, 'alert': 0})
+        row = DailyInventoryRollup.objects.get()
+        self.assertEqual((row.stock_in_quantity, row.stock_out_quantity, row.rental_count), (10, 3, 1))
+        self.assertEqual(rollup_daily(), {'stock_entry': 0, 'inventory_adjustment': 0, 'rental': 0, 'alert': 0})
+
+    def test_readers_include_rows_newer_than_the_rollup(self):
+        StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', created_by=self.user)
+        call_command('rollup_daily', stdout=StringIO())
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', created_by=self.user)
+        Alert.objects.create(product=self.product, alert_type='low_stock', message='Low', current_quantity=1)
+        self.assertEqual(rollup_totals(['stock_in_quantity'])['stock_in_quantity'], 15)
+        summary = activity_summary()
+        self.assertIn({'alert_type': 'low_stock', 'count': 1}, summary['alert_type_breakdown'])
+        self.assertEqual(summary['alert_product_breakdown'], [{'product__name': 'Test Product', 'count': 1}])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        StockEntry.objects.create(product=self.product, quantity=4, entry_type='in', created_by=self.user)
+        call_command('rollup_daily', stdout=StringIO())
+        StockEntry.objects.create(product=self.product, quantity=1, entry_type='out', created_by=self.user)
+        call_command('rollup_daily', stdout=StringIO())
+        incremental = list(DailyInventoryRollup.objects.values('date', 'product', 'stock_in_quantity', 'stock_out_quantity'))
+        call_command('rollup_daily', rebuild=True, stdout=StringIO())
+        self.assertEqual(list(DailyInventoryRollup.objects.values('date', 'product', 'stock_in_quantity', 'stock_out_quantity')), incremental)
+
+    @override_settings(ROLLUP_SAFETY_LAG=300)
+    def test_rows_inside_the_safety_lag_are_left_to_the_readers(self):
+        StockEntry.objects.create(product=self.product, quantity=7, entry_type='in', created_by=self.user)
+        self.assertEqual(rollup_daily()['stock_entry'], 0)
+        self.assertFalse(DailyInventoryRollup.objects.exists())
+        self.assertEqual(rollup_totals(['stock_in_quantity'])['stock_in_quantity'], 7)
+
+    def test_rows_committed_behind_the_mark_are_counted_on_the_next_run(self):
+        rollup_daily()
+        mark = high_water_marks()['stock_entry']
+        entry = StockEntry.objects.create(product=self.product, quantity=6, entry_type='in', created_by=self.user)
+        # As if its transaction had only committed after the run
+        StockEntry.objects.filter(pk=entry.pk).update(timestamp=mark - timedelta(seconds=1))
+        rollup_daily()
+        self.assertEqual(DailyInventoryRollup.objects.get().stock_in_quantity, 6)
+        self.assertEqual(rollup_totals(['stock_in_quantity'])['stock_in_quantity'], 6)
+
+    def test_edits_refresh_the_old_and_new_buckets(self):
+        entry = StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', created_by=self.user)
+        other = Product.objects.create(name='Other Product', sku='TP002')
+        rollup_daily()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.product = other
+            entry.quantity = 4
+            entry.save()
+        self.assertEqual(
+            list(DailyInventoryRollup.objects.values_list('product', 'stock_in_quantity')), [(other.pk, 4)]
+        )
+
+    def test_deletes_refresh_their_buckets(self):
+        entry = StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', created_by=self.user)
+        rollup_daily()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            StockEntry.objects.filter(pk=entry.pk).delete()
+        self.assertFalse(DailyInventoryRollup.objects.exists())
+        self.assertEqual(rollup_totals(['stock_in_quantity'])['stock_in_quantity'], 0)
+
+    def test_worker_keeps_the_rollup_current(self):
+        StockEntry.objects.create(product=self.product, quantity=2, entry_type='in', created_by=self.user)
+        with mock.patch('jobs.runner._last_rollup', None):
+            work(once=True)
+        self.assertEqual(DailyInventoryRollup.objects.get().stock_in_quantity, 2)
+
+
+class DatabaseRoutingTest(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        config = database_config({}, Path('/srv/app'))
+        self.assertEqual(config, {'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path('/srv/app/db.sqlite3'),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        }})
+
+    def test_postgresql_profile(self):
+        config = database_config({
+            'DATABASE_ENGINE': 'postgresql', 'DATABASE_HOST': 'db', 'DATABASE_USER': 'app', 'DATABASE_CONN_MAX_AGE': '300',
+        }, Path('.'))
+        default = config['default']
+        self.assertEqual(default['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((default['HOST'], default['USER'], default['CONN_MAX_AGE']), ('db', 'app', 300))
+        self.assertTrue(default['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('replica', config)
+
+    def test_pool_replaces_persistent_connections(self):
+        config = database_config({'DATABASE_ENGINE': 'postgresql', 'DATABASE_POOL': '1', 'DATABASE_POOL_MAX_SIZE': '20'}, Path('.'))
+        self.assertEqual(config['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['default']['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20})
+
+    def test_replica_defaults_to_primary_credentials(self):
+        config = database_config({
+            'DATABASE_ENGINE': 'postgresql', 'DATABASE_USER': 'app', 'DATABASE_REPLICA_HOST': 'db-ro',
+        }, Path('.'))
+        self.assertEqual((config['replica']['HOST'], config['replica']['USER']), ('db-ro', 'app'))
+        self.assertEqual(config['replica']['TEST'], {'MIRROR': 'default'})
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config({'DATABASE_ENGINE': 'oracle'}, Path('.'))
+
+    def test_router_sends_marked_reads_to_configured_replica(self):
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertIsNone(router.db_for_read(Product))
+        with mock.patch.dict(settings.DATABASES, replica=settings.DATABASES['default']):
+            self.assertIsNone(router.db_for_read(Product))
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Product), 'replica')
+                self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertFalse(router.allow_migrate('replica', 'products'))
@@ -0,0 +1,76 @@
+/*
+ * Product picker backed by /products/api/autocomplete/.
+ *
+ * productTypeahead({input, list, hidden, url, params, minLength, onSelect})
+ * fetches matches as the user types (debounced, cancelling stale requests),
+ * renders them into `list` and stores the chosen id in `hidden`.
+ */
+function productTypeahead(options) {
+    const input = options.input;
+    const list = options.list;
+    const hidden = options.hidden;
+    const minLength = options.minLength || 1;
+    let timer = null;
+    let controller = null;
+
+    function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text == null ? '' : String(text);
+        return div.innerHTML;
+    }
+
+    function clear() {
+        list.innerHTML = '';
+        list.style.display = 'none';
+    }
+
+    function render(products) {
+        list.innerHTML = '';
+        products.forEach(function(p) {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action';
+            item.style.background = 'rgba(255, 255, 255, 0.3)';
+            item.style.border = '1px solid rgba(255, 255, 255, 0.4)';
+            item.style.color = 'var(--text-primary)';
+            item.style.backdropFilter = 'blur(16px)';
+            item.style.webkitBackdropFilter = 'blur(16px)';
+            item.innerHTML = '<strong>' + escapeHtml(p.name) + '</strong>' +
+                (p.sku ? ' <small>(' + escapeHtml(p.sku) + ')</small>' : '') +
+                (p.serial_number ? '<br><small>SN: ' + escapeHtml(p.serial_number) + '</small>' : '') +
+                (p.available !== undefined ? '<br><small>Available: ' + escapeHtml(p.available) + '</small>' : '');
+            item.onclick = function() {
+                input.value = p.name;
+                hidden.value = p.id;
+                clear();
+                if (options.onSelect) options.onSelect(p);
+            };
+            list.appendChild(item);
+        });
+        list.style.display = products.length ? 'block' : 'none';
+    }
+
+    input.addEventListener('input', function() {
+        hidden.value = '';
+        if (options.onSelect) options.onSelect(null);
+        const query = input.value.trim();
+        clearTimeout(timer);
+        if (query.length < minLength) {
+            clear();
+            return;
+        }
+        timer = setTimeout(function() {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            const params = new URLSearchParams(Object.assign({q: query, limit: 15}, options.params || {}));
+            fetch(options.url + '?' + params.toString(), {signal: controller.signal, credentials: 'same-origin'})
+                .then(function(response) { return response.ok ? response.json() : []; })
+                .then(render)
+                .catch(function(error) { if (error.name !== 'AbortError') clear(); });
+        }, 150);
+    });
+
+    document.addEventListener('click', function(e) {
+        if (!input.contains(e.target) && !list.contains(e.target)) clear();
+    });
+}
@@ -1,5 +1,33 @@
 from django.contrib import admin
-from .models import StockEntry
+from .models import StockEntry, StockBalance, Location, LocationBalance, StockSnapshot
 
 # Register your models here.
 admin.site.register(StockEntry)
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'on_hand', 'total_in', 'total_out', 'last_entry_id', 'updated_at')
+    search_fields = ('product__name', 'product__sku')
+    readonly_fields = ('product', 'on_hand', 'total_in', 'total_out', 'last_entry_id', 'updated_at')
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'created_at')
+    search_fields = ('name', 'code')
+
+
+@admin.register(LocationBalance)
+class LocationBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'location', 'quantity', 'updated_at')
+    list_filter = ('location',)
+    search_fields = ('product__name', 'product__sku', 'location__name')
+    readonly_fields = ('product', 'location', 'quantity', 'updated_at')
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('product', 'taken_at', 'on_hand', 'total_in', 'total_out', 'last_entry_id')
+    list_filter = ('taken_at',)
+    search_fields = ('product__name', 'product__sku')
+    readonly_fields = ('product', 'taken_at', 'on_hand', 'total_in', 'total_out', 'last_entry_id')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StockConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock'
+
+    def ready(self):
+        # Registered before inventory.signals (INSTALLED_APPS order), so alert
+        # checks always see the updated balance.
+        import stock.signals
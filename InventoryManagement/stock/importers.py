@@ -0,0 +1,96 @@
+from django.db import transaction
+from openpyxl import load_workbook
+from InventoryManagement.databases import retry_on_locked
+from audit.models import AuditLog
+from dashboard.kpis import schedule_kpi_invalidation
+from inventory.alerts import schedule_alert_evaluation
+from products.models import Product
+from .models import StockEntry
+from .services import apply_stock_entries, get_available_quantities
+
+
+def _read_sheet(excel_file):
+    """Stream (product name, quantity) pairs from the active sheet in read-only mode."""
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        missing = [column for column in ('Product Name', 'Quantity') if column not in header]
+        if missing:
+            raise ValueError(f'Missing required columns: {", ".join(missing)}')
+        name_idx = header.index('Product Name')
+        qty_idx = header.index('Quantity')
+        for row in rows:
+            if not row or all(value is None for value in row):
+                continue
+            yield str(row[name_idx]).strip(), row[qty_idx]
+    finally:
+        wb.close()
+
+
+def ingest_stock_sheet(excel_file, entry_type, user, chunk_size=1000):
+    """
+    Validate and insert every row of a bulk stock in/out workbook in one
+    transaction. Stock-out rows are checked against a single locked balance map
+    that is drawn down in memory as rows consume stock.
+
+    Returns (results, success_count, fail_count), where results holds one dict
+    per row for the bulk results table.
+    """
+    products = {name.lower(): (product_id, name) for product_id, name in Product.objects.values_list('id', 'name')}
+    rows = list(_read_sheet(excel_file))
+    return _ingest_rows(rows, products, entry_type, user, chunk_size)
+
+
+@retry_on_locked
+def _ingest_rows(rows, products, entry_type, user, chunk_size):
+    action = 'in' if entry_type == 'in' else 'out'
+    results = []
+    entries = []
+
+    with transaction.atomic():
+        available = {}
+        if entry_type == 'out':
+            referenced = {products[name.lower()][0] for name, _ in rows if name.lower() in products}
+            available = get_available_quantities(referenced, for_update=True)
+
+        for product_name, qty in rows:
+            product = products.get(product_name.lower())
+            if not product or not isinstance(qty, (int, float)) or qty <= 0:
+                results.append({
+                    'product_name': product_name,
+                    'quantity': qty,
+                    'status': 'failed',
+                    'message': 'Invalid product or quantity',
+                })
+                continue
+            product_id, name = product
+            qty = int(qty)
+            if entry_type == 'out':
+                available_quantity = available.get(product_id, 0)
+                if qty > available_quantity:
+                    results.append({
+                        'product_name': name,
+                        'quantity': qty,
+                        'status': 'failed',
+                        'message': f'Cannot remove {qty} units. Only {available_quantity} available.',
+                    })
+                    continue
+                available[product_id] = available_quantity - qty
+            entries.append(StockEntry(product_id=product_id, quantity=qty, entry_type=entry_type, created_by=user))
+            results.append({
+                'product_name': name,
+                'quantity': qty,
+                'status': 'success',
+                'message': f'Stock {action} successful',
+            })
+
+        StockEntry.objects.bulk_create(entries, batch_size=chunk_size)
+        apply_stock_entries(entries, batch_size=chunk_size)
+        AuditLog.log_many(user, f'stock {action}', entries, batch_size=chunk_size)
+        # bulk_create skips post_save, so queue the alert check and KPI refresh explicitly
+        schedule_alert_evaluation({entry.product_id for entry in entries})
+        schedule_kpi_invalidation()
+
+    success_count = len(entries)
+    return results, success_count, len(results) - success_count
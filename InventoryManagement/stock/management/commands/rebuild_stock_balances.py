@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from stock.services import rebuild_stock_balances
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-product and per-location stock balances from the StockEntry ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product-ids', nargs='+', type=int, help='Only rebuild these products')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding stock balances from the ledger...")
+        count = rebuild_stock_balances(
+            product_ids=options['product_ids'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Stock balances rebuilt for {count} products.'))
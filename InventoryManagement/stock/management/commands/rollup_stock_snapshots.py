@@ -0,0 +1,32 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from stock.models import StockSnapshot
+from stock.snapshots import rollup_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Roll the StockEntry ledger up into daily per-product snapshots (run once a day)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Last day to roll up, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--rebuild', action='store_true', help='Discard existing snapshots and roll up the whole ledger')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError('--until must be a date in YYYY-MM-DD format')
+        if options['rebuild']:
+            deleted, _ = StockSnapshot.objects.all().delete()
+            self.stdout.write(f"Discarded {deleted} existing snapshots.")
+
+        started = time.perf_counter()
+        days, written = rollup_snapshots(until=until, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {days} day(s), wrote {written} snapshots in {elapsed:.2f}s"
+        ))
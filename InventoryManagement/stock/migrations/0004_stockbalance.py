@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Q, Sum
+
+
+def populate_balances(apps, schema_editor):
+    StockEntry = apps.get_model('stock', 'StockEntry')
+    StockBalance = apps.get_model('stock', 'StockBalance')
+    totals = (
+        StockEntry.objects.order_by()
+        .values('product_id')
+        .annotate(
+            total_in=Sum('quantity', filter=Q(entry_type='in')),
+            total_out=Sum('quantity', filter=Q(entry_type='out')),
+            last_entry_id=Max('id'),
+        )
+    )
+    StockBalance.objects.bulk_create([
+        StockBalance(
+            product_id=row['product_id'],
+            on_hand=(row['total_in'] or 0) - (row['total_out'] or 0),
+            total_in=row['total_in'] or 0,
+            total_out=row['total_out'] or 0,
+            last_entry_id=row['last_entry_id'],
+        )
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        ('stock', '0003_stockentry_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_hand', models.BigIntegerField(default=0)),
+                ('total_in', models.PositiveBigIntegerField(default=0)),
+                ('total_out', models.PositiveBigIntegerField(default=0)),
+                ('last_entry_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Balance',
+                'verbose_name_plural': 'Stock Balances',
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_location_balances(apps, schema_editor):
+    StockEntry = apps.get_model('stock', 'StockEntry')
+    Location = apps.get_model('stock', 'Location')
+    LocationBalance = apps.get_model('stock', 'LocationBalance')
+    entries = StockEntry.objects.order_by()
+    directions = (
+        (entries.filter(entry_type__in=['in', 'transfer']).values_list('product_id', 'location_to'), 1),
+        (entries.filter(entry_type__in=['out', 'transfer']).values_list('product_id', 'location_from'), -1),
+    )
+    totals = {}
+    names = {}
+    for rows, sign in directions:
+        for product_id, name, total in rows.annotate(total=Sum('quantity')):
+            name = ' '.join((name or '').split())
+            if not name:
+                continue
+            code = name.upper()
+            names.setdefault(code, name)
+            totals[(product_id, code)] = totals.get((product_id, code), 0) + sign * total
+    Location.objects.bulk_create([Location(name=name, code=code) for code, name in names.items()], batch_size=1000)
+    locations = dict(Location.objects.values_list('code', 'id'))
+    LocationBalance.objects.bulk_create([
+        LocationBalance(product_id=product_id, location_id=locations[code], quantity=quantity)
+        for (product_id, code), quantity in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        ('stock', '0004_stockbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocationBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='stock.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_balances', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Location Balance',
+                'verbose_name_plural': 'Location Balances',
+                'indexes': [models.Index(fields=['location', 'product'], name='stock_locbal_location_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'location'), name='unique_product_location_balance')],
+            },
+        ),
+        migrations.RunPython(populate_location_balances, migrations.RunPython.noop),
+    ]
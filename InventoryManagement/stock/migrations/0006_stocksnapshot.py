@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        ('stock', '0005_location_locationbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('on_hand', models.BigIntegerField(default=0)),
+                ('total_in', models.PositiveBigIntegerField(default=0)),
+                ('total_out', models.PositiveBigIntegerField(default=0)),
+                ('last_entry_id', models.BigIntegerField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Snapshot',
+                'verbose_name_plural': 'Stock Snapshots',
+                'indexes': [models.Index(fields=['taken_at'], name='stock_snapshot_taken_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='unique_product_snapshot')],
+            },
+        ),
+    ]
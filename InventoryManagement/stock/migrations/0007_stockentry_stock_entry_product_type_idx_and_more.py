@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rack_number_product_shelf_number'),
+        ('stock', '0006_stocksnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockentry',
+            index=models.Index(fields=['product', 'entry_type', '-timestamp'], name='stock_entry_product_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockentry',
+            index=models.Index(fields=['entry_type', '-timestamp', 'quantity'], name='stock_entry_type_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockentry',
+            index=models.Index(fields=['timestamp'], name='stock_entry_timestamp_idx'),
+        ),
+    ]
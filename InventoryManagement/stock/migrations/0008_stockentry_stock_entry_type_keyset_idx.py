@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_search'),
+        ('stock', '0007_stockentry_stock_entry_product_type_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockentry',
+            index=models.Index(fields=['entry_type', '-timestamp', '-id'], name='stock_entry_type_keyset_idx'),
+        ),
+    ]
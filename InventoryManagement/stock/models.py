@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from products.models import Product
+from InventoryManagement.databases import retry_on_locked
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -22,3 +23,117 @@ class StockEntry(models.Model):
 
     def __str__(self):
         return f"{self.get_entry_type_display()} - {self.product.name} ({self.quantity})"
+
+    def save(self, *args, **kwargs):
+        # The StockBalance update runs in a post_save receiver, so wrap the
+        # insert in a transaction to keep ledger and balance in step. When
+        # SQLite is locked the whole transaction is retried, as an insert again.
+        adding, pk = self._state.adding, self.pk
+
+        def attempt():
+            self._state.adding, self.pk = adding, pk
+            with transaction.atomic():
+                super(StockEntry, self).save(*args, **kwargs)
+
+        retry_on_locked(attempt)()
+
+    class Meta:
+        indexes = [
+            # Per-product history and in/out counts on the product page
+            models.Index(fields=['product', 'entry_type', '-timestamp'], name='stock_entry_product_type_idx'),
+            # In/out totals; quantity makes them index-only
+            models.Index(fields=['entry_type', '-timestamp', 'quantity'], name='stock_entry_type_ts_idx'),
+            # Keyset pages of the stock in/out pages and APIs
+            models.Index(fields=['entry_type', '-timestamp', '-id'], name='stock_entry_type_keyset_idx'),
+            # Date-range scans (snapshot rollups, monthly statistics)
+            models.Index(fields=['timestamp'], name='stock_entry_timestamp_idx'),
+        ]
+
+class StockBalance(models.Model):
+    """Materialised running totals of the StockEntry ledger, one row per product."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock_balance')
+    on_hand = models.BigIntegerField(default=0)
+    total_in = models.PositiveBigIntegerField(default=0)
+    total_out = models.PositiveBigIntegerField(default=0)
+    last_entry_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.name} - On hand: {self.on_hand}"
+
+    class Meta:
+        verbose_name = "Stock Balance"
+        verbose_name_plural = "Stock Balances"
+
+
+def normalise_location_name(name):
+    """Collapse whitespace in a free-text location; blank names become None."""
+    name = ' '.join((name or '').split())
+    return name or None
+
+
+class Location(models.Model):
+    """A storage location (rack, shelf, room) named in StockEntry.location_from/location_to."""
+    name = models.CharField(max_length=100)
+    # Case-insensitive lookup key so "Rack A1" and "rack a1 " are the same place
+    code = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def code_for(name):
+        name = normalise_location_name(name)
+        return name.upper() if name else None
+
+    class Meta:
+        ordering = ['name']
+
+
+class LocationBalance(models.Model):
+    """Quantity of a product held at one location, maintained from the ledger."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='location_balances')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='balances')
+    quantity = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.location.name}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Location Balance"
+        verbose_name_plural = "Location Balances"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='unique_product_location_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'product'], name='stock_locbal_location_idx'),
+        ]
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's ledger totals as of taken_at (exclusive). Written by the daily
+    rollup only for products that moved that day, so a product's latest
+    snapshot plus the entries since the last rollup gives any balance.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    on_hand = models.BigIntegerField(default=0)
+    total_in = models.PositiveBigIntegerField(default=0)
+    total_out = models.PositiveBigIntegerField(default=0)
+    last_entry_id = models.BigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.on_hand}"
+
+    class Meta:
+        verbose_name = "Stock Snapshot"
+        verbose_name_plural = "Stock Snapshots"
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='unique_product_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['taken_at'], name='stock_snapshot_taken_at_idx'),
+        ]
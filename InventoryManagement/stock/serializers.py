@@ -1,8 +1,19 @@
 from rest_framework import serializers
-from .models import StockEntry
+from .models import StockEntry, LocationBalance
 
 class StockEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = StockEntry
         fields = '__all__'
         read_only_fields = ['timestamp', 'created_by']
+
+
+class LocationBalanceSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+    location_name = serializers.CharField(source='location.name', read_only=True)
+
+    class Meta:
+        model = LocationBalance
+        fields = ['product', 'product_name', 'product_sku', 'location', 'location_name', 'quantity', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,275 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+from .models import Location, LocationBalance, StockBalance, StockEntry, normalise_location_name
+
+
+def _entry_deltas(entry):
+    """Return the (in, out) quantities a ledger entry contributes to its balance."""
+    if entry.entry_type == 'in':
+        return entry.quantity, 0
+    if entry.entry_type == 'out':
+        return 0, entry.quantity
+    # Transfers move stock between locations without changing the product total
+    return 0, 0
+
+
+def _location_deltas(entry):
+    """
+    Return [(location name, delta)] for the locations an entry touches: stock
+    in lands at location_to, stock out leaves location_from and a transfer
+    does both. Entries without a location only affect the product total.
+    """
+    deltas = []
+    if entry.entry_type in ('out', 'transfer'):
+        deltas.append((normalise_location_name(entry.location_from), -entry.quantity))
+    if entry.entry_type in ('in', 'transfer'):
+        deltas.append((normalise_location_name(entry.location_to), entry.quantity))
+    return [(name, delta) for name, delta in deltas if name]
+
+
+def resolve_locations(names):
+    """Return a {code: Location} map for the given names, creating missing locations."""
+    names_by_code = {Location.code_for(name): normalise_location_name(name) for name in names if normalise_location_name(name)}
+    if not names_by_code:
+        return {}
+    locations = {location.code: location for location in Location.objects.filter(code__in=list(names_by_code))}
+    missing = [Location(name=name, code=code) for code, name in names_by_code.items() if code not in locations]
+    if missing:
+        Location.objects.bulk_create(missing, ignore_conflicts=True)
+        locations = {location.code: location for location in Location.objects.filter(code__in=list(names_by_code))}
+    return locations
+
+
+def get_available_quantity(product_id):
+    """Return the current on-hand quantity for a product (0 if it has no stock history)."""
+    on_hand = StockBalance.objects.filter(product_id=product_id).values_list('on_hand', flat=True).first()
+    return on_hand or 0
+
+
+def get_stock_balance(product_id):
+    """Return the product's StockBalance, or an unsaved zero balance if it has none."""
+    return StockBalance.objects.filter(product_id=product_id).first() or StockBalance(product_id=product_id)
+
+
+def get_available_quantities(product_ids=None, for_update=False):
+    """
+    Return a {product_id: on_hand} map in one query; missing products have no
+    stock. With for_update the balance rows stay locked until the surrounding
+    transaction ends.
+    """
+    balances = StockBalance.objects.all()
+    if for_update:
+        balances = balances.select_for_update()
+    if product_ids is not None:
+        balances = balances.filter(product_id__in=list(product_ids))
+    return dict(balances.values_list('product_id', 'on_hand'))
+
+
+def record_stock_entry(entry):
+    """Apply a newly inserted StockEntry to its product's balance row."""
+    quantity_in, quantity_out = _entry_deltas(entry)
+    updated = StockBalance.objects.filter(product_id=entry.product_id).update(
+        on_hand=F('on_hand') + quantity_in - quantity_out,
+        total_in=F('total_in') + quantity_in,
+        total_out=F('total_out') + quantity_out,
+        last_entry_id=entry.pk,
+        updated_at=timezone.now(),
+    )
+    _apply_location_deltas([entry])
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            StockBalance.objects.create(
+                product_id=entry.product_id,
+                on_hand=quantity_in - quantity_out,
+                total_in=quantity_in,
+                total_out=quantity_out,
+                last_entry_id=entry.pk,
+            )
+    except IntegrityError:
+        # Another writer created the row first; retry the product total only
+        StockBalance.objects.filter(product_id=entry.product_id).update(
+            on_hand=F('on_hand') + quantity_in - quantity_out,
+            total_in=F('total_in') + quantity_in,
+            total_out=F('total_out') + quantity_out,
+            last_entry_id=entry.pk,
+            updated_at=timezone.now(),
+        )
+
+
+def _apply_location_deltas(entries, batch_size=1000):
+    """Add the entries' location movements to LocationBalance with one locked read."""
+    deltas = {}
+    names = []
+    for entry in entries:
+        for name, delta in _location_deltas(entry):
+            key = (entry.product_id, Location.code_for(name))
+            deltas[key] = deltas.get(key, 0) + delta
+            names.append(name)
+    if not deltas:
+        return
+    locations = resolve_locations(names)
+    existing = {
+        (balance.product_id, balance.location.code): balance
+        for balance in LocationBalance.objects.select_for_update().select_related('location').filter(
+            product_id__in={product_id for product_id, _ in deltas},
+            location_id__in=[location.pk for location in locations.values()],
+        )
+    }
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    for (product_id, code), delta in deltas.items():
+        balance = existing.get((product_id, code))
+        if balance is None:
+            to_create.append(LocationBalance(product_id=product_id, location=locations[code], quantity=delta))
+            continue
+        balance.quantity += delta
+        balance.updated_at = now
+        to_update.append(balance)
+    LocationBalance.objects.bulk_update(to_update, ['quantity', 'updated_at'], batch_size=batch_size)
+    LocationBalance.objects.bulk_create(to_create, batch_size=batch_size)
+
+
+def apply_stock_entries(entries, batch_size=1000):
+    """
+    Apply bulk-inserted StockEntry rows (which bypass post_save) to their
+    balances with one locked read and a bulk update/insert. Call it in the same
+    transaction as the bulk_create.
+    """
+    deltas = {}
+    for entry in entries:
+        quantity_in, quantity_out = _entry_deltas(entry)
+        total_in, total_out, last_entry_id = deltas.get(entry.product_id, (0, 0, None))
+        deltas[entry.product_id] = (
+            total_in + quantity_in,
+            total_out + quantity_out,
+            max(filter(None, [last_entry_id, entry.pk]), default=None),
+        )
+    if not deltas:
+        return
+    now = timezone.now()
+    existing = {
+        balance.product_id: balance
+        for balance in StockBalance.objects.select_for_update().filter(product_id__in=list(deltas))
+    }
+    to_update = []
+    to_create = []
+    for product_id, (quantity_in, quantity_out, last_entry_id) in deltas.items():
+        balance = existing.get(product_id)
+        if balance is None:
+            balance = StockBalance(product_id=product_id)
+            to_create.append(balance)
+        else:
+            to_update.append(balance)
+        balance.on_hand += quantity_in - quantity_out
+        balance.total_in += quantity_in
+        balance.total_out += quantity_out
+        balance.last_entry_id = last_entry_id or balance.last_entry_id
+        balance.updated_at = now
+    StockBalance.objects.bulk_update(
+        to_update, ['on_hand', 'total_in', 'total_out', 'last_entry_id', 'updated_at'], batch_size=batch_size
+    )
+    StockBalance.objects.bulk_create(to_create, batch_size=batch_size)
+    _apply_location_deltas(entries, batch_size=batch_size)
+
+
+def rebuild_stock_balances(product_ids=None, batch_size=1000):
+    """
+    Recompute StockBalance rows from the full ledger in one grouped pass.
+    Returns the number of balance rows written.
+    """
+    entries = StockEntry.objects.all()
+    balances = StockBalance.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        entries = entries.filter(product_id__in=product_ids)
+        balances = balances.filter(product_id__in=product_ids)
+    totals = (
+        entries.order_by()
+        .values('product_id')
+        .annotate(
+            total_in=Sum('quantity', filter=Q(entry_type='in')),
+            total_out=Sum('quantity', filter=Q(entry_type='out')),
+            last_entry_id=Max('id'),
+        )
+    )
+    rows = []
+    for row in totals.iterator():
+        total_in = row['total_in'] or 0
+        total_out = row['total_out'] or 0
+        rows.append(StockBalance(
+            product_id=row['product_id'],
+            on_hand=total_in - total_out,
+            total_in=total_in,
+            total_out=total_out,
+            last_entry_id=row['last_entry_id'],
+        ))
+    with transaction.atomic():
+        balances.delete()
+        StockBalance.objects.bulk_create(rows, batch_size=batch_size)
+        rebuild_location_balances(product_ids=product_ids, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_location_balances(product_ids=None, batch_size=1000):
+    """
+    Recompute LocationBalance rows from the ledger with one grouped query per
+    direction. Returns the number of balance rows written.
+    """
+    entries = StockEntry.objects.order_by()
+    balances = LocationBalance.objects.all()
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        entries = entries.filter(product_id__in=product_ids)
+        balances = balances.filter(product_id__in=product_ids)
+    inbound = (
+        entries.filter(entry_type__in=['in', 'transfer'])
+        .values_list('product_id', 'location_to')
+        .annotate(total=Sum('quantity'))
+    )
+    outbound = (
+        entries.filter(entry_type__in=['out', 'transfer'])
+        .values_list('product_id', 'location_from')
+        .annotate(total=Sum('quantity'))
+    )
+    totals = {}
+    names = []
+    for rows, sign in ((inbound, 1), (outbound, -1)):
+        for product_id, name, total in rows.iterator():
+            name = normalise_location_name(name)
+            if not name:
+                continue
+            key = (product_id, Location.code_for(name))
+            totals[key] = totals.get(key, 0) + sign * total
+            names.append(name)
+    with transaction.atomic():
+        locations = resolve_locations(names)
+        balances.delete()
+        LocationBalance.objects.bulk_create([
+            LocationBalance(product_id=product_id, location=locations[code], quantity=quantity)
+            for (product_id, code), quantity in totals.items()
+        ], batch_size=batch_size)
+    return len(totals)
+
+
+def get_product_locations(product_id):
+    """Where is product X: its non-zero LocationBalance rows, by location name."""
+    return (
+        LocationBalance.objects.filter(product_id=product_id)
+        .exclude(quantity=0)
+        .select_related('product', 'location')
+        .order_by('location__name')
+    )
+
+
+def get_location_contents(name):
+    """What is in rack R: the non-zero LocationBalance rows at the named location."""
+    return (
+        LocationBalance.objects.filter(location__code=Location.code_for(name))
+        .exclude(quantity=0)
+        .select_related('product', 'location')
+        .order_by('product__name')
+    )
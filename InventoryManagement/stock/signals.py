@@ -0,0 +1,81 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from products.models import Product
+from .models import StockEntry
+from .services import record_stock_entry, rebuild_stock_balances
+from .snapshots import rebuild_snapshots
+
+_state = threading.local()
+
+
+def _deleting_product(origin):
+    """Whether a delete started from a product (or products), cascading to its entries."""
+    return isinstance(origin, Product) or getattr(origin, 'model', None) is Product
+
+
+@receiver(pre_save, sender=StockEntry)
+def remember_previous_product(sender, instance, **kwargs):
+    """An edit can move an entry to another product; keep the one it leaves."""
+    instance._previous_product_id = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._previous_product_id = sender.objects.filter(pk=instance.pk).values_list('product_id', flat=True).first()
+
+
+@receiver(post_save, sender=StockEntry)
+def update_stock_balance(sender, instance, created, **kwargs):
+    """
+    Keep StockBalance in step with the ledger. StockEntry.save() runs inside a
+    transaction, so the balance is committed (or rolled back) with the entry.
+    """
+    if created:
+        record_stock_entry(instance)
+    else:
+        # Edits to existing entries are rare; recompute the totals of the
+        # product it belongs to and of the one it was moved from
+        product_ids = {instance.product_id, getattr(instance, '_previous_product_id', None)} - {None}
+        rebuild_stock_balances(product_ids=product_ids)
+        rebuild_snapshots(product_ids)
+
+
+def _rebuild_products(product_ids):
+    rebuild_stock_balances(product_ids=product_ids)
+    rebuild_snapshots(product_ids)
+
+
+def _flush_pending():
+    product_ids = getattr(_state, 'pending', set())
+    _state.pending = set()
+    if product_ids:
+        _rebuild_products(product_ids)
+
+
+def schedule_balance_rebuild(product_ids):
+    """
+    Queue products whose entries were deleted. Inside a transaction they are
+    rebuilt together once it commits, so deleting many entries regroups each
+    product's ledger once; in autocommit mode straight away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _rebuild_products(product_ids)
+        return
+    # A rolled back transaction discards its callback, so only trust the
+    # pending set while our flush is still registered.
+    if not any(entry[1] is _flush_pending for entry in connection.run_on_commit):
+        _state.pending = set()
+        transaction.on_commit(_flush_pending)
+    _state.pending.update(product_ids)
+
+
+@receiver(post_delete, sender=StockEntry)
+def remove_from_stock_balance(sender, instance, **kwargs):
+    """
+    Recompute the product's balances and snapshots after an entry is deleted,
+    whether one at a time, through a queryset or from the admin.
+    """
+    if _deleting_product(kwargs.get('origin')):
+        # The balances and snapshots go with the product
+        return
+    schedule_balance_rebuild([instance.product_id])
@@ -0,0 +1,150 @@
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import StockEntry, StockSnapshot
+
+
+def day_cutoff(day):
+    """Return the aware datetime at which `day` ends (midnight of the next day)."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _ledger_totals(entries):
+    """Group entries by product into {product_id: (total_in, total_out, last_entry_id)}."""
+    totals = (
+        entries.order_by()
+        .values('product_id')
+        .annotate(
+            total_in=Sum('quantity', filter=Q(entry_type='in')),
+            total_out=Sum('quantity', filter=Q(entry_type='out')),
+            last_entry_id=Max('id'),
+        )
+    )
+    return {
+        row['product_id']: (row['total_in'] or 0, row['total_out'] or 0, row['last_entry_id'])
+        for row in totals.iterator()
+    }
+
+
+def latest_snapshots(at, product_ids=None):
+    """Return {product_id: StockSnapshot} for each product's newest snapshot taken at or before `at`."""
+    newest = (
+        StockSnapshot.objects.filter(product_id=OuterRef('product_id'), taken_at__lte=at)
+        .order_by('-taken_at')
+        .values('taken_at')[:1]
+    )
+    snapshots = StockSnapshot.objects.filter(taken_at=Subquery(newest))
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=list(product_ids))
+    return {snapshot.product_id: snapshot for snapshot in snapshots.iterator()}
+
+
+def get_balances_as_of(when, product_ids=None):
+    """
+    Return {product_id: on_hand} as of `when` (exclusive): each product's
+    latest snapshot plus the ledger entries since the last rollup before
+    `when`. The rollup writes a snapshot for every product that moved on a
+    rolled-up day, so only entries after that checkpoint need summing.
+    """
+    checkpoint = StockSnapshot.objects.filter(taken_at__lte=when).aggregate(Max('taken_at'))['taken_at__max']
+    balances = {
+        product_id: snapshot.on_hand
+        for product_id, snapshot in latest_snapshots(when, product_ids).items()
+    }
+    entries = StockEntry.objects.filter(timestamp__lt=when)
+    if checkpoint is not None:
+        entries = entries.filter(timestamp__gte=checkpoint)
+    if product_ids is not None:
+        entries = entries.filter(product_id__in=list(product_ids))
+    for product_id, (total_in, total_out, _) in _ledger_totals(entries).items():
+        balances[product_id] = balances.get(product_id, 0) + total_in - total_out
+    return balances
+
+
+def rollup_snapshots(until=None, batch_size=1000):
+    """
+    Write snapshots for every completed day from the last rollup up to and
+    including `until` (default: yesterday). Each day commits on its own, so an
+    interrupted run resumes where it stopped. Returns (days, snapshots written).
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    last_cutoff = StockSnapshot.objects.aggregate(Max('taken_at'))['taken_at__max']
+    if last_cutoff is not None:
+        day = timezone.localtime(last_cutoff).date()
+        running = {
+            product_id: (snapshot.on_hand, snapshot.total_in, snapshot.total_out)
+            for product_id, snapshot in latest_snapshots(last_cutoff).items()
+        }
+    else:
+        first_entry = StockEntry.objects.aggregate(Min('timestamp'))['timestamp__min']
+        if first_entry is None:
+            return 0, 0
+        day = timezone.localtime(first_entry).date()
+        running = {}
+
+    days = written = 0
+    while day <= until:
+        start, end = day_cutoff(day - timedelta(days=1)), day_cutoff(day)
+        snapshots = []
+        for product_id, (quantity_in, quantity_out, last_entry_id) in _ledger_totals(
+            StockEntry.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        ).items():
+            on_hand, total_in, total_out = running.get(product_id, (0, 0, 0))
+            running[product_id] = (on_hand + quantity_in - quantity_out, total_in + quantity_in, total_out + quantity_out)
+            snapshots.append(StockSnapshot(
+                product_id=product_id,
+                taken_at=end,
+                on_hand=running[product_id][0],
+                total_in=running[product_id][1],
+                total_out=running[product_id][2],
+                last_entry_id=last_entry_id,
+            ))
+        with transaction.atomic():
+            StockSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+        days += 1
+        written += len(snapshots)
+        day += timedelta(days=1)
+    return days, written
+
+
+def rebuild_snapshots(product_ids, batch_size=1000):
+    """
+    Rewrite the snapshots of products whose history changed (an entry was
+    edited or deleted) up to the current rollup checkpoint, in one grouped
+    pass over their ledger. Returns the number of snapshots written.
+    """
+    product_ids = list(product_ids)
+    checkpoint = StockSnapshot.objects.aggregate(Max('taken_at'))['taken_at__max']
+    if checkpoint is None:
+        return 0
+    daily = (
+        StockEntry.objects.filter(product_id__in=product_ids, timestamp__lt=checkpoint)
+        .annotate(day=TruncDate('timestamp'))
+        .values('product_id', 'day')
+        .annotate(
+            total_in=Sum('quantity', filter=Q(entry_type='in')),
+            total_out=Sum('quantity', filter=Q(entry_type='out')),
+            last_entry_id=Max('id'),
+        )
+        .order_by('product_id', 'day')
+    )
+    running = {}
+    snapshots = []
+    for row in daily.iterator():
+        on_hand, total_in, total_out = running.get(row['product_id'], (0, 0, 0))
+        quantity_in, quantity_out = row['total_in'] or 0, row['total_out'] or 0
+        running[row['product_id']] = (on_hand + quantity_in - quantity_out, total_in + quantity_in, total_out + quantity_out)
+        snapshots.append(StockSnapshot(
+            product_id=row['product_id'],
+            taken_at=day_cutoff(row['day']),
+            on_hand=running[row['product_id']][0],
+            total_in=running[row['product_id']][1],
+            total_out=running[row['product_id']][2],
+            last_entry_id=row['last_entry_id'],
+        ))
+    with transaction.atomic():
+        StockSnapshot.objects.filter(product_id__in=product_ids).delete()
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+    return len(snapshots)
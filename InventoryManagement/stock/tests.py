@@ -1,9 +1,23 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
+from openpyxl import Workbook
+from django.db import OperationalError, connection
+from django.test import override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APITransactionTestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import StockEntry
+from django.core.management import call_command
+from .models import StockEntry, StockBalance, Location, LocationBalance, StockSnapshot
+from .services import get_available_quantity, rebuild_location_balances
+from .importers import ingest_stock_sheet
+from .snapshots import day_cutoff, get_balances_as_of
+from audit.models import AuditLog
 from products.models import Product
+from InventoryManagement.databases import retry_on_locked
+from InventoryManagement.pagination import KeysetPaginator, encode_cursor
+from InventoryManagement.query_plans import QueryPlanMixin
 
 User = get_user_model()
 
@@ -30,4 +44,320 @@ class StockEntryAPITest(APITestCase):
         url = reverse('stockin-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class StockBalanceTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_balance_follows_ledger_writes(self):
+        StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', created_by=self.user)
+        StockEntry.objects.create(product=self.product, quantity=4, entry_type='out', created_by=self.user)
+        entry = StockEntry.objects.create(product=self.product, quantity=3, entry_type='transfer', created_by=self.user)
+        balance = StockBalance.objects.get(product=self.product)
+        self.assertEqual((balance.on_hand, balance.total_in, balance.total_out), (6, 10, 4))
+        self.assertEqual(balance.last_entry_id, entry.id)
+        self.assertEqual(get_available_quantity(self.product.id), 6)
+
+    def test_product_without_entries_has_no_stock(self):
+        self.assertEqual(get_available_quantity(self.product.id), 0)
+
+    def test_rebuild_command_recovers_from_drift(self):
+        StockEntry.objects.create(product=self.product, quantity=7, entry_type='in', created_by=self.user)
+        StockBalance.objects.filter(product=self.product).update(on_hand=999)
+        call_command('rebuild_stock_balances', stdout=StringIO())
+        self.assertEqual(get_available_quantity(self.product.id), 7)
+
+    def test_queryset_delete_updates_balances(self):
+        StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', location_to='Rack A1', created_by=self.user)
+        StockEntry.objects.create(product=self.product, quantity=4, entry_type='out', location_from='Rack A1', created_by=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            StockEntry.objects.filter(entry_type='out').delete()
+        self.assertEqual(get_available_quantity(self.product.id), 10)
+        self.assertEqual(LocationBalance.objects.get(product=self.product).quantity, 10)
+
+    def test_deleting_many_entries_rebuilds_each_product_once(self):
+        for _ in range(5):
+            StockEntry.objects.create(product=self.product, quantity=1, entry_type='in', created_by=self.user)
+        with mock.patch('stock.signals.rebuild_stock_balances') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                StockEntry.objects.filter(product=self.product).delete()
+        rebuild.assert_called_once_with(product_ids={self.product.id})
+
+    def test_moving_an_entry_rebuilds_both_products(self):
+        other = Product.objects.create(name='Other Product', sku='OP001')
+        entry = StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', created_by=self.user)
+        entry.product = other
+        entry.save()
+        self.assertEqual(get_available_quantity(self.product.id), 0)
+        self.assertEqual(get_available_quantity(other.id), 5)
+
+
+class LocationBalanceTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        self.other = Product.objects.create(name='Other Product', sku='OP001')
+
+    def quantities(self, product):
+        return dict(LocationBalance.objects.filter(product=product).values_list('location__name', 'quantity'))
+
+    def test_entries_move_stock_between_locations(self):
+        StockEntry.objects.create(product=self.product, quantity=10, entry_type='in', location_from='Supplier', location_to='Rack A1', created_by=self.user)
+        StockEntry.objects.create(product=self.product, quantity=4, entry_type='transfer', location_from='rack a1 ', location_to='Rack B2', created_by=self.user)
+        StockEntry.objects.create(product=self.product, quantity=1, entry_type='out', location_from='Rack B2', location_to='Customer', created_by=self.user)
+        self.assertEqual(self.quantities(self.product), {'Rack A1': 6, 'Rack B2': 3})
+        self.assertEqual(Location.objects.filter(code='RACK A1').count(), 1)
+        self.assertEqual(get_available_quantity(self.product.id), 9)
+
+    def test_rebuild_matches_incremental_balances(self):
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', location_to='Rack A1', created_by=self.user)
+        StockEntry.objects.create(product=self.product, quantity=2, entry_type='transfer', location_from='Rack A1', location_to='Rack C3', created_by=self.user)
+        expected = self.quantities(self.product)
+        LocationBalance.objects.update(quantity=999)
+        rebuild_location_balances()
+        self.assertEqual(self.quantities(self.product), expected)
+
+    def test_where_is_product_and_what_is_in_rack(self):
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', location_to='Rack A1', created_by=self.user)
+        StockEntry.objects.create(product=self.other, quantity=3, entry_type='in', location_to='Rack A1', created_by=self.user)
+        StockEntry.objects.create(product=self.other, quantity=3, entry_type='transfer', location_from='Rack A1', location_to='Rack B2', created_by=self.user)
+        response = self.client.get(reverse('product-locations-api', args=[self.other.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['location_name'], row['quantity']) for row in response.data], [('Rack B2', 3)])
+        response = self.client.get(reverse('location-contents-api'), {'location': 'rack a1'})
+        self.assertEqual([(row['product_sku'], row['quantity']) for row in response.data], [('TP001', 5)])
+        response = self.client.get(reverse('location-contents-api'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockSnapshotTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        self.other = Product.objects.create(name='Other Product', sku='OP001')
+
+    def entry(self, product, quantity, entry_type, day):
+        entry = StockEntry.objects.create(product=product, quantity=quantity, entry_type=entry_type, created_by=self.user)
+        StockEntry.objects.filter(pk=entry.pk).update(timestamp=datetime(2026, 1, day, 12, tzinfo=dt_timezone.utc))
+        return entry
+
+    def test_as_of_balances_use_snapshot_plus_delta(self):
+        self.entry(self.product, 10, 'in', 1)
+        self.entry(self.other, 5, 'in', 2)
+        self.entry(self.product, 3, 'out', 3)
+        self.entry(self.product, 4, 'in', 5)
+        call_command('rollup_stock_snapshots', until='2026-01-03', stdout=StringIO())
+        self.assertEqual(StockSnapshot.objects.count(), 3)
+        self.assertEqual(get_balances_as_of(day_cutoff(date(2026, 1, 1))), {self.product.id: 10})
+        self.assertEqual(get_balances_as_of(day_cutoff(date(2026, 1, 3))), {self.product.id: 7, self.other.id: 5})
+        # Day 5 is past the last rollup and comes from the ledger delta
+        self.assertEqual(get_balances_as_of(day_cutoff(date(2026, 1, 5))), {self.product.id: 11, self.other.id: 5})
+        # A second run continues from the checkpoint
+        call_command('rollup_stock_snapshots', until='2026-01-05', stdout=StringIO())
+        self.assertEqual(StockSnapshot.objects.get(product=self.product, taken_at=day_cutoff(date(2026, 1, 5))).on_hand, 11)
+        self.assertEqual(get_balances_as_of(day_cutoff(date(2026, 1, 31)))[self.product.id], get_available_quantity(self.product.id))
+
+    def test_deleting_an_entry_rewrites_snapshots(self):
+        self.entry(self.product, 10, 'in', 1)
+        entry = self.entry(self.product, 3, 'out', 2)
+        call_command('rollup_stock_snapshots', until='2026-01-02', stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertEqual(get_balances_as_of(day_cutoff(date(2026, 1, 2))), {self.product.id: 10})
+
+    def test_month_end_api(self):
+        self.entry(self.product, 10, 'in', 1)
+        self.entry(self.product, 2, 'out', 20)
+        call_command('rollup_stock_snapshots', until='2026-01-10', stdout=StringIO())
+        response = self.client.get(reverse('stock-balances-as-of-api'), {'as_of': '2026-01-15'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balances'], [{'product': self.product.id, 'product_name': 'Test Product', 'product_sku': 'TP001', 'on_hand': 10}])
+        response = self.client.get(reverse('stock-balances-as-of-api'), {'as_of': 'January'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('stock-balances-as-of-api'), {'as_of': '2026-01-15', 'product': [self.product.id, self.other.id]})
+        self.assertEqual([row['product'] for row in response.data['balances']], [self.product.id])
+        response = self.client.get(reverse('stock-balances-as-of-api'), {'as_of': '2026-01-15', 'product': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('product', response.data)
+
+
+class BulkStockImportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        self.other = Product.objects.create(name='Other Product', sku='OP001')
+
+    def make_sheet(self, rows):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(['Product Name', 'Quantity'])
+        for row in rows:
+            ws.append(row)
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        return output
+
+    def test_bulk_stock_in(self):
+        sheet = self.make_sheet([['test product', 5], ['Other Product', 2], ['Missing', 1], ['Other Product', -1]])
+        results, success_count, fail_count = ingest_stock_sheet(sheet, 'in', self.user)
+        self.assertEqual((success_count, fail_count), (2, 2))
+        self.assertEqual(get_available_quantity(self.product.id), 5)
+        self.assertEqual(AuditLog.objects.filter(action='stock in').count(), 2)
+
+    def test_bulk_stock_out_draws_down_balance_in_memory(self):
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in')
+        sheet = self.make_sheet([['Test Product', 3], ['Test Product', 3], ['Test Product', 2]])
+        results, success_count, fail_count = ingest_stock_sheet(sheet, 'out', self.user)
+        self.assertEqual([r['status'] for r in results], ['success', 'failed', 'success'])
+        self.assertEqual(get_available_quantity(self.product.id), 0)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        sheet = self.make_sheet([['Test Product', 1]] * 100)
+        with self.assertNumQueries(7):
+            ingest_stock_sheet(sheet, 'in', self.user)
+        self.assertEqual(StockEntry.objects.count(), 100)
+
+    def test_missing_columns(self):
+        wb = Workbook()
+        wb.active.append(['Name', 'Qty'])
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        with self.assertRaises(ValueError):
+            ingest_stock_sheet(output, 'in', self.user)
+
+
+class StockQueryPlanTest(QueryPlanMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        StockEntry.objects.create(product=self.product, quantity=5, entry_type='in', created_by=self.user)
+
+    def test_stock_pages_use_indexes(self):
+        self.assertViewUsesIndexes(reverse('stock-in-page'), [StockEntry])
+        self.assertViewUsesIndexes(reverse('stock-out-page'), [StockEntry])
+        self.assertViewUsesIndexes(reverse('product-detail', args=[self.product.id]), [StockEntry])
+
+    def test_ledger_filters_use_composite_indexes(self):
+        self.assertQuerysetUsesIndex(
+            StockEntry.objects.filter(entry_type='in').values('quantity'), 'stock_entry_type_ts_idx'
+        )
+        self.assertQuerysetUsesIndex(
+            StockEntry.objects.filter(product=self.product, entry_type='out'), 'stock_entry_product_type_idx'
+        )
+
+
+class KeysetPaginationTest(QueryPlanMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+        entries = [StockEntry.objects.create(product=self.product, quantity=i + 1, entry_type='in') for i in range(7)]
+        # Rows sharing a timestamp are ordered by id
+        same = datetime(2026, 3, 1, 12, 0, tzinfo=dt_timezone.utc)
+        StockEntry.objects.filter(id__in=[entry.id for entry in entries[2:5]]).update(timestamp=same)
+        StockEntry.objects.create(product=self.product, quantity=1, entry_type='out')
+        self.expected = list(StockEntry.objects.filter(entry_type='in').order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def test_pages_walk_forward_and_back(self):
+        paginator = KeysetPaginator(StockEntry.objects.filter(entry_type='in'), per_page=3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([entry.id for page in pages for entry in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.page(pages[2].previous_cursor)
+        self.assertEqual([entry.id for entry in back], self.expected[3:6])
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+        first = paginator.page(back.previous_cursor)
+        self.assertEqual([entry.id for entry in first], self.expected[:3])
+        self.assertFalse(first.has_previous())
+
+    def test_bad_cursor_gives_first_page_or_404(self):
+        paginator = KeysetPaginator(StockEntry.objects.filter(entry_type='in'), per_page=3)
+        self.assertEqual([entry.id for entry in paginator.get_page('not-a-cursor')], self.expected[:3])
+        self.assertEqual([entry.id for entry in paginator.get_page(encode_cursor(['yesterday', 1]))], self.expected[:3])
+        response = self.client.get(reverse('stock-in-api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_api_follows_next_links(self):
+        url, seen = reverse('stock-in-api') + '?page_size=3&count=1', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertGreaterEqual(response.data['count'], 7)
+            seen.extend(entry['id'] for entry in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_deep_pages_use_keyset_index(self):
+        paginator = KeysetPaginator(StockEntry.objects.filter(entry_type='in'), per_page=3)
+        cursor = paginator.page().next_cursor
+        response = self.assertViewUsesIndexes(reverse('stock-in-page'), [StockEntry], {'cursor': cursor})
+        self.assertEqual([entry.id for entry in response.context['stock_in_entries']], self.expected[3:])
+        self.assertQuerysetUsesIndex(
+            StockEntry.objects.filter(entry_type='in').order_by('-timestamp', '-id')[:51], 'stock_entry_type_keyset_idx'
+        )
+
+
+@override_settings(SQLITE_LOCK_RETRY_DELAY=0)
+class SQLiteLockingTest(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.product = Product.objects.create(name='Test Product', sku='TP001')
+
+    def test_pragmas_applied_to_new_connections(self):
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)   # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA temp_store').fetchone()[0], 2)    # MEMORY
+
+    def test_locked_stock_entry_is_retried_as_a_fresh_insert(self):
+        from stock import signals
+        record = signals.record_stock_entry
+        failures = [OperationalError('database is locked')]
+
+        def locked_once(entry):
+            if failures:
+                raise failures.pop()
+            record(entry)
+
+        with mock.patch.object(signals, 'record_stock_entry', side_effect=locked_once):
+            entry = StockEntry.objects.create(product=self.product, quantity=7, entry_type='in', created_by=self.user)
+        self.assertEqual(StockEntry.objects.get().pk, entry.pk)
+        self.assertEqual(get_available_quantity(self.product.id), 7)
+
+    def test_retry_gives_up_and_ignores_other_errors(self):
+        calls = []
+
+        @retry_on_locked(attempts=3)
+        def always_locked():
+            calls.append(1)
+            raise OperationalError('database table is locked')
+
+        with self.assertRaises(OperationalError):
+            always_locked()
+        self.assertEqual(len(calls), 3)
+
+        no_retry = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(no_retry)()
+        self.assertEqual(no_retry.call_count, 1)
+
+    def test_no_retry_inside_a_transaction(self):
+        from django.db import transaction
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            retry_on_locked(func)()
+        self.assertEqual(func.call_count, 1)
@@ -10,4 +10,7 @@ urlpatterns = [
     # API endpoints (for programmatic access)
     path('api/in/', views.StockIn.as_view(), name='stock-in-api'),
     path('api/out/', views.StockOut.as_view(), name='stock-out-api'),
+    path('api/products/<int:product_id>/locations/', views.ProductLocationsAPI.as_view(), name='product-locations-api'),
+    path('api/balances/', views.StockBalancesAsOfAPI.as_view(), name='stock-balances-as-of-api'),
+    path('api/locations/contents/', views.LocationContentsAPI.as_view(), name='location-contents-api'),
 ]
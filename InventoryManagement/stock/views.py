@@ -1,36 +1,35 @@
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from rest_framework.generics import ListCreateAPIView
-from .models import StockEntry
-from .serializers import StockEntrySerializer
+from rest_framework.generics import ListAPIView, ListCreateAPIView
+from .models import StockEntry, Location
+from .serializers import StockEntrySerializer, LocationBalanceSerializer
+from .services import get_available_quantity, get_location_contents, get_product_locations
+from .snapshots import day_cutoff, get_balances_as_of
+from jobs.runner import enqueue
+from jobs.views import get_finished_job
 from products.models import Product
 from audit.models import AuditLog
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from InventoryManagement.pagination import KeysetCursorPagination, KeysetPaginator
 from django.contrib import messages
-from django.db.models import Sum
+from django.utils.dateparse import parse_date
 from rest_framework.exceptions import ValidationError
-from openpyxl import load_workbook
 
 class StockInPageView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        stock_in_entries = StockEntry.objects.filter(entry_type='in').order_by('-timestamp')
-        products = Product.objects.all()
-        # Pagination: 50 per page
-        paginator = Paginator(stock_in_entries, 50)
-        page_number = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-        return render(request, 'stock/stock_in.html', {'stock_in_entries': page_obj.object_list, 'page_obj': page_obj, 'products': products})
+        job = get_finished_job(request, 'stock_import')
+        if job:
+            return self.render_bulk_results(request, job)
+        stock_in_entries = StockEntry.objects.filter(entry_type='in').select_related('product')
+        # Keyset pagination: 50 per page, newest first
+        page_obj = KeysetPaginator(stock_in_entries, 50).get_page(request.GET.get('cursor'))
+        return render(request, 'stock/stock_in.html', {'stock_in_entries': page_obj.object_list, 'page_obj': page_obj, 'locations': Location.objects.values_list('name', flat=True)})
 
     def post(self, request):
         if not request.user.is_authenticated:
@@ -50,69 +49,36 @@ class StockInPageView(View):
         return redirect('stock-in-page')
 
     def handle_bulk_stock_in(self, request):
-        from django.contrib import messages
-        results = []
-        success_count = 0
-        fail_count = 0
-        if 'excel_file' in request.FILES:
-            excel_file = request.FILES['excel_file']
-            wb = load_workbook(excel_file)
-            ws = wb.active
-            header = [cell.value for cell in ws[1]]
-            name_idx = header.index('Product Name')
-            qty_idx = header.index('Quantity')
-            from products.models import Product
-            from django.db.models import Sum
-            from .models import StockEntry
-            products = {p.name.lower(): p for p in Product.objects.all()}
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                product_name = str(row[name_idx]).strip()
-                qty = row[qty_idx]
-                product = products.get(product_name.lower())
-                if not product or not isinstance(qty, (int, float)) or qty <= 0:
-                    results.append({
-                        'product_name': product_name,
-                        'quantity': qty,
-                        'status': 'failed',
-                        'message': 'Invalid product or quantity',
-                    })
-                    fail_count += 1
-                    continue
-                StockEntry.objects.create(
-                    product=product,
-                    quantity=int(qty),
-                    entry_type='in',
-                    created_by=request.user
-                )
-                results.append({
-                    'product_name': product.name,
-                    'quantity': int(qty),
-                    'status': 'success',
-                    'message': 'Stock in successful',
-                })
-                success_count += 1
-        if success_count:
-            messages.success(request, f'Bulk stock in successful for {success_count} item(s).')
-        if fail_count:
-            messages.error(request, f'Bulk stock in failed for {fail_count} item(s). See details below.')
-        return render(request, 'stock/stock_in.html', {'bulk_results': results})
+        if 'excel_file' not in request.FILES:
+            messages.error(request, 'Please select an Excel file to upload.')
+            return redirect('stock-in-page')
+        # Large sheets are processed by the job worker; the job page polls for completion
+        job = enqueue(
+            'stock_import',
+            request.user,
+            params={'entry_type': 'in', 'return_url': reverse('stock-in-page')},
+            input_file=request.FILES['excel_file'],
+        )
+        return redirect('job-detail', pk=job.pk)
+
+    def render_bulk_results(self, request, job):
+        if job.result['success_count']:
+            messages.success(request, f'Bulk stock in successful for {job.result["success_count"]} item(s).')
+        if job.result['fail_count']:
+            messages.error(request, f'Bulk stock in failed for {job.result["fail_count"]} item(s). See details below.')
+        return render(request, 'stock/stock_in.html', {'bulk_results': job.result['results']})
 
 class StockOutPageView(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect('login')
-        stock_out_entries = StockEntry.objects.filter(entry_type='out').order_by('-timestamp')
-        products = Product.objects.all()
-        # Pagination: 50 per page
-        paginator = Paginator(stock_out_entries, 50)
-        page_number = request.GET.get('page')
-        try:
-            page_obj = paginator.page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-        return render(request, 'stock/stock_out.html', {'stock_out_entries': page_obj.object_list, 'page_obj': page_obj, 'products': products})
+        job = get_finished_job(request, 'stock_import')
+        if job:
+            return self.render_bulk_results(request, job)
+        stock_out_entries = StockEntry.objects.filter(entry_type='out').select_related('product')
+        # Keyset pagination: 50 per page, newest first
+        page_obj = KeysetPaginator(stock_out_entries, 50).get_page(request.GET.get('cursor'))
+        return render(request, 'stock/stock_out.html', {'stock_out_entries': page_obj.object_list, 'page_obj': page_obj, 'locations': Location.objects.values_list('name', flat=True)})
 
     def post(self, request):
         if not request.user.is_authenticated:
@@ -127,9 +93,7 @@ class StockOutPageView(View):
         description = request.POST.get('description')
         product = Product.objects.get(id=product_id)
         # Check available quantity
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-        available_quantity = stock_in - stock_out
+        available_quantity = get_available_quantity(product.id)
         if int(quantity) > available_quantity:
             messages.error(request, f'Cannot remove {quantity} units from {product.name}. Only {available_quantity} available in stock.')
             return redirect('stock-out-page')
@@ -139,67 +103,30 @@ class StockOutPageView(View):
         return redirect('stock-out-page')
 
     def handle_bulk_stock_out(self, request):
-        from django.contrib import messages
-        results = []
-        success_count = 0
-        fail_count = 0
-        if 'excel_file' in request.FILES:
-            excel_file = request.FILES['excel_file']
-            wb = load_workbook(excel_file)
-            ws = wb.active
-            header = [cell.value for cell in ws[1]]
-            name_idx = header.index('Product Name')
-            qty_idx = header.index('Quantity')
-            products = {p.name.lower(): p for p in Product.objects.all()}
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                product_name = str(row[name_idx]).strip()
-                qty = row[qty_idx]
-                product = products.get(product_name.lower())
-                if not product or not isinstance(qty, (int, float)) or qty <= 0:
-                    results.append({
-                        'product_name': product_name,
-                        'quantity': qty,
-                        'status': 'failed',
-                        'message': 'Invalid product or quantity',
-                    })
-                    fail_count += 1
-                    continue
-                # Check available quantity
-                stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-                stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-                available_quantity = stock_in - stock_out
-                if int(qty) > available_quantity:
-                    results.append({
-                        'product_name': product.name,
-                        'quantity': int(qty),
-                        'status': 'failed',
-                        'message': f'Cannot remove {qty} units. Only {available_quantity} available.',
-                    })
-                    fail_count += 1
-                    continue
-                StockEntry.objects.create(
-                    product=product,
-                    quantity=int(qty),
-                    entry_type='out',
-                    created_by=request.user
-                )
-                results.append({
-                    'product_name': product.name,
-                    'quantity': int(qty),
-                    'status': 'success',
-                    'message': 'Stock out successful',
-                })
-                success_count += 1
-        if success_count:
-            messages.success(request, f'Bulk stock out successful for {success_count} item(s).')
-        if fail_count:
-            messages.error(request, f'Bulk stock out failed for {fail_count} item(s). See details below.')
-        return render(request, 'stock/stock_out.html', {'bulk_results': results})
+        if 'excel_file' not in request.FILES:
+            messages.error(request, 'Please select an Excel file to upload.')
+            return redirect('stock-out-page')
+        # Large sheets are processed by the job worker; the job page polls for completion
+        job = enqueue(
+            'stock_import',
+            request.user,
+            params={'entry_type': 'out', 'return_url': reverse('stock-out-page')},
+            input_file=request.FILES['excel_file'],
+        )
+        return redirect('job-detail', pk=job.pk)
+
+    def render_bulk_results(self, request, job):
+        if job.result['success_count']:
+            messages.success(request, f'Bulk stock out successful for {job.result["success_count"]} item(s).')
+        if job.result['fail_count']:
+            messages.error(request, f'Bulk stock out failed for {job.result["fail_count"]} item(s). See details below.')
+        return render(request, 'stock/stock_out.html', {'bulk_results': job.result['results']})
 
 class StockIn(ListCreateAPIView):
     queryset = StockEntry.objects.filter(entry_type='in')
     serializer_class = StockEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user, entry_type='in')
@@ -208,13 +135,60 @@ class StockOut(ListCreateAPIView):
     queryset = StockEntry.objects.filter(entry_type='out')
     serializer_class = StockEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def perform_create(self, serializer):
         product = serializer.validated_data['product']
         quantity = serializer.validated_data['quantity']
-        stock_in = StockEntry.objects.filter(product=product, entry_type='in').aggregate(total=Sum('quantity'))['total'] or 0
-        stock_out = StockEntry.objects.filter(product=product, entry_type='out').aggregate(total=Sum('quantity'))['total'] or 0
-        available_quantity = stock_in - stock_out
+        available_quantity = get_available_quantity(product.id)
         if quantity > available_quantity:
             raise ValidationError(f'Cannot remove {quantity} units from {product.name}. Only {available_quantity} available in stock.')
         serializer.save(created_by=self.request.user, entry_type='out')
+
+
+class ProductLocationsAPI(ListAPIView):
+    """Where is product X: quantity held at each location."""
+    serializer_class = LocationBalanceSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return get_product_locations(self.kwargs['product_id'])
+
+
+class LocationContentsAPI(ListAPIView):
+    """What is in rack R: products held at ?location=<name>."""
+    serializer_class = LocationBalanceSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        location = self.request.query_params.get('location')
+        if not location:
+            raise ValidationError({'location': 'This query parameter is required.'})
+        return get_location_contents(location)
+
+
+class StockBalancesAsOfAPI(APIView):
+    """Product balances at the close of ?as_of=YYYY-MM-DD (optionally ?product=<id>)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            as_of = parse_date(request.query_params.get('as_of', ''))
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            raise ValidationError({'as_of': 'Enter a date in YYYY-MM-DD format.'})
+        try:
+            product_ids = [int(product_id) for product_id in request.query_params.getlist('product')] or None
+        except ValueError:
+            raise ValidationError({'product': 'Enter product ids as whole numbers.'})
+        balances = get_balances_as_of(day_cutoff(as_of), product_ids=product_ids)
+        products = Product.objects.filter(id__in=list(balances)).order_by('name').values('id', 'name', 'sku')
+        return Response({
+            'as_of': as_of,
+            'balances': [
+                {'product': product['id'], 'product_name': product['name'], 'product_sku': product['sku'], 'on_hand': balances[product['id']]}
+                for product in products
+                if balances[product['id']]
+            ],
+        })